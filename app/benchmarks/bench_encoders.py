@@ -0,0 +1,94 @@
+# benchmarks/bench_encoders.py
+"""Parity and throughput of the ONNX embedding backend against PyTorch.
+
+Run from the app/ directory (needs requirements-onnx.txt):
+
+    python -m benchmarks.bench_encoders --model all-MiniLM-L6-v2 --texts 2000
+
+Both backends encode the same texts; the report gives the per-text cosine
+similarity between them and each backend's texts/sec. Exits non-zero when
+the minimum cosine falls below --min-cosine, so a bad export or an
+over-aggressive quantization is caught before it is deployed.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from config import config
+from services.encoders import OnnxEncoder, SentenceTransformerEncoder
+
+WORDS = (
+    "the penalty regulation compliance report finding deadline contract party agreement "
+    "payment invoice audit section clause tax notice court order filing revenue period "
+    "company director shareholder account balance statement amendment schedule annex"
+).split()
+
+def sample_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))) for _ in range(count)]
+
+def load_texts(path, count):
+    if not path:
+        return sample_texts(count)
+    with open(path, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return texts[:count]
+
+def throughput(encoder, texts, batch_size):
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return embeddings, len(texts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--texts", type=int, default=1000, help="number of texts to encode")
+    parser.add_argument("--corpus", help="text file with one passage per line (default: synthetic)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-quantize", action="store_true", help="compare the fp32 ONNX export instead of int8")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    texts = load_texts(args.corpus, args.texts)
+    torch_encoder = SentenceTransformerEncoder(args.model)
+    onnx_encoder = OnnxEncoder(args.model, config.MODELS_DIR, quantize=not args.no_quantize)
+
+    torch_embeddings, torch_rate = throughput(torch_encoder, texts, args.batch_size)
+    onnx_embeddings, onnx_rate = throughput(onnx_encoder, texts, args.batch_size)
+
+    # Both sides are normalized, so the row-wise dot product is the cosine
+    cosines = np.sum(torch_embeddings * onnx_embeddings, axis=1)
+    report = {
+        'model': args.model,
+        'onnx_quantized': not args.no_quantize,
+        'texts': len(texts),
+        'batch_size': args.batch_size,
+        'cosine_min': float(cosines.min()),
+        'cosine_mean': float(cosines.mean()),
+        'max_abs_diff': float(np.abs(torch_embeddings - onnx_embeddings).max()),
+        'torch_texts_per_sec': torch_rate,
+        'onnx_texts_per_sec': onnx_rate,
+        'speedup': onnx_rate / torch_rate,
+    }
+
+    print(f"Parity: cosine min {report['cosine_min']:.4f}, mean {report['cosine_mean']:.4f}, "
+          f"max abs diff {report['max_abs_diff']:.4f}")
+    print(f"Throughput: torch {torch_rate:.0f} texts/s, onnx {onnx_rate:.0f} texts/s "
+          f"({report['speedup']:.2f}x)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if report['cosine_min'] < args.min_cosine:
+        print(f"FAIL: minimum cosine {report['cosine_min']:.4f} is below {args.min_cosine}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# benchmarks/bench_pipeline.py
+"""End-to-end benchmark: extraction, chunking, embedding, search, persistence and /query.
+
+Run from the app/ directory:
+
+    python -m benchmarks.bench_pipeline --docs 10 --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Builds (or reuses, with --corpus) a synthetic corpus from benchmarks.corpus
+and times every stage separately:
+
+    extract_<type>   services.ocr extraction per file (text/image PDF, image, CSV, DOCX)
+    chunk            DocumentEmbedder.process_document per file
+    embed_add        FAISSVectorStore.add_documents per file
+    search           FAISSVectorStore.search per query (caches off)
+    save_index       FAISSVectorStore.save_index
+    load_index       FAISSVectorStore.load_index, in memory
+    load_index_mmap  FAISSVectorStore.load_index, memory-mapped
+    query            POST /query against a stub LLM (benchmarks.stub_llm)
+
+Each stage reports p50/p90/p95/p99 latency and throughput; the JSON report
+also records the commit and corpus settings so runs can be compared.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from benchmarks.corpus import FILE_TYPES, generate_corpus
+from benchmarks.report import StageTimer, print_stages, run_metadata
+from benchmarks.stub_llm import StubLLMServer
+
+EXTRACTORS = {
+    'text_pdf': 'extract_text_from_pdf',
+    'image_pdf': 'extract_text_from_pdf',
+    'image': 'extract_text_from_image',
+    'csv': 'extract_text_from_csv',
+    'docx': 'extract_text_from_docx',
+}
+
+def load_corpus(args, work_dir):
+    if args.corpus:
+        with open(Path(args.corpus) / "manifest.json") as f:
+            return json.load(f)
+    return generate_corpus(work_dir / "corpus", args.docs, args.pages, args.paragraphs, args.seed, args.types.split(","))
+
+def bench_ingestion(manifest, store, embedder, stages):
+    """Extract, chunk and index every file; returns chunks indexed per file type"""
+    from services import ocr
+
+    chunk_counts = {}
+    for item in manifest['files']:
+        extractor = getattr(ocr, EXTRACTORS[item['type']])
+        doc_id = os.path.basename(item['path'])
+
+        extracted = stages.setdefault(f"extract_{item['type']}", StageTimer("files")).time(
+            extractor, item['path'], doc_id
+        )
+        chunks, metadata_list = stages.setdefault('chunk', StageTimer("chunks")).time(
+            embedder.process_document, extracted, units=0
+        )
+        stages['chunk'].units += len(chunks)
+
+        chunk_counts[item['type']] = chunk_counts.get(item['type'], 0) + len(chunks)
+        if chunks:
+            stages.setdefault('embed_add', StageTimer("chunks")).time(
+                store.add_documents, chunks, metadata_list, units=len(chunks)
+            )
+    return chunk_counts
+
+def bench_search(store, questions, repeat, k, stages):
+    timer = stages.setdefault('search', StageTimer("queries"))
+    for _ in range(repeat):
+        for question in questions:
+            timer.time(store.search, question, k)
+
+def bench_persistence(store, work_dir, repeat, stages):
+    from services.vector_store import FAISSVectorStore
+
+    index_path = str(work_dir / "index" / "vector_store")
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    chunks = store.total_chunks()
+    for _ in range(repeat):
+        stages.setdefault('save_index', StageTimer("chunks")).time(store.save_index, index_path, units=chunks)
+    for use_mmap, name in ((False, 'load_index'), (True, 'load_index_mmap')):
+        for _ in range(repeat):
+            loaded = FAISSVectorStore(store.embedding_dim, cache_size=0, model=store.model, index_type=store.index_type)
+            stages.setdefault(name, StageTimer("chunks")).time(
+                loaded.load_index, index_path, use_mmap=use_mmap, units=chunks
+            )
+
+def bench_query(store, questions, repeat, k, llm_latency, stages):
+    """POST /query through the FastAPI app, with the LLM replaced by the stub server"""
+    from config import config
+
+    llm = StubLLMServer(latency=llm_latency).start()
+    os.environ['GROQ_API_BASE'] = llm.url
+    os.environ.setdefault('GROQ_API_KEY', "stub")
+    # Checked by the validate_config classmethod at startup, which reads the
+    # class attribute; config was imported before the env was set
+    type(config).GROQ_API_KEY = type(config).GROQ_API_KEY or "stub"
+
+    from fastapi.testclient import TestClient
+    import main
+
+    timer = stages.setdefault('query', StageTimer("queries"))
+    with TestClient(main.app) as client:
+        # After startup, which would otherwise load the persisted index
+        main.doc_manager.vector_store = store
+        main.query_processor.vector_store = store
+        main.doc_manager.processed_documents = store.summarize_documents(store.metadata)
+        for _ in range(repeat):
+            for question in questions:
+                response = timer.time(client.post, "/query", json={'question': question, 'max_results': k})
+                response.raise_for_status()
+    llm.shutdown()
+    return llm.requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory written by benchmarks.corpus (default: generate one)")
+    parser.add_argument("--docs", type=int, default=10, help="files per type when generating")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--paragraphs", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--types", default=",".join(FILE_TYPES))
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="rounds of the question set / save-load cycles")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub LLM seconds to first token")
+    parser.add_argument("--skip-query", action="store_true", help="skip the /query stage")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    from services.embedder import DocumentEmbedder
+    from services.vector_store import FAISSVectorStore
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    try:
+        manifest = load_corpus(args, work_dir)
+        store = FAISSVectorStore(cache_size=0, index_type=args.index_type)
+        embedder = DocumentEmbedder()
+        store.model = embedder.model
+        stages = {}
+
+        chunk_counts = bench_ingestion(manifest, store, embedder, stages)
+        if shutil.which("tesseract") is None:
+            print("tesseract not found: image and scanned-PDF extraction will yield no text")
+
+        questions = manifest['questions']
+        bench_search(store, questions, args.repeat, args.k, stages)
+        bench_persistence(store, work_dir, args.repeat, stages)
+        llm_requests = None
+        if not args.skip_query:
+            llm_requests = bench_query(store, questions, args.repeat, args.k, args.llm_latency, stages)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {**run_metadata(), 'args': vars(args)},
+        'corpus': {
+            'files': len(manifest['files']),
+            'bytes': sum(item['bytes'] for item in manifest['files']),
+            'chunks_by_type': chunk_counts,
+            'chunks': store.total_chunks(),
+        },
+        'llm_requests': llm_requests,
+        'stages': {name: timer.summary() for name, timer in stages.items()},
+    }
+
+    print_stages(report['stages'])
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
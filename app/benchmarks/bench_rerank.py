@@ -0,0 +1,123 @@
+# benchmarks/bench_rerank.py
+"""Cost of the cross-encoder re-ranker against the LLM context tokens it saves.
+
+Run from the app/ directory against the persisted index:
+
+    python -m benchmarks.bench_rerank --questions questions.txt --k 10
+
+Without re-ranking the LLM receives the top-k dense chunks; with it, the
+top RERANK_TOP_N of RERANK_CANDIDATES re-scored chunks.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from config import config
+from services.document_manager import DocumentManager
+from services.reranker import CrossEncoderReranker
+
+DEFAULT_QUESTIONS = [
+    "What penalties are mentioned?",
+    "Which regulations were violated?",
+    "What are the main findings?",
+    "Who is responsible for compliance?",
+    "What deadlines are specified?",
+]
+
+def count_tokens(texts):
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return sum(len(encoding.encode(text)) for text in texts)
+    except ImportError:
+        # Rough estimate: ~4 characters per token
+        return sum(len(text) for text in texts) // 4
+
+def load_questions(path):
+    if not path:
+        return DEFAULT_QUESTIONS
+    questions = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                line = record.get('question') or record.get('body') or record.get('title', '')
+            questions.append(line)
+    return questions
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", help="text file (one question per line) or JSONL with a 'question' field")
+    parser.add_argument("--index", default=config.FAISS_INDEX_PATH)
+    parser.add_argument("--k", type=int, default=config.MAX_CHUNKS_PER_QUERY, help="dense top-k sent to the LLM today")
+    parser.add_argument("--candidates", type=int, default=config.RERANK_CANDIDATES)
+    parser.add_argument("--top-n", type=int, default=config.RERANK_TOP_N)
+    parser.add_argument("--price-per-1k-tokens", type=float, default=0.0, help="LLM input price, for a cost estimate")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    doc_manager = DocumentManager()
+    if not doc_manager.load_vector_store(args.index):
+        parser.error(f"No vector store found at {args.index}; upload documents first")
+    store = doc_manager.vector_store
+    reranker = CrossEncoderReranker(
+        config.RERANKER_MODEL, batch_size=config.RERANK_BATCH_SIZE, margin=config.RERANK_MARGIN
+    )
+
+    questions = load_questions(args.questions)
+    rows = []
+    for question in questions:
+        dense_contexts, _ = store.search(question, k=args.k)
+        candidates, candidate_metadata = store.search(question, k=max(args.k, args.candidates))
+
+        start = time.perf_counter()
+        reranked, reranked_metadata = reranker.rerank(question, candidates, candidate_metadata, top_n=args.top_n)
+        rerank_seconds = time.perf_counter() - start
+
+        rows.append({
+            'question': question,
+            'rerank_ms': rerank_seconds * 1000,
+            'candidates_scored': reranked_metadata[0]['candidates_scored'] if reranked_metadata else 0,
+            'dense_tokens': count_tokens(dense_contexts),
+            'reranked_tokens': count_tokens(reranked),
+        })
+
+    latencies = [row['rerank_ms'] for row in rows]
+    tokens_saved = [row['dense_tokens'] - row['reranked_tokens'] for row in rows]
+    report = {
+        'questions': len(rows),
+        'k': args.k,
+        'candidates': args.candidates,
+        'top_n': args.top_n,
+        'rerank_ms_mean': statistics.mean(latencies),
+        'rerank_ms_p50': percentile(latencies, 50),
+        'rerank_ms_p95': percentile(latencies, 95),
+        'candidates_scored_mean': statistics.mean(row['candidates_scored'] for row in rows),
+        'dense_tokens_mean': statistics.mean(row['dense_tokens'] for row in rows),
+        'reranked_tokens_mean': statistics.mean(row['reranked_tokens'] for row in rows),
+        'tokens_saved_mean': statistics.mean(tokens_saved),
+        'cost_saved_per_query': statistics.mean(tokens_saved) / 1000 * args.price_per_1k_tokens,
+        'per_question': rows,
+    }
+
+    print(f"Re-ranker latency: mean {report['rerank_ms_mean']:.1f} ms, "
+          f"p50 {report['rerank_ms_p50']:.1f} ms, p95 {report['rerank_ms_p95']:.1f} ms "
+          f"({report['candidates_scored_mean']:.1f} candidates scored on average)")
+    print(f"LLM context tokens: {report['dense_tokens_mean']:.0f} dense top-{args.k} -> "
+          f"{report['reranked_tokens_mean']:.0f} re-ranked top-{args.top_n} "
+          f"({report['tokens_saved_mean']:.0f} saved per query)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
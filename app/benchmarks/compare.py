@@ -0,0 +1,71 @@
+# benchmarks/compare.py
+"""Compare two benchmark reports and flag regressions.
+
+Run from the app/ directory:
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.2
+
+For every stage present in both reports, prints p50/p95 latency and
+throughput side by side with the relative change. Exits non-zero if any
+stage's p95 latency grew, or its throughput dropped, by more than
+--threshold (20% by default), so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old
+
+def fmt_change(value):
+    return "" if value is None else f"{value:+.0%}"
+
+def compare(baseline, current, threshold):
+    """Rows of (stage, metric, old, new, change, regressed) for stages in both reports"""
+    rows = []
+    for name, old in baseline['stages'].items():
+        new = current['stages'].get(name)
+        if not new or not old.get('count') or not new.get('count'):
+            continue
+        for metric, higher_is_worse in (('p50_ms', True), ('p95_ms', True), ('throughput_per_sec', False)):
+            delta = change(old.get(metric), new.get(metric))
+            # p50 is reported but only p95 and throughput gate
+            regressed = (
+                delta is not None and metric != 'p50_ms'
+                and (delta > threshold if higher_is_worse else delta < -threshold)
+            )
+            rows.append((name, metric, old.get(metric), new.get(metric), delta, regressed))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}) -> "
+          f"current {current['meta'].get('commit')} ({current['meta'].get('timestamp')})")
+    if baseline.get('corpus', {}).get('chunks') != current.get('corpus', {}).get('chunks'):
+        print("warning: the reports indexed different corpora; numbers are not directly comparable")
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'stage':<22}{'metric':<20}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, metric, old, new, delta, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<22}{metric:<20}{old:>12.2f}{new:>12.2f}{fmt_change(delta):>9}{flag}")
+
+    regressions = [row for row in rows if row[5]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# benchmarks/corpus.py
+"""Reproducible synthetic document corpora for the benchmarks.
+
+Run from the app/ directory:
+
+    python -m benchmarks.corpus --out bench_corpus --docs 10 --pages 3
+
+Writes text-layer PDFs, image-only (scanned) PDFs, PNG images, CSVs and
+DOCX files, plus manifest.json listing every file and the questions the
+query benchmark asks. Text is drawn from a fixed vocabulary of compliance
+"facts" with a seeded RNG, so the same arguments give the same corpus.
+"""
+import argparse
+import csv
+import json
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+SUBJECTS = ["The company", "The board", "The auditor", "The regulator", "The tax office", "The listing committee"]
+ACTIONS = ["imposed a penalty of", "requested a disclosure of", "approved a payment of", "flagged a shortfall of",
+           "set a deadline for a filing of", "reported revenue of"]
+CONTEXTS = ["for late filing", "under the listing regulations", "in the annual audit", "for the third quarter",
+            "after the compliance review", "in the board resolution"]
+QUESTIONS = [
+    "What penalties were imposed for late filing?",
+    "Which disclosures did the regulator request?",
+    "What shortfalls did the auditor flag?",
+    "What deadlines were set for filings?",
+    "What revenue was reported for the third quarter?",
+    "What did the board approve in the resolution?",
+]
+
+FILE_TYPES = ('text_pdf', 'image_pdf', 'image', 'csv', 'docx')
+
+def sentence(rng):
+    amount = rng.randint(1, 500) * 1000
+    return f"{rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} Rs {amount:,} {rng.choice(CONTEXTS)}."
+
+def paragraph(rng, sentences=4):
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+def wrap(text, width=90):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_text_pdf(path, pages):
+    """Minimal PDF with a real text layer (Helvetica), one list of paragraphs per page"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_ref = add(None)  # filled in once the page ids are known
+    page_refs = []
+    for paragraphs in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        for text in paragraphs:
+            for line in wrap(text):
+                ops.append(f"({_pdf_escape(line)}) '")
+            ops.append("T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_refs.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_ref, content, font)
+        ))
+    kids = b" ".join(b"%d 0 R" % ref for ref in page_refs)
+    objects[pages_ref - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    Path(path).write_bytes(bytes(out))
+
+def render_page(paragraphs, size=(1240, 1754)):
+    """White page image with the paragraphs drawn in the default bitmap font (a 'scan')"""
+    image = Image.new('L', size, 255)
+    draw = ImageDraw.Draw(image)
+    y = 60
+    for text in paragraphs:
+        for line in wrap(text, width=110):
+            draw.text((60, y), line, fill=0)
+            y += 16
+        y += 16
+    return image
+
+def write_image_pdf(path, pages):
+    images = [render_page(paragraphs).convert('RGB') for paragraphs in pages]
+    images[0].save(path, "PDF", resolution=150, save_all=True, append_images=images[1:])
+
+def write_image(path, paragraphs):
+    render_page(paragraphs).save(path)
+
+def write_csv(path, rng, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["entity", "event", "amount", "context"])
+        for _ in range(rows):
+            writer.writerow([rng.choice(SUBJECTS), rng.choice(ACTIONS), rng.randint(1, 500) * 1000, rng.choice(CONTEXTS)])
+
+def write_docx(path, paragraphs):
+    from docx import Document
+
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    document.save(path)
+
+def generate_corpus(out_dir, docs=10, pages=3, paragraphs=4, seed=0, types=FILE_TYPES):
+    """Write docs files of each type under out_dir and return the manifest"""
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for file_type in types:
+        for n in range(docs):
+            page_texts = [[paragraph(rng) for _ in range(paragraphs)] for _ in range(pages)]
+            if file_type == 'text_pdf':
+                path = out_dir / f"text_{n:03d}.pdf"
+                write_text_pdf(path, page_texts)
+            elif file_type == 'image_pdf':
+                path = out_dir / f"scan_{n:03d}.pdf"
+                write_image_pdf(path, page_texts)
+            elif file_type == 'image':
+                path = out_dir / f"image_{n:03d}.png"
+                write_image(path, page_texts[0])
+            elif file_type == 'csv':
+                path = out_dir / f"table_{n:03d}.csv"
+                write_csv(path, rng, rows=pages * paragraphs * 5)
+            elif file_type == 'docx':
+                path = out_dir / f"memo_{n:03d}.docx"
+                write_docx(path, [text for page in page_texts for text in page])
+            else:
+                raise ValueError(f"Unknown file type: {file_type}. Choose from {FILE_TYPES}")
+            files.append({'path': str(path), 'type': file_type, 'bytes': path.stat().st_size})
+
+    manifest = {
+        'seed': seed,
+        'docs_per_type': docs,
+        'pages': pages,
+        'paragraphs': paragraphs,
+        'files': files,
+        'questions': QUESTIONS,
+    }
+    with open(out_dir / "manifest.json", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="bench_corpus")
+    parser.add_argument("--docs", type=int, default=10, help="files per type")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--paragraphs", type=int, default=4, help="paragraphs per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--types", default=",".join(FILE_TYPES))
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.out, args.docs, args.pages, args.paragraphs, args.seed, args.types.split(","))
+    total = sum(item['bytes'] for item in manifest['files'])
+    print(f"Wrote {len(manifest['files'])} files ({total / 1e6:.1f} MB) to {args.out}")
+
+if __name__ == "__main__":
+    main()
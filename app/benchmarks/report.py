@@ -0,0 +1,74 @@
+# benchmarks/report.py
+"""Shared helpers for benchmark reports: per-stage summaries and run metadata."""
+import platform
+import statistics
+import subprocess
+import time
+
+class StageTimer:
+    """Collects one latency sample per operation and the units (files, chunks, queries) each one processed"""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.samples = []
+        self.units = 0
+
+    def time(self, fn, *args, units=1, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.append(time.perf_counter() - start)
+        self.units += units
+        return result
+
+    def summary(self):
+        return summarize(self.samples, self.units, self.unit)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def summarize(samples, units=None, unit="ops"):
+    """Latency percentiles (ms) over samples (seconds) and throughput in units/sec"""
+    if not samples:
+        return {'count': 0, 'unit': unit}
+    total = sum(samples)
+    units = len(samples) if units is None else units
+    return {
+        'count': len(samples),
+        'unit': unit,
+        'units': units,
+        'total_seconds': total,
+        'throughput_per_sec': units / total if total > 0 else None,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+def run_metadata():
+    """Where and on what code a report was produced, so runs can be compared"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+def print_stages(stages):
+    print(f"{'stage':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  throughput")
+    for name, stage in stages.items():
+        if not stage.get('count'):
+            print(f"{name:<22}{0:>7}  (skipped)")
+            continue
+        rate = f"{stage['throughput_per_sec']:.1f} {stage['unit']}/s" if stage['throughput_per_sec'] else ""
+        print(f"{name:<22}{stage['count']:>7}{stage['p50_ms']:>10.1f}{stage['p95_ms']:>10.1f}{stage['p99_ms']:>10.1f}  {rate}")
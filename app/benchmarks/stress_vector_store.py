@@ -0,0 +1,106 @@
+# benchmarks/stress_vector_store.py
+"""Hammer FAISSVectorStore with concurrent reads, writes, clears and saves.
+
+Run from the app/ directory:
+
+    python -m benchmarks.stress_vector_store --seconds 20 --readers 8 --writers 2
+
+Every chunk carries its own id in both the text and the metadata, so a
+reader can tell when a hit pairs text with the wrong metadata. Each
+snapshot is also checked for total_chunks() == len(documents). Exits
+non-zero if any inconsistency or exception was observed.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from services.vector_store import FAISSVectorStore
+
+WORDS = "penalty clause listing regulation audit disclosure board filing deadline compliance".split()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=16, help="chunks per add_documents call")
+    args = parser.parse_args()
+
+    store = FAISSVectorStore()
+    ids = itertools.count()
+    stop = threading.Event()
+    errors = []
+    counts = {'searches': 0, 'writes': 0, 'clears': 0, 'saves': 0}
+    counts_lock = threading.Lock()
+
+    def bump(name):
+        with counts_lock:
+            counts[name] += 1
+
+    def writer():
+        rng = random.Random()
+        while not stop.is_set():
+            batch_ids = [next(ids) for _ in range(args.batch)]
+            chunks = [f"chunk {i}: " + " ".join(rng.choices(WORDS, k=12)) for i in batch_ids]
+            store.add_documents(chunks, [{'doc_id': f"DOC{i % 50}", 'chunk_id': i} for i in batch_ids])
+            bump('writes')
+
+    def reader():
+        rng = random.Random()
+        while not stop.is_set():
+            generation = store.snapshot()
+            if store.total_chunks(generation) != len(generation.documents) or len(generation.documents) != len(generation.metadata):
+                errors.append(f"generation {generation.version}: index/doc/metadata sizes disagree")
+            query = " ".join(rng.choices(WORDS, k=3))
+            for hit in store.search_hits_batch([query], k=rng.choice([1, 5, 20]))[0]:
+                if not hit['text'].startswith(f"chunk {hit['metadata']['chunk_id']}:"):
+                    errors.append(f"text/metadata mismatch at index {hit['index']}")
+            bump('searches')
+
+    def maintainer(path):
+        while not stop.is_set():
+            time.sleep(0.5)
+            store.save_index(path)
+            bump('saves')
+            if random.random() < 0.2:
+                store.clear()
+                bump('clears')
+
+    def guarded(target, *target_args):
+        def run():
+            try:
+                target(*target_args)
+            except Exception as e:
+                errors.append(f"{target.__name__}: {e!r}")
+                stop.set()
+        return threading.Thread(target=run, daemon=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        threads = [guarded(writer) for _ in range(args.writers)]
+        threads += [guarded(reader) for _ in range(args.readers)]
+        threads.append(guarded(maintainer, os.path.join(tmp, "stress_store")))
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+    print(f"{counts['searches']} searches ({counts['searches'] / elapsed:.0f}/s), "
+          f"{counts['writes']} writes, {counts['clears']} clears, {counts['saves']} saves "
+          f"in {elapsed:.1f}s; final size {len(store.documents)} chunks")
+    if errors:
+        print(f"{len(errors)} problems, first: {errors[0]}")
+        sys.exit(1)
+    print("No inconsistencies observed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/stub_llm.py
+"""OpenAI-compatible stub LLM server, so query benchmarks measure our code and not the provider.
+
+Run from the app/ directory:
+
+    python -m benchmarks.stub_llm --port 8001 --latency 0.5 --tokens-per-second 200
+
+and point the API at it with GROQ_API_BASE=http://127.0.0.1:8001/v1. It
+answers POST /v1/chat/completions (streaming and non-streaming) with a
+well-formed JSON answer citing the document ids found in the prompt, after
+a fixed first-token latency plus a per-token delay.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DOC_ID = re.compile(r'\[Document ([^\]]+)\]')
+
+def build_answer(prompt):
+    """Canned answer in the JSON layout DocumentQAAgent asks for"""
+    doc_ids = list(dict.fromkeys(match.strip() for match in DOC_ID.findall(prompt))) or ["DOC1"]
+    return json.dumps({
+        'individual_answers': [
+            {'document_id': doc_id, 'answer': f"Stub answer drawn from {doc_id}.", 'citation': "Page 1, Para 1"}
+            for doc_id in doc_ids
+        ],
+        'themes': [{
+            'name': "Benchmark theme",
+            'supporting_docs': [f"{doc_id} (Page 1, Para 1)" for doc_id in doc_ids],
+            'summary': "Stub summary of the documents.",
+        }],
+        'synthesized_answer': "Stub synthesized answer across all documents.",
+    })
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        prompt = "\n".join(str(message.get('content', '')) for message in body.get('messages', []))
+        answer = build_answer(prompt)
+        # ~4 characters per token
+        pieces = [answer[i:i + 4] for i in range(0, len(answer), 4)]
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+
+        time.sleep(server.latency)
+        if body.get('stream'):
+            self._stream(body, pieces)
+        else:
+            time.sleep(len(pieces) / server.tokens_per_second)
+            self._send_json({
+                'id': "stub",
+                'object': "chat.completion",
+                'created': int(time.time()),
+                'model': body.get('model', "stub"),
+                'choices': [{'index': 0, 'message': {'role': "assistant", 'content': answer}, 'finish_reason': "stop"}],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(pieces),
+                          'total_tokens': len(prompt) // 4 + len(pieces)},
+            })
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, pieces):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send(data):
+            event = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+
+        delay = 1 / self.server.tokens_per_second
+        for n, piece in enumerate(pieces):
+            send(json.dumps({
+                'id': "stub",
+                'object': "chat.completion.chunk",
+                'created': int(time.time()),
+                'model': body.get('model', "stub"),
+                'choices': [{'index': 0, 'delta': {'content': piece} if n else {'role': "assistant", 'content': piece},
+                             'finish_reason': None}],
+            }))
+            time.sleep(delay)
+        send(json.dumps({
+            'id': "stub", 'object': "chat.completion.chunk", 'created': int(time.time()),
+            'model': body.get('model', "stub"), 'choices': [{'index': 0, 'delta': {}, 'finish_reason': "stop"}],
+        }))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Stub server on host:port (port 0 picks a free one); start() serves from a daemon thread"""
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, tokens_per_second=1000.0):
+        super().__init__((host, port), StubLLMHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True).start()
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.tokens_per_second)
+    print(f"Stub LLM listening on {server.url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
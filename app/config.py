@@ -15,11 +15,55 @@ class Config:
     GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1")
     LLM_MODEL = os.getenv("LLM_MODEL", "llama3-70b-8192")
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+    # embedding model and backend: "torch" (sentence-transformers) or "onnx"
+    # (exported once to MODELS_DIR, int8-quantized unless ONNX_QUANTIZE=false;
+    # needs requirements-onnx.txt). EMBEDDING_DIMENSION is looked
+    # up for known models, set it for others to avoid loading the model at
+    # startup. A saved index built with another model is refused unless
+    # REEMBED_ON_MODEL_CHANGE=true, which re-embeds the stored chunks on load.
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+    EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "0")) or None
+    REEMBED_ON_MODEL_CHANGE = os.getenv("REEMBED_ON_MODEL_CHANGE", "false").lower() == "true"
+
+    # background re-index (POST /reindex, needs the admin token): chunks per
+    # embedding batch and a cap on chunks embedded per second (0 = as fast as possible)
+    REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "256"))
+    REINDEX_MAX_RATE = float(os.getenv("REINDEX_MAX_RATE", "0"))
+    # models /reindex may switch to, besides EMBEDDING_MODEL (comma separated)
+    REINDEX_MODELS = [model.strip() for model in os.getenv("REINDEX_MODELS", "").split(",") if model.strip()]
 
     #vector store
     FAISS_INDEX_PATH = "data/vector_store"
-    EMBEDDING_DIMENSION = 384
+
+    # "faiss" (single index) or "sharded" (NUM_SHARDS local shards, or remote
+    # shard servers when SHARD_ADDRESSES lists host:port entries)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "faiss").lower()
+    NUM_SHARDS = int(os.getenv("NUM_SHARDS", "4"))
+    SHARD_KEY = os.getenv("SHARD_KEY", "doc_id")
+    SHARD_ADDRESSES = [address.strip() for address in os.getenv("SHARD_ADDRESSES", "").split(",") if address.strip()]
+    # secret shared with the shard servers; required with SHARD_ADDRESSES
+    SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "")
+
+    # index quantization: "flat" (float32), "fp16", "sq8" (int8 scalar
+    # quantizer) or "pq" (product quantizer, PQ_M bytes per vector). sq8/pq
+    # are trained once INDEX_TRAIN_SIZE vectors exist; INDEX_EXACT_RERANK
+    # re-scores INDEX_RERANK_FACTOR x k candidates against the float store
+    # (default: on for pq only)
+    INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+    PQ_M = int(os.getenv("PQ_M", "48"))
+    INDEX_TRAIN_SIZE = int(os.getenv("INDEX_TRAIN_SIZE", "0"))
+    INDEX_EXACT_RERANK = None if os.getenv("INDEX_EXACT_RERANK") is None else os.getenv("INDEX_EXACT_RERANK").lower() == "true"
+    INDEX_RERANK_FACTOR = int(os.getenv("INDEX_RERANK_FACTOR", "4"))
+
+    # serving mode: "single" (one read-write process), "writer" (owns ingestion,
+    # publishes index generations) or "reader" (read-only mmap replica that
+    # hot-reloads generations published by the writer)
+    SERVING_MODE = os.getenv("SERVING_MODE", "single").lower()
+    INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "1.0"))
+    WRITER_URL = os.getenv("WRITER_URL", "")
     CHUNK_SIZE = 300
     CHUNK_OVERLAP = 50
     MAX_CHUNKS_PER_QUERY = 10
@@ -27,11 +71,33 @@ class Config:
     #upload
     UPLOAD_FOLDER = "uploads"
     MAX_FILE_SIZE = 50 * 1024 * 1024
-    ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.jpg', '.jpeg', '.png', '.md', '.csv', '.docx'}
+    # Chunked uploads (/uploads): size of each PUT and where partial files are kept
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(4 * 1024 * 1024)))
+    PARTIAL_UPLOADS_DIR = BASE_DIR / UPLOAD_FOLDER / "partial"
+    ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.md', '.csv', '.docx'}
 
     # query
     MAX_QUERY_LENGTH = 1000
     MIN_SIMILARITY_SCORE = 0.3
+    MAX_SEARCH_PAGE_SIZE = 100
+    MAX_SEARCH_DEPTH = int(os.getenv("MAX_SEARCH_DEPTH", "1000"))
+    MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "1000"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+    # Conversation sessions (QueryRequest.session_id)
+    SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "4"))
+    SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "1500"))
+    SESSION_MAX_CHUNKS = int(os.getenv("SESSION_MAX_CHUNKS", "50"))
+
+    # re-ranking (optional cross-encoder between FAISS and the LLM)
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+    RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "4"))
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    RERANK_MARGIN = float(os.getenv("RERANK_MARGIN", "2.0"))
 
     # theme
     MAX_THEMES = 5
@@ -41,14 +107,39 @@ class Config:
     DATA_DIR = BASE_DIR / "data"
     UPLOADS_DIR = BASE_DIR / UPLOAD_FOLDER
     LOGS_DIR = BASE_DIR / "logs"
+    MODELS_DIR = Path(os.getenv("MODELS_DIR", str(DATA_DIR / "models")))
 
     #OCR
-    TESSERACT_CONFIG = '--oem 3 --psm 6'
+    TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", '--oem 3 --psm 6')
+    OCR_LANG = os.getenv("OCR_LANG", "eng")
+    # Images are resampled to this resolution (when their DPI is known) and
+    # capped at OCR_MAX_DIMENSION pixels on the longest side
+    OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+    OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "4000"))
+    OCR_DESKEW = os.getenv("OCR_DESKEW", "true").lower() == "true"
+    OCR_MAX_SKEW = float(os.getenv("OCR_MAX_SKEW", "5"))
+    # Pages larger than OCR_REGION_PIXELS are split into bands OCRed in parallel
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+    OCR_REGION_PIXELS = int(os.getenv("OCR_REGION_PIXELS", "3000000"))
+    OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    OCR_CACHE_PATH = Path(os.getenv("OCR_CACHE_PATH", str(DATA_DIR / "ocr_cache.sqlite3")))
+    OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "10000"))
 
     #logging
     LOG_LEVEL = "INFO"
     LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
+    #profiling: "header" profiles requests sent with X-Profile: 1 and the admin token,
+    # "all" profiles a PROFILE_SAMPLE_RATE fraction of requests to PROFILE_PATHS
+    PROFILE_MODE = os.getenv("PROFILE_MODE", "header").lower()
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+    PROFILE_PATHS = [path.strip() for path in os.getenv("PROFILE_PATHS", "/upload,/query").split(",") if path.strip()]
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILES_DIR = LOGS_DIR / "profiles"
+
+    # Required by the /admin endpoints; they are disabled while it is empty
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
     @classmethod
     def create_directories(cls):
         for dir_path in [cls.DATA_DIR, cls.UPLOADS_DIR, cls.LOGS_DIR]:
@@ -69,6 +160,48 @@ class Config:
         if cls.MAX_CHUNKS_PER_QUERY <= 0:
             errors.append("MAX_CHUNKS_PER_QUERY must be positive")
 
+        if cls.SERVING_MODE not in ("single", "writer", "reader"):
+            errors.append("SERVING_MODE must be one of: single, writer, reader")
+
+        if cls.VECTOR_STORE_BACKEND not in ("faiss", "sharded"):
+            errors.append("VECTOR_STORE_BACKEND must be faiss or sharded")
+
+        if cls.VECTOR_STORE_BACKEND == "sharded" and not cls.SHARD_ADDRESSES and cls.NUM_SHARDS <= 0:
+            errors.append("NUM_SHARDS must be positive")
+
+        if cls.VECTOR_STORE_BACKEND == "sharded" and cls.SHARD_ADDRESSES and cls.SHARD_AUTHKEY in ("", "shard"):
+            errors.append("SHARD_AUTHKEY must be set to a secret shared with the shard servers")
+
+        if cls.INDEX_TYPE not in ("flat", "fp16", "sq8", "pq"):
+            errors.append("INDEX_TYPE must be one of: flat, fp16, sq8, pq")
+
+        if cls.EMBEDDING_BACKEND not in ("torch", "onnx"):
+            errors.append("EMBEDDING_BACKEND must be torch or onnx")
+
+        if cls.INDEX_TYPE == "pq" and cls.EMBEDDING_DIMENSION and cls.EMBEDDING_DIMENSION % cls.PQ_M:
+            errors.append("PQ_M must divide EMBEDDING_DIMENSION")
+
+        if cls.REINDEX_BATCH_SIZE <= 0 or cls.REINDEX_MAX_RATE < 0:
+            errors.append("REINDEX_BATCH_SIZE must be positive and REINDEX_MAX_RATE non-negative")
+
+        if cls.LLM_MAX_CONCURRENCY <= 0:
+            errors.append("LLM_MAX_CONCURRENCY must be positive")
+
+        if cls.UPLOAD_CHUNK_SIZE <= 0:
+            errors.append("UPLOAD_CHUNK_SIZE must be positive")
+
+        if min(cls.SESSION_MAX_SESSIONS, cls.SESSION_TTL_SECONDS, cls.SESSION_MAX_CHUNKS) <= 0 or cls.SESSION_MAX_TURNS < 0:
+            errors.append("SESSION_MAX_SESSIONS, SESSION_TTL_SECONDS and SESSION_MAX_CHUNKS must be positive")
+
+        if cls.OCR_DPI <= 0 or cls.OCR_MAX_DIMENSION <= 0 or cls.OCR_WORKERS <= 0 or cls.OCR_REGION_PIXELS <= 0:
+            errors.append("OCR_DPI, OCR_MAX_DIMENSION, OCR_WORKERS and OCR_REGION_PIXELS must be positive")
+
+        if cls.PROFILE_MODE not in ("off", "header", "all"):
+            errors.append("PROFILE_MODE must be one of: off, header, all")
+
+        if not 0 <= cls.PROFILE_SAMPLE_RATE <= 1 or cls.PROFILE_MAX_FILES <= 0:
+            errors.append("PROFILE_SAMPLE_RATE must be between 0 and 1 and PROFILE_MAX_FILES positive")
+
         if errors:
             raise ValueError("Configuration errors: " + "; ".join(errors))
 
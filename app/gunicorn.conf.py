@@ -0,0 +1,25 @@
+# gunicorn.conf.py - read-only query workers sharing one memory-mapped index
+#
+#   SERVING_MODE=writer uvicorn main:app --port 8001          # ingestion
+#   gunicorn -c gunicorn.conf.py main:app                     # queries
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app once in the master so workers share the loaded modules
+# copy-on-write; the index itself is mmapped by each worker.
+preload_app = True
+raw_env = ["SERVING_MODE=reader"]
+
+def post_worker_init(worker):
+    # The embedding model is loaded lazily and torch does not survive fork, so
+    # each worker loads its own copy here rather than on its first query
+    from services.encoders import get_encoder
+    get_encoder()
+
+# Conversation sessions (/query with session_id) live in each worker's
+# memory and need session affinity, which gunicorn does not provide; see
+# "Conversation sessions" in the README.
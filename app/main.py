@@ -1,17 +1,29 @@
 # backend/app/main.py
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, BackgroundTasks, Depends, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import os
 import tempfile
 import shutil
 from pathlib import Path
 import logging
 import uuid
+import asyncio
+import json
+import time
+import base64
+import hashlib
+import random
+import secrets
 from services.document_manager import DocumentManager
 from services.query import QueryProcessor
+from services import metrics
+from services.profiler import RequestProfiler, profiled
+from services.sessions import SessionStore
+from services.uploads import ChunkedUploads
 from config import config
 
 logging.basicConfig(level=config.LOG_LEVEL,format=config.LOG_FORMAT)
@@ -38,11 +50,55 @@ query_processor = QueryProcessor()
 #share the same vector store instance
 query_processor.vector_store = doc_manager.vector_store
 
+profiler = RequestProfiler(config.PROFILES_DIR, max_profiles=config.PROFILE_MAX_FILES)
+
+uploads = ChunkedUploads(config.PARTIAL_UPLOADS_DIR, config.MAX_FILE_SIZE)
+
+# Conversation state for /query follow-ups, per worker process
+sessions = SessionStore(
+    max_sessions=config.SESSION_MAX_SESSIONS,
+    ttl=config.SESSION_TTL_SECONDS,
+    max_turns=config.SESSION_MAX_TURNS,
+    summary_chars=config.SESSION_SUMMARY_CHARS,
+    max_chunks=config.SESSION_MAX_CHUNKS
+)
+
 #pydantic models for request/response
 class QueryRequest(BaseModel):
     question: str
     max_results: Optional[int] = 10
     include_metadata: Optional[bool] = True
+    session_id: Optional[str] = None
+    # Only search chunks uploaded for this tenant
+    tenant: Optional[str] = None
+
+class ChunkedUploadRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: str
+    doc_id: Optional[str] = None
+    tenant: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    max_results: Optional[int] = 10
+    retrieval_only: Optional[bool] = False
+
+class SearchRequest(BaseModel):
+    query: str
+    limit: Optional[int] = 10
+    cursor: Optional[str] = None
+    filters: Optional[Dict[str, Any]] = None
+
+class ReindexRequest(BaseModel):
+    embedding_model: Optional[str] = None
+    index_type: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: List[dict]
+    next_cursor: Optional[str] = None
+    processing_time: Optional[float] = None
 
 class QueryResponse(BaseModel):
     question: str
@@ -51,6 +107,8 @@ class QueryResponse(BaseModel):
     synthesized_answer: str
     total_documents_searched: int
     processing_time: Optional[float] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    session_id: Optional[str] = None
 
 class UploadResponse(BaseModel):
     status: str
@@ -79,26 +137,155 @@ async def startup_event():
         logger.error(f"Configuration error: {e}")
         raise
     
+    # Only one process may publish index generations
+    if config.SERVING_MODE == "writer":
+        doc_manager.acquire_writer_lock(config.FAISS_INDEX_PATH)
+        logger.info("Running as the index writer process")
+
     # load th
     try:
-        if doc_manager.load_vector_store(config.FAISS_INDEX_PATH):
+        if doc_manager.load_vector_store(config.FAISS_INDEX_PATH, use_mmap=config.SERVING_MODE == "reader"):
             stats = doc_manager.get_document_stats()
             logger.info(f"Loaded existing vector store with {stats['total_documents']} documents")
         else:
             logger.info("No existing vector store found, starting fresh")
     except Exception as e:
-        logger.warning(f"Could not load vector store: {e}")
+        if config.SERVING_MODE == "reader":
+            # Replicas never write; they pick up the next generation the writer publishes
+            logger.warning(f"Could not load vector store: {e}")
+        else:
+            # Starting empty would publish new generations over the saved index
+            # and prune it, e.g. when it was built with another embedding model
+            logger.error(f"Could not load vector store from {config.FAISS_INDEX_PATH}: {e}")
+            raise
 
 # Shutdown logs 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Save vector store on shutdown"""
+    if config.SERVING_MODE == "reader":
+        return
     try:
         doc_manager.save_vector_store(config.FAISS_INDEX_PATH)
         logger.info("Vector store saved successfully")
     except Exception as e:
         logger.error(f"Error saving vector store: {e}")
 
+@app.middleware("http")
+async def refresh_vector_store(request, call_next):
+    """Read-only replicas pick up generations published by the writer process"""
+    if config.SERVING_MODE == "reader":
+        try:
+            if await run_in_threadpool(
+                doc_manager.refresh_vector_store, config.FAISS_INDEX_PATH, config.INDEX_RELOAD_INTERVAL
+            ):
+                logger.info(f"Reloaded vector store generation {doc_manager.vector_store.disk_version}")
+        except Exception as e:
+            logger.warning(f"Could not reload vector store: {e}")
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Latency histogram per route and an in-flight gauge for every HTTP request"""
+    start = time.perf_counter()
+    status = 500
+    with metrics.HTTP_IN_FLIGHT.track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            # Route template, not the raw URL, to keep label cardinality bounded
+            route = request.scope.get('route')
+            metrics.HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                path=route.path if route is not None else "unmatched",
+                status=status
+            )
+    return response
+
+def is_admin(token):
+    return bool(config.ADMIN_TOKEN) and bool(token) and secrets.compare_digest(token, config.ADMIN_TOKEN)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard for /admin endpoints: X-Admin-Token must match ADMIN_TOKEN"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+def should_profile(request):
+    if config.PROFILE_MODE == "off" or request.url.path not in config.PROFILE_PATHS:
+        return False
+    if config.PROFILE_MODE == "all":
+        return random.random() < config.PROFILE_SAMPLE_RATE
+    return (
+        request.headers.get("x-profile", "").lower() in ("1", "true")
+        and is_admin(request.headers.get("x-admin-token"))
+    )
+
+@app.middleware("http")
+async def profile_request(request, call_next):
+    """Opt-in CPU and memory profile of a single request, saved under LOGS_DIR/profiles"""
+    if not should_profile(request):
+        return await call_next(request)
+
+    session = profiler.start(f"{request.method} {request.url.path}")
+    if session is None:
+        # Another request is being profiled; serve this one normally
+        response = await call_next(request)
+        response.headers["X-Profile"] = "busy"
+        return response
+
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        profile_id = session.stop(status)
+        logger.info(f"Saved profile {profile_id} for {request.method} {request.url.path}")
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+# Gauges read from the live vector store when /metrics is scraped
+def cache_hit_ratios():
+    stats = doc_manager.vector_store.cache_stats
+    ratios = {}
+    for cache in ('embedding', 'result'):
+        lookups = stats[f'{cache}_hits'] + stats[f'{cache}_misses']
+        ratios[(cache,)] = stats[f'{cache}_hits'] / lookups if lookups else 0.0
+    return ratios
+
+metrics.registry.gauge(
+    "docqa_index_chunks", "Chunks in the current index generation",
+    callback=lambda: {(): doc_manager.vector_store.total_chunks()}
+)
+metrics.registry.gauge(
+    "docqa_index_bytes", "Memory used by the FAISS index codes",
+    callback=lambda: {(): doc_manager.vector_store.index_stats()['index_bytes']}
+)
+metrics.registry.gauge(
+    "docqa_float_store_bytes", "Size of the exact float vectors kept for re-ranking (memory-mapped)",
+    callback=lambda: {(): doc_manager.vector_store.index_stats()['float_store_bytes']}
+)
+metrics.registry.gauge(
+    "docqa_documents", "Documents in the index",
+    callback=lambda: {(): doc_manager.get_document_stats()['total_documents']}
+)
+metrics.registry.gauge(
+    "docqa_sessions", "Active conversation sessions", callback=lambda: {(): len(sessions)}
+)
+metrics.registry.gauge(
+    "docqa_cache_hit_ratio", "Hit ratio of the query embedding and result caches", ["cache"],
+    callback=cache_hit_ratios
+)
+
+def require_writer():
+    """Reject writes on read-only replicas"""
+    if config.SERVING_MODE == "reader":
+        target = f" Send it to the writer at {config.WRITER_URL}." if config.WRITER_URL else ""
+        raise HTTPException(status_code=403, detail=f"This worker is a read-only replica.{target}")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -114,9 +301,11 @@ async def root():
 async def upload_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    doc_id: Optional[str] = Form(None)
+    doc_id: Optional[str] = Form(None),
+    tenant: Optional[str] = Form(None)
 ):
     """Upload and process a single document"""
+    require_writer()
 
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
@@ -148,7 +337,7 @@ async def upload_file(
             temp_file_path = temp_file.name
  
         logger.info(f"Processing document: {file.filename} (ID: {doc_id})")
-        chunks_processed = doc_manager.upload_and_process_document(temp_file_path, doc_id)
+        chunks_processed = doc_manager.upload_and_process_document(temp_file_path, doc_id, tenant=tenant)
 
         background_tasks.add_task(save_vector_store_background)
 
@@ -174,12 +363,90 @@ async def upload_file(
         if temp_file_path and os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
 
+@app.get("/config")
+async def get_client_config():
+    """Upload limits and accepted file types, so clients need not hard-code them"""
+    return {
+        "allowed_extensions": sorted(config.ALLOWED_EXTENSIONS),
+        "max_file_size": config.MAX_FILE_SIZE,
+        "upload_chunk_size": config.UPLOAD_CHUNK_SIZE,
+        "max_query_length": config.MAX_QUERY_LENGTH
+    }
+
+@app.post("/uploads")
+async def start_chunked_upload(request: ChunkedUploadRequest):
+    """Start or resume a chunked upload; files already in the index (same sha256) are not uploaded again"""
+    require_writer()
+
+    file_ext = Path(request.filename).suffix.lower()
+    if file_ext not in config.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {file_ext} not supported. Allowed: {config.ALLOWED_EXTENSIONS}"
+        )
+    try:
+        state = uploads.start(request.filename, request.size, request.sha256, request.doc_id, request.tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if state['state'] == 'receiving':
+        existing = doc_manager.find_document(request.sha256, request.tenant)
+        if existing is not None:
+            state = uploads.update(state['upload_id'], state='duplicate', document_id=existing)
+            logger.info(f"Skipped upload of {request.filename}: already indexed as {existing}")
+    return uploads.public(state)
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """Append the request body to an upload at offset (the number of bytes the server already has)"""
+    require_writer()
+    # The chunk is held in memory, so refuse oversized bodies before (and while) reading them
+    too_large = f"Chunks are limited to UPLOAD_CHUNK_SIZE ({config.UPLOAD_CHUNK_SIZE} bytes)"
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > config.UPLOAD_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail=too_large)
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > config.UPLOAD_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail=too_large)
+    try:
+        state = await run_in_threadpool(uploads.append, upload_id, offset, bytes(data))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found; start it again with POST /uploads")
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return uploads.public(state)
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_chunked_upload(upload_id: str, background_tasks: BackgroundTasks):
+    """Verify the uploaded file and process it in the background; poll GET /uploads/{upload_id} for progress"""
+    require_writer()
+    try:
+        file_path = await run_in_threadpool(uploads.complete, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found; start it again with POST /uploads")
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    background_tasks.add_task(process_chunked_upload, upload_id, file_path)
+    return uploads.public(uploads.status(upload_id))
+
+@app.get("/uploads/{upload_id}")
+async def get_upload_status(upload_id: str):
+    """Progress of a chunked upload: receiving, verifying, processing, done, duplicate or failed"""
+    state = uploads.status(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return uploads.public(state)
+
 @app.post("/upload-batch")
 async def upload_batch_files(
     background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...)
 ):
     """Upload and process multiple documents"""
+    require_writer()
     
     if len(files) > 50:  # Reasonable batch limit
         raise HTTPException(status_code=400, detail="Too many files. Maximum 50 files per batch")
@@ -242,11 +509,8 @@ async def upload_batch_files(
             if os.path.exists(temp_file):
                 os.unlink(temp_file)
 
-@app.post("/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
-    """Query documents with theme identification"""
-    
-    # Validate query
+def check_query_request(request):
+    """Validate a /query request and return the document stats it is answered against"""
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
@@ -255,27 +519,48 @@ async def query_documents(request: QueryRequest):
             status_code=400, 
             detail=f"Question too long. Maximum {config.MAX_QUERY_LENGTH} characters"
         )
+
+    if request.session_id is not None and not 0 < len(request.session_id) <= 128:
+        raise HTTPException(status_code=400, detail="session_id must be 1 to 128 characters")
     
     # Check if any documents are loaded
     stats = doc_manager.get_document_stats()
     if stats['total_documents'] == 0:
         raise HTTPException(status_code=400, detail="No documents loaded. Please upload documents first")
+    return stats
+
+def tenant_filters(request):
+    """Metadata filters that keep a /query to the request's tenant, if it names one"""
+    return {'tenant': request.tenant} if request.tenant else None
+
+@app.post("/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest):
+    """Query documents with theme identification"""
+    stats = check_query_request(request)
     
     try:
-        import time
         start_time = time.time()
+        stage_timings = metrics.start_request()
         
         logger.info(f"Processing query: {request.question[:100]}...")
         
-        # Process query
-        results = query_processor.process_query(
+        # Process query; follow-ups in a session reuse its history and retrieved chunks
+        # Off the event loop: the LLM call blocks, and so may a busy session's lock
+        session = sessions.get(request.session_id, request.tenant) if request.session_id else None
+        results = await run_in_threadpool(
+            profiled(query_processor.process_query),
             request.question, 
-            k=min(request.max_results, config.MAX_CHUNKS_PER_QUERY)
+            k=min(request.max_results, config.MAX_CHUNKS_PER_QUERY),
+            session=session,
+            filters=tenant_filters(request)
         )
         
         processing_time = time.time() - start_time
         
-        logger.info(f"Query processed in {processing_time:.2f}s, found {len(results['individual_answers'])} matches")
+        logger.info(
+            f"Query processed in {processing_time:.2f}s, found {len(results['individual_answers'])} matches, "
+            f"stages: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in stage_timings.items())
+        )
         
         return QueryResponse(
             question=request.question,
@@ -283,7 +568,9 @@ async def query_documents(request: QueryRequest):
             themes=results['themes'],
             synthesized_answer=results['synthesized_answer'],
             total_documents_searched=stats['total_documents'],
-            processing_time=processing_time
+            processing_time=processing_time,
+            stage_timings=stage_timings,
+            session_id=request.session_id
         )
         
     except Exception as e:
@@ -291,6 +578,267 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 
+@app.post("/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Query documents, streaming NDJSON: partial results while the answer is written, then the final one"""
+    stats = check_query_request(request)
+    start_time = time.time()
+    # Shared with the threads the generator runs on
+    stage_timings = metrics.start_request()
+    session = sessions.get(request.session_id, request.tenant) if request.session_id else None
+    logger.info(f"Streaming query: {request.question[:100]}...")
+
+    def stream_results():
+        try:
+            for results, final in query_processor.stream_query(
+                request.question,
+                k=min(request.max_results, config.MAX_CHUNKS_PER_QUERY),
+                session=session,
+                filters=tenant_filters(request)
+            ):
+                line = {
+                    "type": "final" if final else "partial",
+                    "question": request.question,
+                    "individual_answers": results['individual_answers'],
+                    "themes": results['themes'],
+                    "synthesized_answer": results['synthesized_answer']
+                }
+                if final:
+                    line.update(
+                        total_documents_searched=stats['total_documents'],
+                        processing_time=time.time() - start_time,
+                        stage_timings=stage_timings,
+                        session_id=request.session_id
+                    )
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield json.dumps({"type": "error", "detail": f"Error processing query: {str(e)}"}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/query-batch")
+async def query_documents_batch(request: BatchQueryRequest):
+    """Answer many questions at once, streaming one JSON line per question as it completes"""
+
+    questions = request.questions
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions provided")
+
+    if len(questions) > config.MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many questions. Maximum {config.MAX_BATCH_QUERIES} per batch"
+        )
+
+    for question in questions:
+        if not question.strip():
+            raise HTTPException(status_code=400, detail="Questions cannot be empty")
+        if len(question) > config.MAX_QUERY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Question too long. Maximum {config.MAX_QUERY_LENGTH} characters"
+            )
+
+    stats = doc_manager.get_document_stats()
+    if stats['total_documents'] == 0:
+        raise HTTPException(status_code=400, detail="No documents loaded. Please upload documents first")
+
+    k = min(request.max_results, config.MAX_CHUNKS_PER_QUERY)
+    start_time = time.time()
+
+    # One encode call and one FAISS search for the whole batch
+    retrievals = await run_in_threadpool(
+        query_processor.vector_store.search_batch, questions, query_processor.candidate_depth(k)
+    )
+    logger.info(f"Retrieved context for {len(questions)} questions in {time.time() - start_time:.2f}s")
+
+    async def stream_results():
+        if request.retrieval_only:
+            for index, (question, (contexts, metadata_list)) in enumerate(zip(questions, retrievals)):
+                contexts, metadata_list = contexts[:k], metadata_list[:k]
+                yield json.dumps({
+                    "index": index,
+                    "question": question,
+                    "hits": [
+                        format_hit(context, metadata, metadata.get('score', 0.0))
+                        for context, metadata in zip(contexts, metadata_list)
+                    ]
+                }) + "\n"
+            return
+
+        # Bound the number of LLM calls in flight
+        semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+
+        async def answer(index, question, contexts, metadata_list):
+            # Each task runs in its own context, so its timings stay separate
+            stage_timings = metrics.start_request()
+            with metrics.LLM_QUEUE_DEPTH.track_inprogress():
+                await semaphore.acquire()
+            try:
+                question_start = time.time()
+                try:
+                    contexts, metadata_list = await run_in_threadpool(
+                        query_processor.select_context, question, contexts, metadata_list, k
+                    )
+                    results = await run_in_threadpool(
+                        query_processor.answer_from_context, question, contexts, metadata_list
+                    )
+                except Exception as e:
+                    logger.error(f"Error processing batch question {index}: {e}")
+                    return {"index": index, "question": question, "error": str(e)}
+
+                return {
+                    "index": index,
+                    "question": question,
+                    "individual_answers": results['individual_answers'],
+                    "themes": results['themes'],
+                    "synthesized_answer": results['synthesized_answer'],
+                    "processing_time": time.time() - question_start,
+                    "stage_timings": stage_timings
+                }
+            finally:
+                semaphore.release()
+
+        tasks = [
+            asyncio.create_task(answer(index, question, contexts, metadata_list))
+            for index, (question, (contexts, metadata_list)) in enumerate(zip(questions, retrievals))
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        logger.info(f"Batch of {len(questions)} questions processed in {time.time() - start_time:.2f}s")
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/search", response_model=SearchResponse)
+async def search_documents(request: SearchRequest):
+    """Retrieval only: scored passages with citations, no LLM call"""
+
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    if len(request.query) > config.MAX_QUERY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Query too long. Maximum {config.MAX_QUERY_LENGTH} characters"
+        )
+
+    # "limit": null means the default page size
+    limit = max(1, min(10 if request.limit is None else request.limit, config.MAX_SEARCH_PAGE_SIZE))
+    fingerprint = search_fingerprint(request.query, request.filters)
+    offset = decode_cursor(request.cursor, fingerprint) if request.cursor else 0
+
+    start_time = time.time()
+    # Off the event loop: encoding the query and the FAISS search block
+    hits, has_more = await run_in_threadpool(
+        query_processor.vector_store.search_page,
+        request.query,
+        offset=offset,
+        limit=limit,
+        filters=request.filters,
+        max_depth=config.MAX_SEARCH_DEPTH
+    )
+
+    return SearchResponse(
+        query=request.query,
+        hits=[format_hit(hit['text'], hit['metadata'], hit['score']) for hit in hits],
+        next_cursor=encode_cursor(offset + limit, fingerprint) if has_more else None,
+        processing_time=time.time() - start_time
+    )
+
+@app.get("/index/stats")
+async def get_index_stats(recall_sample: int = 0, k: int = 10, x_admin_token: Optional[str] = Header(None)):
+    """Index memory footprint and, with recall_sample > 0 (admin only), measured recall@k"""
+    if recall_sample < 0 or k <= 0:
+        raise HTTPException(status_code=400, detail="recall_sample must be >= 0 and k positive")
+    if recall_sample > 0:
+        # Each sampled vector is an exact search over the whole index
+        require_admin(x_admin_token)
+    return await run_in_threadpool(doc_manager.vector_store.index_stats, min(recall_sample, 1000), k)
+
+
+@app.post("/reindex", dependencies=[Depends(require_admin)])
+async def start_reindex(request: ReindexRequest):
+    """Rebuild the index in the background, e.g. with a new embedding model or index type"""
+    require_writer()
+    if request.index_type and request.index_type not in ("flat", "fp16", "sq8", "pq"):
+        raise HTTPException(status_code=400, detail="index_type must be one of: flat, fp16, sq8, pq")
+    # Any other name would be downloaded and loaded into this process
+    allowed_models = {config.EMBEDDING_MODEL, doc_manager.vector_store.embedding_model, *config.REINDEX_MODELS}
+    if request.embedding_model and request.embedding_model not in allowed_models:
+        raise HTTPException(
+            status_code=400,
+            detail=f"embedding_model must be one of: {', '.join(sorted(allowed_models))} (set REINDEX_MODELS)"
+        )
+
+    def save_rebuilt_index():
+        # Publish the rebuilt generation; read replicas pick it up (and its model) on refresh
+        doc_manager.save_vector_store(config.FAISS_INDEX_PATH)
+        logger.info("Re-indexed vector store saved")
+
+    try:
+        # May load the new model to check its dimension
+        status = await run_in_threadpool(
+            doc_manager.start_reindex,
+            embedding_model=request.embedding_model,
+            index_type=request.index_type,
+            on_complete=save_rebuilt_index
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    logger.info(f"Re-index started: {status['from_model']} -> {status['to_model']}")
+    return status
+
+@app.get("/reindex/status")
+async def get_reindex_status():
+    """Progress of the current or last re-index job"""
+    status = doc_manager.get_reindex_status()
+    if status is None:
+        return {"state": "idle"}
+    return status
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Counters, gauges and stage latency histograms in the Prometheus text format"""
+    body = await run_in_threadpool(metrics.registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, tenant: Optional[str] = None):
+    """Turns and cached chunks of a conversation session"""
+    session = sessions.get(session_id, tenant, create=False)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session.info()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, tenant: Optional[str] = None):
+    """End a conversation session"""
+    if not sessions.delete(session_id, tenant):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "success", "message": f"Session {session_id} ended"}
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Saved request profiles, newest first"""
+    return {"profiles": profiler.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str, format: str = "txt"):
+    """Download a profile: txt (readable summary), prof (pstats, for snakeviz) or json (metadata)"""
+    path = profiler.profile_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id}.{format} not found")
+    return FileResponse(path, filename=path.name)
 
 @app.get("/documents", response_model=DocumentStats)
 async def get_document_stats():
@@ -301,17 +849,16 @@ async def get_document_stats():
 @app.delete("/documents")
 async def clear_all_documents():
     """Clear all documents from the vector store"""
+    require_writer()
     try:
-        # Reinitialize vector store
-        doc_manager.vector_store = doc_manager.vector_store.__class__()
-        query_processor.vector_store = doc_manager.vector_store
-        doc_manager.processed_documents = {}
+        # Swap in an empty generation; queries already running keep their snapshot
+        doc_manager.clear_documents()
+        # Finished uploads no longer name indexed documents; let them be sent again
+        uploads.clear_finished()
         
-        # Remove saved index files
-        index_files = [f"{config.FAISS_INDEX_PATH}.index", f"{config.FAISS_INDEX_PATH}.pkl"]
-        for file_path in index_files:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
+        # Remove saved index files, then publish the empty generation for replicas
+        doc_manager.vector_store.delete_index(config.FAISS_INDEX_PATH)
+        doc_manager.save_vector_store(config.FAISS_INDEX_PATH)
         
         logger.info("All documents cleared from vector store")
         
@@ -332,7 +879,7 @@ async def health_check():
             "timestamp": os.times(),
             "documents_loaded": stats['total_documents'],
             "total_chunks": stats['total_chunks'],
-            "vector_store_ready": doc_manager.vector_store.index.ntotal > 0,
+            "vector_store_ready": doc_manager.vector_store.total_chunks() > 0,
             "Groq_key_configured": bool(config.GROQ_API_KEY),
             "config_valid": True
         }
@@ -342,7 +889,62 @@ async def health_check():
             "error": str(e)
         }
 
+# Search helpers
+def format_hit(text, metadata, score):
+    """Shape a retrieved chunk as a scored hit with its citation"""
+    return {
+        "document_id": metadata.get('doc_id'),
+        "text": text,
+        "citation": f"Page {metadata.get('page', 'N/A')}, Para {metadata.get('paragraph', 'N/A')}",
+        "score": score,
+        "metadata": metadata
+    }
+
+def search_fingerprint(query, filters):
+    """Short hash of a /search query and its filters, carried in its cursors"""
+    key = json.dumps({"query": query, "filters": filters or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+def encode_cursor(offset, fingerprint):
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset, "search": fingerprint}).encode()).decode()
+
+def decode_cursor(cursor, fingerprint):
+    """Offset in a cursor, which must come from a search with the same query and filters"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(payload["offset"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("search") != fingerprint:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different query or filters")
+    return offset
+
 # Background task functions
+def process_chunked_upload(upload_id, file_path):
+    """Index a completed chunked upload, then publish the new generation"""
+    state = uploads.status(upload_id)
+    doc_id = state['doc_id'] or f"{Path(state['filename']).stem}_{uuid.uuid4().hex[:8]}"
+    try:
+        chunks_processed = doc_manager.upload_and_process_document(
+            str(file_path), doc_id, tenant=state['tenant'], content_hash=state['sha256']
+        )
+        uploads.update(upload_id, state='done', document_id=doc_id, chunks_processed=chunks_processed)
+        logger.info(f"Successfully processed {state['filename']}: {chunks_processed} chunks")
+    except Exception as e:
+        logger.error(f"Error processing document {state['filename']}: {e}")
+        uploads.update(upload_id, state='failed', error=str(e))
+        return
+    finally:
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+    try:
+        doc_manager.save_vector_store(config.FAISS_INDEX_PATH)
+    except Exception as e:
+        logger.error(f"Error saving vector store in background: {e}")
+
 async def save_vector_store_background():
     """Background task to save vector store"""
     try:
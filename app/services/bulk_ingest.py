@@ -0,0 +1,220 @@
+# services/bulk_ingest.py
+"""Offline bulk ingestion of directory trees straight into the persisted index.
+
+Run from the app/ directory with the API server stopped, or next to read
+replicas (SERVING_MODE=reader) only. This process takes the writer lock,
+so it refuses to start while a SERVING_MODE=writer server holds it; a
+SERVING_MODE=single server takes no lock but would overwrite the new
+generations with its own on its next save, so stop it first:
+
+    python -m services.bulk_ingest /archive/contracts /archive/letters --workers 4
+
+Files are extracted and chunked in a pool of worker processes, embedded in
+batches in this process and saved as a new index generation under
+FAISS_INDEX_PATH, which the API server loads at startup and read replicas
+pick up on their next refresh. After every save the run is checkpointed to
+{index}.ingest.json, so an interrupted run resumes from the last saved
+generation: files already in the index are skipped and failed files are
+only retried with --retry-failed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from tqdm import tqdm
+
+from config import config
+from .document_manager import SUPPORTED_EXTENSIONS, DocumentManager, prepare_document
+
+def _init_worker():
+    # Parallelism comes from the worker processes; one tesseract thread each
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    config.OCR_WORKERS = 1
+
+def find_files(roots):
+    """(path, doc_id) for every supported file under roots; doc_id is the path from the root's parent"""
+    files = []
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            files.append((root, os.path.basename(root)))
+            continue
+        base = os.path.dirname(root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS:
+                    path = os.path.join(dirpath, filename)
+                    files.append((path, os.path.relpath(path, base).replace(os.sep, '/')))
+    return files
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+class BulkIngester:
+    """Ingest many files into a DocumentManager's vector store and persist it, resumably"""
+
+    def __init__(self, doc_manager=None, index_path=None, checkpoint_path=None, workers=None,
+                 batch_chunks=512, save_every=200, tenant=None, retry_failed=False):
+        self.doc_manager = doc_manager or DocumentManager()
+        self.index_path = index_path or config.FAISS_INDEX_PATH
+        self.checkpoint_path = checkpoint_path or f"{self.index_path}.ingest.json"
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_chunks = batch_chunks
+        self.save_every = save_every
+        self.tenant = tenant
+        self.retry_failed = retry_failed
+        self.checkpoint = {'files': {}, 'failed': {}}
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                self.checkpoint = json.load(f)
+        return self.checkpoint
+
+    def save_checkpoint(self):
+        self.checkpoint['index_path'] = str(self.index_path)
+        self.checkpoint['embedding_model'] = self.doc_manager.vector_store.embedding_model
+        self.checkpoint['updated_at'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f, indent=1)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def plan(self, files):
+        """Split files into (todo, skipped, changed) against the loaded index and the checkpoint"""
+        indexed = self.doc_manager.get_document_stats()['documents']
+        todo, skipped, changed = [], [], []
+        for path, doc_id in files:
+            signature = file_signature(path)
+            done = self.checkpoint['files'].get(path)
+            failed = self.checkpoint['failed'].get(path)
+            # Files that produced no chunks are only known to the checkpoint
+            if doc_id in indexed or done is not None:
+                if done is not None and (done['size'], done['mtime']) != (signature['size'], signature['mtime']):
+                    # Chunks cannot be removed per document; clear the index to re-ingest
+                    changed.append(path)
+                skipped.append(path)
+            elif failed is not None and not self.retry_failed and \
+                    (failed['size'], failed['mtime']) == (signature['size'], signature['mtime']):
+                skipped.append(path)
+            else:
+                todo.append((path, doc_id, signature))
+        return todo, skipped, changed
+
+    def run(self, roots, progress=True):
+        """Ingest every supported file under roots; returns a summary of the run"""
+        os.makedirs(os.path.dirname(str(self.index_path)) or ".", exist_ok=True)
+        self.doc_manager.acquire_writer_lock(self.index_path)
+        self.doc_manager.load_vector_store(self.index_path)
+        self.load_checkpoint()
+
+        todo, skipped, changed = self.plan(find_files(roots))
+        summary = {'indexed': 0, 'skipped': len(skipped), 'failed': 0, 'chunks': 0, 'changed': changed}
+        batch, unsaved = [], []
+
+        def flush():
+            if batch:
+                self.doc_manager.index_documents([item[:4] for item in batch])
+                unsaved.extend(batch)
+                batch.clear()
+
+        def save():
+            flush()
+            if unsaved:
+                self.doc_manager.save_vector_store(self.index_path)
+            # Only files in a saved generation go into the checkpoint
+            for doc_id, path, chunks, metadata_list, signature in unsaved:
+                self.checkpoint['files'][path] = {**signature, 'doc_id': doc_id, 'chunks': len(chunks)}
+                self.checkpoint['failed'].pop(path, None)
+            unsaved.clear()
+            self.save_checkpoint()
+
+        bar = tqdm(total=len(todo), unit="file", disable=not progress)
+        # spawn: the parent may already have torch loaded, which does not survive fork
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        )
+        pending = {}
+        remaining = iter(todo)
+        try:
+            while True:
+                # Keep a bounded number of files in flight so results do not pile up in memory
+                for path, doc_id, signature in remaining:
+                    future = pool.submit(prepare_document, path, doc_id, self.tenant)
+                    pending[future] = (path, doc_id, signature)
+                    if len(pending) >= self.workers * 2:
+                        break
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, doc_id, signature = pending.pop(future)
+                    try:
+                        chunks, metadata_list = future.result()
+                    except Exception as e:
+                        self.checkpoint['failed'][path] = {**signature, 'error': str(e)}
+                        summary['failed'] += 1
+                        bar.write(f"Failed to ingest {path}: {e}")
+                    else:
+                        batch.append((doc_id, path, chunks, metadata_list, signature))
+                        summary['indexed'] += 1
+                        summary['chunks'] += len(chunks)
+                    bar.update(1)
+                bar.set_postfix(chunks=summary['chunks'], failed=summary['failed'])
+
+                if sum(len(item[2]) for item in batch) >= self.batch_chunks:
+                    flush()
+                if len(unsaved) + len(batch) >= self.save_every:
+                    save()
+        except KeyboardInterrupt:
+            bar.write("Interrupted; saving what has been processed so far. Run again to resume.")
+            summary['interrupted'] = True
+            for future in pending:
+                future.cancel()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            bar.close()
+
+        save()
+        summary['total_chunks'] = self.doc_manager.vector_store.total_chunks()
+        return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="files or directories to ingest (searched recursively)")
+    parser.add_argument("--index-path", default=config.FAISS_INDEX_PATH, help="persisted index to add to")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <index-path>.ingest.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes")
+    parser.add_argument("--batch-chunks", type=int, default=512, help="chunks embedded per batch")
+    parser.add_argument("--save-every", type=int, default=200, help="files between index saves and checkpoints")
+    parser.add_argument("--tenant", help="tenant recorded in every chunk's metadata")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed in an earlier run")
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args()
+
+    ingester = BulkIngester(
+        index_path=args.index_path, checkpoint_path=args.checkpoint, workers=args.workers,
+        batch_chunks=args.batch_chunks, save_every=args.save_every, tenant=args.tenant,
+        retry_failed=args.retry_failed
+    )
+    summary = ingester.run(args.paths, progress=not args.no_progress)
+
+    print(f"Indexed {summary['indexed']} files ({summary['chunks']} chunks), skipped {summary['skipped']}, "
+          f"failed {summary['failed']}; the index now has {summary['total_chunks']} chunks")
+    if summary['changed']:
+        print(f"{len(summary['changed'])} files changed since they were indexed and were not re-ingested "
+              f"(clear the index to re-ingest them), e.g. {summary['changed'][0]}")
+    if summary['failed']:
+        print(f"Failures are listed in {ingester.checkpoint_path}; rerun with --retry-failed to retry them")
+    if summary.get('interrupted'):
+        print("Interrupted before every file was ingested; run the same command again to resume")
+        raise SystemExit(130)
+
+if __name__ == "__main__":
+    main()
@@ -5,55 +5,131 @@ from .ocr import (
 )
 
 from .embedder import DocumentEmbedder
-from .vector_store import FAISSVectorStore
+from .encoders import embedding_dimension
+from .sharded_vector_store import build_vector_store
+from .vector_store import check_index_type
+from .reindex import ReindexJob
+from .uploads import file_sha256
+from .metrics import CHUNKS_INGESTED, DOCUMENTS_INGESTED, timed
+from config import config
 import os
+import threading
+import time
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp')
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.md', '.csv', '.docx') + IMAGE_EXTENSIONS
+
+def extract_text(file_path, doc_id):
+    """Text passages with metadata for one file, by file type"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext == '.pdf':
+        return extract_text_from_pdf(file_path, doc_id)
+    elif file_ext in IMAGE_EXTENSIONS:
+        return extract_text_from_image(file_path, doc_id)
+    elif file_ext == '.txt' or file_ext == '.md':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+            return [{
+                'text': text,
+                'metadata': {
+                    'doc_id': doc_id,
+                    'page': 1,
+                    'paragraph': 1,
+                    'source': file_path
+                }
+            }]
+    elif file_ext == '.csv':
+        return extract_text_from_csv(file_path, doc_id)
+    elif file_ext == '.docx':
+        return extract_text_from_docx(file_path, doc_id)
+    raise ValueError(f"Unsupported file type: {file_ext}")
+
+def prepare_document(file_path, doc_id=None, tenant=None, embedder=None, content_hash=None):
+    """Extract and chunk one file without indexing it; returns (chunks, metadata_list).
+
+    Needs no vector store or embedding model, so it can run in worker
+    processes. Every chunk records the file's sha256 (content_hash, if the
+    caller already has it), which find_document matches re-uploads against.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    doc_id = doc_id or os.path.basename(file_path)
+    content_hash = content_hash or file_sha256(file_path)
+    embedder = embedder or DocumentEmbedder()
+    chunks, metadata_list = embedder.process_document(extract_text(file_path, doc_id))
+    for metadata in metadata_list:
+        if tenant:
+            metadata['tenant'] = tenant
+        metadata['sha256'] = content_hash
+    return chunks, metadata_list
 
 class DocumentManager:
     def __init__(self):
-        self.vector_store = FAISSVectorStore()
+        self.vector_store = build_vector_store(
+            config.VECTOR_STORE_BACKEND,
+            num_shards=config.NUM_SHARDS,
+            shard_key=config.SHARD_KEY,
+            shard_addresses=config.SHARD_ADDRESSES,
+            authkey=config.SHARD_AUTHKEY.encode(),
+            index_type=config.INDEX_TYPE,
+            pq_m=config.PQ_M,
+            train_size=config.INDEX_TRAIN_SIZE or None,
+            exact_rerank=config.INDEX_EXACT_RERANK,
+            rerank_factor=config.INDEX_RERANK_FACTOR,
+            embedding_dim=config.EMBEDDING_DIMENSION,
+            embedding_model=config.EMBEDDING_MODEL,
+            embedding_backend=config.EMBEDDING_BACKEND,
+            reembed_on_model_change=config.REEMBED_ON_MODEL_CHANGE
+        )
         self.embedder = DocumentEmbedder()
         self.processed_documents = {}
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._writer_lock_file = None
+        self.reindex_job = None
         
-    def upload_and_process_document(self, file_path, doc_id=None):
+    @timed('ingest')
+    def upload_and_process_document(self, file_path, doc_id=None, tenant=None, content_hash=None):
         """Upload and process a single document"""
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
         doc_id = doc_id or os.path.basename(file_path)
-
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext == '.pdf':
-            text_chunks_with_metadata = extract_text_from_pdf(file_path, doc_id)
-        elif file_ext in ['.jpg','.jpeg','.png','.tiff','.bmp']:
-            text_chunks_with_metadata=extract_text_from_image(file_path, doc_id)
-        elif file_ext == '.txt' or file_ext == '.md':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-                text_chunks_with_metadata = [{
-                    'text': text,
-                    'metadata': {
-                        'doc_id': doc_id,
-                        'page': 1,
-                        'paragraph': 1,
-                        'source': file_path
-                    }
-                }]
-        elif file_ext == '.csv':
-            text_chunks_with_metadata = extract_text_from_csv(file_path, doc_id)
-        elif file_ext == '.docx':
-            text_chunks_with_metadata = extract_text_from_docx(file_path, doc_id)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-        chunks, metadata_list=self.embedder.process_document(text_chunks_with_metadata)
-        self.vector_store.add_documents(chunks, metadata_list)
-        self.processed_documents[doc_id] = {
-            'path': file_path,
-            'chunks_count': len(chunks),
-            'processed': True
-        }
-        
+        chunks, metadata_list = prepare_document(
+            file_path, doc_id, tenant=tenant, embedder=self.embedder, content_hash=content_hash
+        )
+        self.index_documents([(doc_id, file_path, chunks, metadata_list)])
         return len(chunks)
+
+    def index_documents(self, documents):
+        """Index already chunked documents, given as (doc_id, file_path, chunks, metadata_list), in one embedding pass"""
+        all_chunks, all_metadata = [], []
+        for doc_id, file_path, chunks, metadata_list in documents:
+            all_chunks.extend(chunks)
+            all_metadata.extend(metadata_list)
+        if all_chunks:
+            self.vector_store.add_documents(all_chunks, all_metadata)
+
+        for doc_id, file_path, chunks, metadata_list in documents:
+            DOCUMENTS_INGESTED.inc(file_type=os.path.splitext(file_path)[1].lower().lstrip('.'))
+            CHUNKS_INGESTED.inc(len(chunks))
+        with self._lock:
+            for doc_id, file_path, chunks, metadata_list in documents:
+                self.processed_documents[doc_id] = {
+                    'path': file_path,
+                    'chunks_count': len(chunks),
+                    'processed': True
+                }
+                for field in ('sha256', 'tenant'):
+                    if metadata_list and metadata_list[0].get(field):
+                        self.processed_documents[doc_id][field] = metadata_list[0][field]
+
+    def find_document(self, content_hash, tenant=None):
+        """doc_id of an indexed document with this sha256 (for this tenant), or None"""
+        with self._lock:
+            for doc_id, doc in self.processed_documents.items():
+                if doc.get('sha256') == content_hash and doc.get('tenant') == tenant:
+                    return doc_id
+        return None
     
     def batch_upload_documents(self, file_paths):
         """Upload and process multiple documents"""
@@ -70,19 +146,90 @@ class DocumentManager:
     
     def get_document_stats(self):
         """Get statistics about processed documents"""
-        total_docs = len(self.processed_documents)
-        total_chunks = sum(doc['chunks_count'] for doc in self.processed_documents.values())
+        with self._lock:
+            documents = dict(self.processed_documents)
+
+        total_docs = len(documents)
+        total_chunks = sum(doc['chunks_count'] for doc in documents.values())
         
         return {
             'total_documents': total_docs,
             'total_chunks': total_chunks,
-            'documents': self.processed_documents
+            'documents': documents
         }
+
+    def clear_documents(self):
+        """Remove every document; in-flight searches finish on the old generation"""
+        with self._lock:
+            self.vector_store.clear()
+            self.processed_documents = {}
     
     def save_vector_store(self, filepath="vector_store"):
         """Save the vector store to disk"""
         self.vector_store.save_index(filepath)
     
-    def load_vector_store(self, filepath="vector_store"):
+    def load_vector_store(self, filepath="vector_store", use_mmap=False):
         """Load the vector store from disk"""
-        return self.vector_store.load_index(filepath)
\ No newline at end of file
+        if not self.vector_store.load_index(filepath, use_mmap=use_mmap):
+            return False
+        with self._lock:
+            self.processed_documents = dict(self.vector_store.document_summary)
+        return True
+
+    def refresh_vector_store(self, filepath="vector_store", min_interval=1.0):
+        """Pick up a generation published by the writer process (read-only replicas)"""
+        now = time.monotonic()
+        if now - self._last_refresh < min_interval:
+            return False
+        self._last_refresh = now
+
+        if not self.vector_store.refresh(filepath):
+            return False
+        with self._lock:
+            self.processed_documents = dict(self.vector_store.document_summary)
+        return True
+
+    def start_reindex(self, embedding_model=None, index_type=None, on_complete=None):
+        """Start rebuilding the vector store in the background; one job at a time.
+
+        Raises ValueError up front if the index type cannot be built for the
+        target model (e.g. PQ_M does not divide its dimension).
+        """
+        store = self.vector_store
+        target_model = embedding_model or store.embedding_model
+        if target_model == store.embedding_model:
+            embedding_dim = store.embedding_dim
+        else:
+            embedding_dim = embedding_dimension(target_model, config.EMBEDDING_BACKEND)
+        check_index_type(index_type or getattr(store, 'index_type', config.INDEX_TYPE), embedding_dim, config.PQ_M)
+
+        with self._lock:
+            if self.reindex_job is not None and self.reindex_job.running:
+                raise RuntimeError("A re-index is already running")
+            self.reindex_job = ReindexJob(
+                self.vector_store,
+                embedding_model=embedding_model,
+                index_type=index_type,
+                batch_size=config.REINDEX_BATCH_SIZE,
+                max_rate=config.REINDEX_MAX_RATE,
+                on_complete=on_complete
+            )
+            self.reindex_job.start()
+        return self.reindex_job.status()
+
+    def get_reindex_status(self):
+        """Status of the last re-index job, or None if there has not been one"""
+        job = self.reindex_job
+        return job.status() if job is not None else None
+
+    def acquire_writer_lock(self, filepath="vector_store"):
+        """Become the only process allowed to write generations under filepath"""
+        import fcntl
+
+        lock_file = open(f"{filepath}.writer.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"Another writer process already owns {filepath}")
+        self._writer_lock_file = lock_file
@@ -18,12 +18,21 @@
 # def embed_chunks(chunks):
 #     return model.encode(chunks)
 # services/embedder.py (updated for new structure)
-from sentence_transformers import SentenceTransformer
+from .encoders import get_encoder
+from .metrics import stage, timed
 import re
 
 class DocumentEmbedder:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self._model = None
+
+    @property
+    def model(self):
+        # Same encoder instance as the vector store (EMBEDDING_MODEL / EMBEDDING_BACKEND),
+        # loaded on first use so processes that only chunk never load it
+        if self._model is None:
+            self._model = get_encoder()
+        return self._model
     
     def chunk_text(self, text, chunk_size=300, overlap=50):
         """Enhanced text chunking with overlap"""
@@ -50,6 +59,7 @@ class DocumentEmbedder:
         
         return chunks
     
+    @timed('chunk')
     def process_document(self, text_chunks_with_metadata):
         """Process document chunks with metadata"""
         processed_chunks = []
@@ -73,4 +83,5 @@ class DocumentEmbedder:
     
     def embed_chunks(self, chunks):
         """Generate embeddings for text chunks"""
-        return self.model.encode(chunks)
\ No newline at end of file
+        with stage('embed'):
+            return self.model.encode(chunks)
\ No newline at end of file
@@ -0,0 +1,175 @@
+# services/encoders.py
+import json
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from config import config
+
+# Output sizes of common sentence-transformers models, so the index can be
+# created without loading the model first
+KNOWN_DIMENSIONS = {
+    'all-MiniLM-L6-v2': 384,
+    'all-MiniLM-L12-v2': 384,
+    'paraphrase-MiniLM-L6-v2': 384,
+    'multi-qa-MiniLM-L6-cos-v1': 384,
+    'all-mpnet-base-v2': 768,
+    'multi-qa-mpnet-base-dot-v1': 768,
+    'BAAI/bge-small-en-v1.5': 384,
+    'BAAI/bge-base-en-v1.5': 768,
+}
+
+class SentenceTransformerEncoder:
+    """PyTorch sentence-transformers backend"""
+    backend = 'torch'
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        return self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=normalize_embeddings,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype('float32')
+
+class OnnxEncoder:
+    """ONNX Runtime backend with optional int8 dynamic quantization.
+
+    On first use the model's transformer is exported from PyTorch to ONNX
+    (and quantized) under models_dir; later runs load the exported file and
+    need neither torch nor sentence-transformers. Pooling and normalization
+    follow the original sentence-transformers pipeline (mean or CLS pooling).
+    """
+    backend = 'onnx'
+
+    def __init__(self, model_name, models_dir, quantize=True):
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("The onnx embedding backend needs: pip install -r requirements-onnx.txt") from e
+
+        self.name = model_name
+        export_dir = Path(models_dir) / re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        model_path = export_dir / ("model-int8.onnx" if quantize else "model.onnx")
+        if not model_path.exists() or not (export_dir / "pipeline.json").exists():
+            self.export(model_name, export_dir, quantize)
+
+        with open(export_dir / "pipeline.json") as f:
+            pipeline = json.load(f)
+        self.dimension = pipeline['dimension']
+        self.max_seq_length = pipeline['max_seq_length']
+        self.pooling = pipeline['pooling']
+        self.normalize = pipeline['normalize']
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=['CPUExecutionProvider']
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_name, export_dir, quantize=True):
+        """Export the transformer to ONNX and write the tokenizer and pooling settings"""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        print(f"Exporting {model_name} to ONNX in {export_dir}")
+        export_dir.mkdir(parents=True, exist_ok=True)
+        model = SentenceTransformer(model_name, device='cpu')
+        transformer = model[0]
+        pooling = next((module for module in model if isinstance(module, Pooling)), None)
+
+        transformer.tokenizer.save_pretrained(str(export_dir))
+        with open(export_dir / "pipeline.json", 'w') as f:
+            json.dump({
+                'model_name': model_name,
+                'dimension': model.get_sentence_embedding_dimension(),
+                'max_seq_length': model.max_seq_length,
+                'pooling': 'cls' if pooling is not None and pooling.pooling_mode_cls_token else 'mean',
+                'normalize': any(isinstance(module, Normalize) for module in model),
+            }, f)
+
+        sample = transformer.tokenizer(["export sample"], return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+        fp32_path = export_dir / "model.onnx"
+        auto_model = transformer.auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                tuple(sample[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(fp32_path), str(export_dir / "model-int8.onnx"), weight_type=QuantType.QInt8)
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False):
+        texts = list(texts)
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            feeds = {name: tokens[name].astype('int64') for name in self._input_names if name in tokens}
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.pooling == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = tokens['attention_mask'][..., None].astype('float32')
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            outputs.append(pooled.astype('float32'))
+
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, self.dimension), dtype='float32')
+        if self.normalize or normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(model_name=None, backend=None):
+    """Shared encoder instance per (model, backend), so the model is loaded once per process"""
+    model_name = model_name or config.EMBEDDING_MODEL
+    backend = backend or config.EMBEDDING_BACKEND
+
+    with _encoders_lock:
+        key = (model_name, backend)
+        if key not in _encoders:
+            if backend == 'onnx':
+                _encoders[key] = OnnxEncoder(model_name, config.MODELS_DIR, quantize=config.ONNX_QUANTIZE)
+            elif backend == 'torch':
+                _encoders[key] = SentenceTransformerEncoder(model_name)
+            else:
+                raise ValueError(f"Unknown embedding backend: {backend}")
+        return _encoders[key]
+
+def embedding_dimension(model_name=None, backend=None):
+    """Output size of a model, loading it only when it is not a known one"""
+    model_name = model_name or config.EMBEDDING_MODEL
+    return KNOWN_DIMENSIONS.get(model_name) or get_encoder(model_name, backend).dimension
@@ -5,42 +5,41 @@ from langchain.llms import OpenAI
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 from langchain.agents import initialize_agent, Tool, AgentType
-from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
 
 
 import os
 from dotenv import load_dotenv
 from langchain.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.schema import SystemMessage, HumanMessage
 from langchain.prompts import PromptTemplate
 
+from .metrics import LLM_IN_FLIGHT, LLM_REQUESTS, LLM_TOKENS, stage
+
 load_dotenv()  # Load .env values
 
-class DocumentQAAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model=os.getenv("LLM_MODEL", "llama3-70b-8192"),
-            temperature=float(os.getenv("LLM_TEMPERATURE", "0.3")),
-            openai_api_base=os.getenv("GROQ_API_BASE"),
-            openai_api_key=os.getenv("GROQ_API_KEY")
-        )
-        self.memory = ConversationBufferMemory(return_messages=True)
-        
-    def generate_answer_with_themes(self, question, contexts, metadata_list):
-        context_with_metadata = []
-        for i, (context, metadata) in enumerate(zip(contexts, metadata_list)):
-            doc_info = f"[Document {metadata.get('doc_id', i)}] "
-            doc_info += f"(Page: {metadata.get('page', 'N/A')}, Para: {metadata.get('paragraph', 'N/A')}) "
-            doc_info += context
-            context_with_metadata.append(doc_info)
+JSON_PROMPT_TEMPLATE = """
+You are an expert research assistant analyzing documents to provide comprehensive answers with theme identification.
 
-        context_text = "\n\n".join(context_with_metadata)
+DOCUMENT EXCERPTS:
+{context}
 
-        prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
-            template="""
+QUESTION: {question}
+
+Respond with a single JSON object and nothing else, using exactly this schema:
+{{
+  "individual_answers": [
+    {{"document_id": "DOC_ID", "answer": "Answer text", "citation": "Page X, Para Y"}}
+  ],
+  "themes": [
+    {{"name": "Theme name", "supporting_docs": ["DOC_ID1 (Page X, Para Y)"], "summary": "Brief theme summary"}}
+  ],
+  "synthesized_answer": "Your final conclusion"
+}}
+Include one entry in "individual_answers" per document that answers the question.
+"""
+
+MARKDOWN_PROMPT_TEMPLATE = """
 You are an expert research assistant analyzing documents to provide comprehensive answers with theme identification.
 
 DOCUMENT EXCERPTS:
@@ -65,23 +64,75 @@ INSTRUCTIONS:
 3. Finally, write:
    **Synthesized Answer:** Your final conclusion here.
 """
+
+class DocumentQAAgent:
+    def __init__(self, json_mode=None):
+        if json_mode is None:
+            json_mode = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
+        self.json_mode = json_mode
+
+        # JSON mode constrains the model to emit a single JSON object (OpenAI/Groq response_format)
+        model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        self.llm = ChatOpenAI(
+            model=os.getenv("LLM_MODEL", "llama3-70b-8192"),
+            temperature=float(os.getenv("LLM_TEMPERATURE", "0.3")),
+            openai_api_base=os.getenv("GROQ_API_BASE"),
+            openai_api_key=os.getenv("GROQ_API_KEY"),
+            model_kwargs=model_kwargs
+        )
+
+    def _build_messages(self, question, contexts, metadata_list, history=None):
+        context_with_metadata = []
+        for i, (context, metadata) in enumerate(zip(contexts, metadata_list)):
+            doc_info = f"[Document {metadata.get('doc_id', i)}] "
+            doc_info += f"(Page: {metadata.get('page', 'N/A')}, Para: {metadata.get('paragraph', 'N/A')}) "
+            doc_info += context
+            context_with_metadata.append(doc_info)
+
+        context_text = "\n\n".join(context_with_metadata)
+
+        prompt_template = PromptTemplate(
+            input_variables=["context", "question"],
+            template=JSON_PROMPT_TEMPLATE if self.json_mode else MARKDOWN_PROMPT_TEMPLATE
         )
 
         system_message = SystemMessage(content="You are an expert document analysis assistant.")
-        human_message = HumanMessage(content=prompt_template.format(
-            context=context_text,
-            question=question
-        ))
-
-        response = self.llm([system_message, human_message])
-        return response.content
-
-# Test
-agent = DocumentQAAgent()
-contexts = ["Penalty issued under Clause 49 of LODR", "Violation of SEBI listing guidelines"]
-metadata_list = [
-    {"doc_id": "DOC001", "page": 3, "paragraph": 2},
-    {"doc_id": "DOC002", "page": 1, "paragraph": 1}
-]
-answer = agent.generate_answer_with_themes("What are the penalties mentioned?", contexts, metadata_list)
-print(answer)
+        prompt = prompt_template.format(context=context_text, question=question)
+        if history:
+            # Conversation history is kept per session by services.sessions
+            prompt = f"CONVERSATION SO FAR (the question may refer back to it):\n{history}\n{prompt}"
+        human_message = HumanMessage(content=prompt)
+
+        return [system_message, human_message]
+
+    def generate_answer_with_themes(self, question, contexts, metadata_list, history=None):
+        messages = self._build_messages(question, contexts, metadata_list, history)
+        LLM_REQUESTS.inc(mode="complete")
+        with LLM_IN_FLIGHT.track_inprogress(), stage('llm'):
+            result = self.llm.generate([messages])
+
+        usage = (result.llm_output or {}).get('token_usage') or {}
+        LLM_TOKENS.inc(usage.get('prompt_tokens', 0), kind="prompt")
+        LLM_TOKENS.inc(usage.get('completion_tokens', 0), kind="completion")
+        return result.generations[0][0].text
+
+    def stream_answer_with_themes(self, question, contexts, metadata_list, history=None):
+        """Yield the response text piece by piece as the LLM produces it"""
+        LLM_REQUESTS.inc(mode="stream")
+        # Includes the time the caller spends between pieces, which is small next to the LLM's
+        with LLM_IN_FLIGHT.track_inprogress(), stage('llm'):
+            for chunk in self.llm.stream(self._build_messages(question, contexts, metadata_list, history)):
+                if chunk.content:
+                    # Streamed responses carry no usage; providers send about one token per chunk
+                    LLM_TOKENS.inc(kind="completion")
+                    yield chunk.content
+
+if __name__ == "__main__":
+    agent = DocumentQAAgent()
+    contexts = ["Penalty issued under Clause 49 of LODR", "Violation of SEBI listing guidelines"]
+    metadata_list = [
+        {"doc_id": "DOC001", "page": 3, "paragraph": 2},
+        {"doc_id": "DOC002", "page": 1, "paragraph": 1}
+    ]
+    answer = agent.generate_answer_with_themes("What are the penalties mentioned?", contexts, metadata_list)
+    print(answer)
@@ -0,0 +1,248 @@
+# services/metrics.py
+"""Process-wide metrics (counters, gauges, histograms) in the Prometheus text format.
+
+Components record stage durations with the stage() context manager or the
+timed() decorator. Every stage feeds the stage_duration_seconds histogram
+and, when the code runs inside a request that called start_request(), that
+request's own timings too (kept in a contextvar, so concurrent requests do
+not mix and run_in_threadpool calls still count).
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+class Gauge:
+    """Set directly, or computed at scrape time from a callback returning {label tuple: value}"""
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), callback=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception as e:
+                print(f"Metric {self.name} callback failed: {e}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: {**data, 'counts': list(data['counts'])} for key, data in self._series.items()}
+
+        samples = []
+        for key, data in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), data['sum']))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), data['count']))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), callback=None):
+        return self.register(Gauge(name, help, labelnames, callback))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "docqa_stage_duration_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+STAGE_ERRORS = registry.counter(
+    "docqa_stage_errors_total", "Pipeline stages that raised an exception", ["stage"]
+)
+
+# Per-request stage timings: stage -> seconds, summed when a stage repeats
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def start_request():
+    """Start collecting stage timings for the current request and return the dict they go into"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def request_timings():
+    return _request_timings.get()
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as pipeline stage name"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Pipeline metrics recorded by the services; main.py adds gauges that read
+# the live vector store at scrape time
+DOCUMENTS_INGESTED = registry.counter(
+    "docqa_documents_ingested_total", "Documents processed by upload", ["file_type"]
+)
+CHUNKS_INGESTED = registry.counter("docqa_chunks_ingested_total", "Chunks added to the vector store")
+OCR_CACHE_LOOKUPS = registry.counter("docqa_ocr_cache_lookups_total", "OCR result cache lookups per page", ["result"])
+SESSION_RETRIEVALS = registry.counter(
+    "docqa_session_retrievals_total", "Session follow-ups answered by searching the index or from cached chunks", ["result"]
+)
+LLM_REQUESTS = registry.counter("docqa_llm_requests_total", "LLM calls", ["mode"])
+LLM_TOKENS = registry.counter(
+    "docqa_llm_tokens_total", "LLM tokens as reported by the provider (streamed completions are estimated)", ["kind"]
+)
+LLM_IN_FLIGHT = registry.gauge("docqa_llm_in_flight", "LLM calls currently running")
+LLM_QUEUE_DEPTH = registry.gauge("docqa_llm_queue_depth", "Batch questions waiting for an LLM slot")
+HTTP_SECONDS = registry.histogram(
+    "docqa_http_request_duration_seconds", "HTTP request latency (until the response starts)",
+    ["method", "path", "status"]
+)
+HTTP_IN_FLIGHT = registry.gauge("docqa_http_requests_in_flight", "HTTP requests being handled")
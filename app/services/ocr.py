@@ -3,10 +3,174 @@
 import pdfplumber
 from pdf2image import convert_from_path
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageOps, ImageSequence
 import os
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from docx import Document as DocxDocument
 import csv
+from config import config
+from .metrics import OCR_CACHE_LOOKUPS, stage, timed
+from .ocr_cache import OCRCache
+from .profiler import profiled
+
+_ocr_pool = None
+_ocr_cache = None
+_ocr_settings = None
+_ocr_lock = threading.Lock()
+
+def _get_ocr_pool():
+    """Shared thread pool for tesseract calls (each one runs in its own subprocess)"""
+    global _ocr_pool
+    with _ocr_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=config.OCR_WORKERS, thread_name_prefix="ocr")
+        return _ocr_pool
+
+def get_ocr_cache():
+    """Process-wide OCR result cache, or None when disabled"""
+    global _ocr_cache
+    if not config.OCR_CACHE_ENABLED:
+        return None
+    with _ocr_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRCache(config.OCR_CACHE_PATH, config.OCR_CACHE_MAX_ENTRIES)
+        return _ocr_cache
+
+def ocr_settings():
+    """Everything that changes OCR output besides the pixels; part of the cache key"""
+    global _ocr_settings
+    if _ocr_settings is None:
+        try:
+            version = pytesseract.get_tesseract_version()
+        except Exception:
+            version = "unknown"
+        _ocr_settings = (
+            f"tesseract={version}|config={config.TESSERACT_CONFIG}|lang={config.OCR_LANG}|"
+            f"dpi={config.OCR_DPI}|max={config.OCR_MAX_DIMENSION}|"
+            f"deskew={config.OCR_DESKEW and config.OCR_MAX_SKEW}|regions={config.OCR_REGION_PIXELS}"
+        )
+    return _ocr_settings
+
+def _ink_mask(pixels):
+    """Dark (text) pixels of a grayscale array"""
+    return pixels < pixels.mean() - pixels.std()
+
+def estimate_skew(gray, max_angle):
+    """Rotation (degrees) that best aligns text lines horizontally, from row projection profiles"""
+    thumb = gray.copy()
+    thumb.thumbnail((1000, 1000))
+    ink = _ink_mask(np.asarray(thumb, dtype=np.float32))
+    if ink.mean() < 0.001:
+        return 0.0
+    mask = Image.fromarray(ink.astype(np.uint8) * 255)
+
+    def sharpness(angle):
+        rows = np.asarray(mask.rotate(angle, resample=Image.NEAREST), dtype=np.float32).sum(axis=1)
+        return float(np.square(np.diff(rows)).sum())
+
+    # Coarse 1 degree search, then refine around the best angle
+    best = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=sharpness)
+    best = max(np.arange(best - 1.0, best + 1.01, 0.2), key=sharpness)
+    return float(best)
+
+def preprocess_image(image, dpi=None):
+    """Grayscale, resample to OCR_DPI (capped at OCR_MAX_DIMENSION) and deskew; returns (image, dpi)"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        image = Image.alpha_composite(Image.new('RGBA', rgba.size, 'white'), rgba)
+    gray = image.convert('L')
+
+    dpi = dpi or (image.info.get('dpi') or (None,))[0]
+    scale = 1.0
+    if dpi and dpi > 1:
+        # Upscaling past 2x costs more than it gains
+        scale = min(config.OCR_DPI / float(dpi), 2.0)
+    scale = min(scale, config.OCR_MAX_DIMENSION / max(gray.size))
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS)
+        dpi = dpi * scale if dpi else None
+
+    if config.OCR_DESKEW and config.OCR_MAX_SKEW > 0:
+        angle = estimate_skew(gray, config.OCR_MAX_SKEW)
+        if abs(angle) >= 0.2:
+            gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    return gray, round(dpi) if dpi and dpi > 1 else None
+
+def split_regions(gray):
+    """Cut a large page into horizontal bands at blank rows, so the bands can be OCRed in parallel"""
+    width, height = gray.size
+    count = min(config.OCR_WORKERS, -(-width * height // config.OCR_REGION_PIXELS))
+    if count <= 1:
+        return [gray]
+
+    ink_rows = _ink_mask(np.asarray(gray, dtype=np.float32)).sum(axis=1)
+    blank = np.flatnonzero(ink_rows <= max(1, width // 500))
+    cuts = [0]
+    for i in range(1, count):
+        target = height * i // count
+        # Never cut through a text line: only blank rows near the target qualify
+        nearby = blank[np.abs(blank - target) <= height // (2 * count)]
+        if nearby.size:
+            cut = int(nearby[np.argmin(np.abs(nearby - target))])
+            if cut > cuts[-1]:
+                cuts.append(cut)
+    cuts.append(height)
+    return [gray.crop((0, top, width, bottom)) for top, bottom in zip(cuts, cuts[1:]) if bottom > top]
+
+def _ocr_region(region, dpi):
+    tesseract_config = config.TESSERACT_CONFIG + (f" --dpi {dpi}" if dpi else "")
+    with stage('ocr'):
+        return pytesseract.image_to_string(region, lang=config.OCR_LANG, config=tesseract_config)
+
+def ocr_images(images, dpi=None):
+    """OCR text of each image, in order.
+
+    Pages found in the OCR cache skip tesseract entirely; the others are
+    preprocessed, split into regions and OCRed on the shared pool, so the
+    regions of one page and consecutive pages run concurrently. At most
+    OCR_WORKERS pages are in flight at once to bound memory.
+    """
+    pool = _get_ocr_pool()
+    cache = get_ocr_cache()
+    texts = []
+    pending = []
+
+    def finish(index, key, futures):
+        parts = [future.result().strip() for future in futures]
+        texts[index] = "\n".join(part for part in parts if part)
+        if cache is not None:
+            cache.put(key, texts[index])
+
+    for image in images:
+        key = OCRCache.key(image, ocr_settings()) if cache is not None else None
+        cached = cache.get(key) if cache is not None else None
+        OCR_CACHE_LOOKUPS.inc(result="disabled" if cache is None else "miss" if cached is None else "hit")
+        if cached is not None:
+            texts.append(cached)
+            continue
+
+        with stage('ocr_preprocess'):
+            processed, page_dpi = preprocess_image(image, dpi)
+            regions = split_regions(processed)
+        # copy_context so stage timings (and profiles) from the pool threads count towards this request
+        futures = [
+            pool.submit(contextvars.copy_context().run, profiled(_ocr_region), region, page_dpi) for region in regions
+        ]
+        texts.append(None)
+        pending.append((len(texts) - 1, key, futures))
+        if len(pending) >= config.OCR_WORKERS:
+            finish(*pending.pop(0))
+
+    for index, key, futures in pending:
+        finish(index, key, futures)
+    return texts
+
+@timed('extract_csv')
 def extract_text_from_csv(path, doc_id=None):
     try:
         with open(path, newline='', encoding='utf-8') as csvfile:
@@ -27,6 +191,7 @@ def extract_text_from_csv(path, doc_id=None):
         print(f"Failed to read .csv file {path}: {e}")
     return []
 
+@timed('extract_docx')
 def extract_text_from_docx(path, doc_id=None):
     try:
         doc = DocxDocument(path)
@@ -44,6 +209,8 @@ def extract_text_from_docx(path, doc_id=None):
     except Exception as e:
         print(f"Failed to read .docx file {path}: {e}")
     return []
+
+@timed('extract_pdf')
 def extract_text_from_pdf(path, doc_id=None):
     """Extract text from PDF with enhanced metadata"""
     text_chunks = []
@@ -68,11 +235,12 @@ def extract_text_from_pdf(path, doc_id=None):
                             })
     except Exception as e:
         print(f"pdfplumber failed for {path}, falling back to OCR:", e)
-        # Fallback OCR
+
+    # Scanned PDFs have no text layer
+    if not text_chunks:
         try:
-            images = convert_from_path(path)
-            for page_num, image in enumerate(images, 1):
-                ocr_text = pytesseract.image_to_string(image)
+            images = convert_from_path(path, dpi=config.OCR_DPI)
+            for page_num, ocr_text in enumerate(ocr_images(images, dpi=config.OCR_DPI), 1):
                 if ocr_text.strip():
                     text_chunks.append({
                         'text': ocr_text.strip(),
@@ -89,23 +257,27 @@ def extract_text_from_pdf(path, doc_id=None):
     
     return text_chunks
 
+@timed('extract_image')
 def extract_text_from_image(path, doc_id=None):
-    """Extract text from image using OCR"""
+    """Extract text from an image using OCR, one chunk per frame of multi-page TIFFs"""
+    text_chunks = []
     try:
-        image = Image.open(path)
-        text = pytesseract.image_to_string(image)
-        if text.strip():
-            return [{
-                'text': text.strip(),
-                'metadata': {
-                    'doc_id': doc_id or os.path.basename(path),
-                    'page': 1,
-                    'paragraph': 1,
-                    'source': path,
-                    'extracted_via': 'OCR'
-                }
-            }]
+        with Image.open(path) as image:
+            # exif_transpose applies the orientation phone cameras record
+            frames = (ImageOps.exif_transpose(frame) for frame in ImageSequence.Iterator(image))
+            for page_num, text in enumerate(ocr_images(frames), 1):
+                if text.strip():
+                    text_chunks.append({
+                        'text': text.strip(),
+                        'metadata': {
+                            'doc_id': doc_id or os.path.basename(path),
+                            'page': page_num,
+                            'paragraph': 1,
+                            'source': path,
+                            'extracted_via': 'OCR'
+                        }
+                    })
     except Exception as e:
         print(f"Failed to extract text from image {path}: {e}")
-    
-    return []
+
+    return text_chunks
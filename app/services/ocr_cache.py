@@ -0,0 +1,75 @@
+# services/ocr_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+class OCRCache:
+    """Persistent OCR results keyed by image content and OCR settings.
+
+    Backed by SQLite so several worker processes can share one cache file.
+    Each entry is a page's text; keys hash the decoded pixels (not the file
+    bytes, so re-saved or re-uploaded copies still hit) together with the
+    tesseract version, config and preprocessing settings. The least
+    recently used entries are pruned beyond max_entries.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+
+    @staticmethod
+    def key(image, settings):
+        digest = hashlib.sha256()
+        digest.update(f"{image.mode}|{image.size}|{settings}|".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def _connection(self):
+        # Connections must not be shared with forked children
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT NOT NULL, used REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE ocr SET used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key, text):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO ocr (key, text, used) VALUES (?, ?, ?)", (key, text, time.time()))
+            self._puts += 1
+            if self._puts % 100 == 0:
+                conn.execute(
+                    "DELETE FROM ocr WHERE key NOT IN (SELECT key FROM ocr ORDER BY used DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM ocr")
+            conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
@@ -0,0 +1,177 @@
+# services/profiler.py
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+# The session profiling the current request; worker threads see it through copied contexts
+_current = contextvars.ContextVar('profile_session', default=None)
+
+def profiled(fn):
+    """fn, wrapped so that calls on other threads count towards the current request's profile, if any.
+
+    Wrap at submission time, on the request's side: e.g.
+    run_in_threadpool(profiled(fn), ...) or pool.submit(profiled(fn), ...).
+    """
+    session = _current.get()
+    if session is None:
+        return fn
+    return functools.partial(session.run, fn)
+
+class ProfileSession:
+    """cProfile and tracemalloc capture for a single request; stop() writes it to disk.
+
+    cProfile only traces the thread it is enabled on, so work the request
+    hands to other threads is profiled by run() with one extra profile per
+    call; stop() merges the ones that finished into the request's profile.
+    """
+
+    def __init__(self, profiler, label):
+        self.profiler = profiler
+        self.label = label
+        self.profile_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        self.started_at = time.time()
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(self.profiler.trace_frames)
+        tracemalloc.reset_peak()
+        self._thread = threading.get_ident()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self._token = _current.set(self)
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn, profiling it if it runs on another thread than the request's"""
+        if threading.get_ident() == self._thread or self._stopped:
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: the request's profile already covers every thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                if not self._stopped:
+                    self._thread_profiles.append(profile)
+
+    def stop(self, status=None):
+        """Stop capturing, write the profile files and return the profile id"""
+        self._profile.disable()
+        _current.reset(self._token)
+        with self._lock:
+            # Calls still running on other threads are left out
+            self._stopped = True
+        duration = time.time() - self.started_at
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self.profiler._release()
+
+        base = self.profiler.profiles_dir / self.profile_id
+        report = io.StringIO()
+        stats = pstats.Stats(self._profile, *self._thread_profiles, stream=report)
+        stats.dump_stats(f"{base}.prof")
+
+        report.write(f"{self.label}  status={status}  {duration * 1000:.1f} ms  peak traced memory {peak / 1e6:.1f} MB\n\n")
+        report.write("=== CPU: top functions by cumulative time ===\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.profiler.top_n)
+        report.write("=== CPU: top functions by own time ===\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.profiler.top_n)
+        report.write("=== Memory: top allocation sites still held at the end of the request ===\n")
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        for stat in snapshot.statistics('lineno')[:self.profiler.top_n]:
+            report.write(f"{stat}\n")
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        with open(f"{base}.json", 'w') as f:
+            json.dump({
+                'id': self.profile_id,
+                'label': self.label,
+                'status': status,
+                'started_at': self.started_at,
+                'duration_seconds': duration,
+                'peak_traced_bytes': peak,
+                'held_traced_bytes': current,
+            }, f)
+
+        self.profiler._prune()
+        return self.profile_id
+
+class RequestProfiler:
+    """Opt-in per-request profiling, one request at a time.
+
+    cProfile traces the thread that handles the request plus the calls it
+    hands to other threads through profiled() (the /query worker, OCR
+    regions); tracemalloc records allocations process-wide, so only one
+    request is profiled at a time and start() returns None while another
+    profile is running. Each profile is saved
+    as {id}.prof (pstats / snakeviz), {id}.txt (readable summary) and
+    {id}.json (metadata); only the newest max_profiles are kept.
+    """
+
+    def __init__(self, profiles_dir, max_profiles=50, top_n=40, trace_frames=1):
+        self.profiles_dir = Path(profiles_dir)
+        self.max_profiles = max_profiles
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self._busy = threading.Lock()
+
+    def start(self, label):
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            self.profiles_dir.mkdir(parents=True, exist_ok=True)
+            return ProfileSession(self, label)
+        except Exception:
+            self._busy.release()
+            raise
+
+    def _release(self):
+        self._busy.release()
+
+    def list_profiles(self):
+        """Metadata of the saved profiles, newest first"""
+        profiles = []
+        for path in self.profiles_dir.glob("*.json"):
+            try:
+                with open(path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda profile: profile['started_at'], reverse=True)
+
+    def profile_path(self, profile_id, kind="txt"):
+        """Path of one saved profile file, or None if it does not exist"""
+        if kind not in ("prof", "txt", "json") or not profile_id.replace('-', '').isalnum():
+            return None
+        path = self.profiles_dir / f"{profile_id}.{kind}"
+        return path if path.exists() else None
+
+    def _prune(self):
+        for stale in self.list_profiles()[self.max_profiles:]:
+            for kind in ("prof", "txt", "json"):
+                path = self.profiles_dir / f"{stale['id']}.{kind}"
+                if os.path.exists(path):
+                    os.unlink(path)
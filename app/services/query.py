@@ -1,45 +1,178 @@
 
 # services/query.py
+import time
 from .vector_store import FAISSVectorStore
 from .llm import DocumentQAAgent
+from .response_parser import ResponseParser, parse_response
+from .metrics import SESSION_RETRIEVALS, stage
+from config import config
 
 class QueryProcessor:
     def __init__(self):
         self.vector_store = FAISSVectorStore()
         self.qa_agent = DocumentQAAgent()
+        self.reranker = None
+        if config.RERANK_ENABLED:
+            from .reranker import CrossEncoderReranker
+            self.reranker = CrossEncoderReranker(
+                config.RERANKER_MODEL,
+                batch_size=config.RERANK_BATCH_SIZE,
+                margin=config.RERANK_MARGIN
+            )
+
+    def candidate_depth(self, k):
+        """How many chunks to retrieve so that k survive re-ranking"""
+        return max(k, config.RERANK_CANDIDATES) if self.reranker else k
+
+    def select_context(self, question, contexts, metadata_list, k):
+        """Narrow retrieved candidates down to the chunks sent to the LLM"""
+        if self.reranker is None or not contexts:
+            return contexts[:k], metadata_list[:k]
+        with stage('rerank'):
+            return self.reranker.rerank(question, contexts, metadata_list, top_n=min(k, config.RERANK_TOP_N))
         
-    def process_query(self, question, k=10):
-        """Process a query and return structured results"""
-        # Get relevant documents
-        contexts, metadata_list = self.vector_store.search(question, k=k)
-        
+    def retrieve(self, question, k, session=None, filters=None):
+        """The chunks to send to the LLM: retrieved (through the session, if any) and narrowed down to k.
+
+        filters restrict retrieval to chunks with matching metadata, e.g. {'tenant': 'acme'}.
+        """
+        if session is not None:
+            contexts, metadata_list = self.session_retrieve(session, question, self.candidate_depth(k), filters)
+        else:
+            with stage('retrieve'):
+                contexts, metadata_list = self.vector_store.search(question, k=self.candidate_depth(k), filters=filters)
+        return self.select_context(question, contexts, metadata_list, k)
+
+    def process_query(self, question, k=10, session=None, filters=None):
+        """Process a query and return structured results; with a session, as a follow-up in that conversation"""
+        contexts, metadata_list, history = self._prepare(question, k, session, filters)
+        results = self.answer_from_context(question, contexts, metadata_list, history=history)
+        if session is not None:
+            with session.lock:
+                session.add_turn(question, results['synthesized_answer'])
+        return results
+
+    def _prepare(self, question, k, session, filters=None):
+        """Retrieved chunks and conversation history for a question.
+
+        The session lock is only held here and in add_turn, never while the
+        LLM runs, so concurrent questions in one session do not wait on
+        each other (they may both be answered without the other's turn).
+        """
+        if session is None:
+            contexts, metadata_list = self.retrieve(question, k, filters=filters)
+            return contexts, metadata_list, None
+        with session.lock:
+            contexts, metadata_list = self.retrieve(question, k, session, filters)
+            return contexts, metadata_list, session.history_text()
+
+    def stream_query(self, question, k=10, session=None, interval=0.25, filters=None):
+        """Like process_query, but yields (results, final) with partial results while the LLM is still writing.
+
+        Partial results are parsed from the text streamed so far, at most
+        once per interval seconds; the last item is the final result.
+        """
+        contexts, metadata_list, history = self._prepare(question, k, session, filters)
+        if not contexts:
+            results = self.answer_from_context(question, contexts, metadata_list)
+        else:
+            parser = ResponseParser()
+            pieces = []
+            last_snapshot = time.monotonic()
+            for piece in self.qa_agent.stream_answer_with_themes(question, contexts, metadata_list, history):
+                parser.feed(piece)
+                pieces.append(piece)
+                if time.monotonic() - last_snapshot >= interval:
+                    last_snapshot = time.monotonic()
+                    snapshot = parser.snapshot()
+                    partial = self._build_result("".join(pieces), snapshot, contexts, metadata_list)
+                    # No raw-text fallback while the answer is still being written
+                    partial['synthesized_answer'] = snapshot['synthesized_answer']
+                    yield partial, False
+
+            with stage('parse'):
+                parsed = parser.close()
+            results = self._build_result("".join(pieces), parsed, contexts, metadata_list)
+
+        if session is not None:
+            with session.lock:
+                session.add_turn(question, results['synthesized_answer'])
+        yield results, True
+
+    def session_retrieve(self, session, question, depth, filters=None):
+        """Rank the session's cached chunks for question, searching the index only when it brings new terms.
+
+        Newly retrieved chunks are embedded once and join the session's pool,
+        so later follow-ups are re-scored against everything retrieved so far.
+        """
+        store = self.vector_store
+        session.sync(store.snapshot().version, store.embedding_model, filters)
+        new_terms = session.new_terms(question)
+
+        with stage('retrieve'):
+            query_embedding = store.encode_queries([question])[0]
+            if new_terms or not session.chunks:
+                contexts, metadata_list = store.search(question, k=depth, filters=filters)
+                missing = session.missing_chunks(contexts, metadata_list)
+                embeddings = []
+                if missing:
+                    with stage('embed'):
+                        embeddings = store.encoder(store.embedding_model).encode(
+                            [contexts[i] for i in missing], normalize_embeddings=True
+                        )
+                session.add_chunks(
+                    [contexts[i] for i in missing], [metadata_list[i] for i in missing], embeddings, new_terms
+                )
+                SESSION_RETRIEVALS.inc(result="search")
+            else:
+                SESSION_RETRIEVALS.inc(result="reused")
+            return session.rank(query_embedding, depth)
+
+    def answer_from_context(self, question, contexts, metadata_list, history=None):
+        """Run the LLM over already retrieved chunks and return structured results"""
         if not contexts:
             return {
                 'individual_answers': [],
                 'themes': [],
                 'synthesized_answer': "No relevant documents found for your query."
             }
-        
+
         # Generate answer with themes using LangChain agent
         agent_response = self.qa_agent.generate_answer_with_themes(
-            question, contexts, metadata_list
+            question, contexts, metadata_list, history=history
         )
         
-        # Parse the response (you might want to make this more robust)
-        individual_answers = self._extract_individual_answers(agent_response, contexts, metadata_list)
-        themes = self._extract_themes(agent_response)
-        synthesized_answer = self._extract_synthesized_answer(agent_response)
-        
+        with stage('parse'):
+            parsed = parse_response(agent_response)
+        return self._build_result(agent_response, parsed, contexts, metadata_list)
+
+    def _build_result(self, agent_response, parsed, contexts, metadata_list):
+        """Combine the parsed LLM response with the retrieved chunks"""
         return {
-            'individual_answers': individual_answers,
-            'themes': themes,
-            'synthesized_answer': synthesized_answer,
+            'individual_answers': self._extract_individual_answers(parsed, contexts, metadata_list),
+            'themes': parsed['themes'],
+            'synthesized_answer': parsed['synthesized_answer'] or agent_response,
             'raw_response': agent_response
         }
-    
-    def _extract_individual_answers(self, response, contexts, metadata_list):
-        """Extract individual document answers from LLM response"""
+
+    def _extract_individual_answers(self, parsed, contexts, metadata_list):
+        """Individual answers from the LLM table, falling back to the retrieved excerpts"""
+        scores = {}
+        for metadata in metadata_list:
+            doc_id = str(metadata.get('doc_id', ''))
+            scores[doc_id] = max(scores.get(doc_id, 0.0), metadata.get('score', 0.0))
+
         individual_answers = []
+        for answer in parsed['individual_answers']:
+            individual_answers.append({
+                'document_id': answer['document_id'],
+                'answer': answer['answer'],
+                'citation': answer['citation'],
+                'relevance_score': scores.get(answer['document_id'], 0.0)
+            })
+        if individual_answers:
+            return individual_answers
+
         for i, (context, metadata) in enumerate(zip(contexts, metadata_list)):
             individual_answers.append({
                 'document_id': metadata.get('doc_id', f'DOC{i:03d}'),
@@ -48,49 +181,3 @@ class QueryProcessor:
                 'relevance_score': metadata.get('score', 0.0)
             })
         return individual_answers
-    
-    def _extract_themes(self, response):
-        """Extract themes from LLM response"""
-        
-        themes = []
-        lines = response.split('\n')
-        current_theme = None
-        
-        for line in lines:
-            if 'Theme' in line and ':' in line:
-                if current_theme:
-                    themes.append(current_theme)
-                current_theme = {
-                    'name': line.strip(),
-                    'summary': '',
-                    'supporting_docs': []
-                }
-            elif current_theme and line.strip():
-                if 'Supporting Documents:' in line:
-                    # Extract document IDs
-                    current_theme['supporting_docs'] = line.replace('Supporting Documents:', '').strip()
-                elif 'Summary:' in line:
-                    current_theme['summary'] = line.replace('Summary:', '').strip()
-                elif current_theme['summary']:
-                    current_theme['summary'] += ' ' + line.strip()
-        
-        if current_theme:
-            themes.append(current_theme)
-            
-        return themes
-    
-    def _extract_synthesized_answer(self, response):
-        """Extract synthesized answer from LLM response"""
-        # Simple extraction - look for content after themes
-        lines = response.split('\n')
-        synthesized_start = False
-        synthesized_lines = []
-        
-        for line in lines:
-            if 'synthesized' in line.lower() or 'conclusion' in line.lower():
-                synthesized_start = True
-                continue
-            if synthesized_start and line.strip():
-                synthesized_lines.append(line.strip())
-        
-        return ' '.join(synthesized_lines) if synthesized_lines else response
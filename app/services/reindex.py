@@ -0,0 +1,101 @@
+# services/reindex.py
+import threading
+import time
+
+class ReindexCancelled(Exception):
+    """Raised from the progress callback to stop a running re-index"""
+
+class ReindexJob:
+    """Rebuilds the vector store in a background thread.
+
+    The store keeps serving queries from its current generation while the
+    chunks are re-embedded in batches (see FAISSVectorStore.rebuild); the
+    rebuilt generation is swapped in at the end. max_rate caps the number of
+    chunks embedded per second so the rebuild does not starve query traffic.
+    """
+
+    def __init__(self, store, embedding_model=None, index_type=None, batch_size=256, max_rate=0, on_complete=None):
+        self.store = store
+        self.embedding_model = embedding_model
+        self.index_type = index_type
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.on_complete = on_complete
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {
+            'state': 'pending',
+            'from_model': store.embedding_model,
+            'to_model': embedding_model or store.embedding_model,
+            'index_type': index_type,
+            'processed': 0,
+            'total': store.total_chunks(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+        }
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._update(state='running', started_at=time.time())
+        self._thread = threading.Thread(target=self._run, name="reindex", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self):
+        """Copy of the job status with progress, rate and an estimated time left"""
+        with self._lock:
+            status = dict(self._status)
+
+        if status['started_at']:
+            elapsed = (status['finished_at'] or time.time()) - status['started_at']
+            status['elapsed_seconds'] = elapsed
+            status['chunks_per_second'] = status['processed'] / elapsed if elapsed > 0 else 0.0
+            remaining = status['total'] - status['processed']
+            if status['state'] == 'running' and status['chunks_per_second'] > 0:
+                status['eta_seconds'] = remaining / status['chunks_per_second']
+        status['progress'] = status['processed'] / status['total'] if status['total'] else 1.0
+        return status
+
+    def _update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _on_batch(self, done, total):
+        self._update(processed=done, total=total)
+        if self._cancel.is_set():
+            raise ReindexCancelled()
+
+        # Throttle: sleep until the average rate is back under max_rate
+        if self.max_rate:
+            elapsed = time.time() - self._status['started_at']
+            delay = done / self.max_rate - elapsed
+            if delay > 0:
+                time.sleep(delay)
+
+    def _run(self):
+        try:
+            chunks = self.store.rebuild(
+                embedding_model=self.embedding_model,
+                index_type=self.index_type,
+                batch_size=self.batch_size,
+                on_batch=self._on_batch
+            )
+            if self.on_complete:
+                self.on_complete()
+            self._update(state='completed', processed=chunks, total=chunks, finished_at=time.time())
+        except ReindexCancelled:
+            self._update(state='cancelled', finished_at=time.time())
+        except Exception as e:
+            print(f"Re-index failed: {e}")
+            self._update(state='failed', error=str(e), finished_at=time.time())
@@ -0,0 +1,41 @@
+# services/reranker.py
+
+class CrossEncoderReranker:
+    """Re-scores dense retrieval candidates with a local cross-encoder on CPU.
+
+    Candidates arrive in dense-score order and are scored in batches. Once the
+    current top_n cut-off beats the best score of the latest batch by at least
+    `margin`, deeper candidates are unlikely to make the cut and scoring stops.
+    The candidate depth itself is the caller's (RERANK_CANDIDATES); the early
+    stop only saves cross-encoder work, not the FAISS fetch.
+    """
+
+    def __init__(self, model_name='cross-encoder/ms-marco-MiniLM-L-6-v2', batch_size=16, margin=2.0, model=None):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, max_length=512, device='cpu')
+        self.model = model
+        self.batch_size = batch_size
+        self.margin = margin
+
+    def rerank(self, question, contexts, metadata_list, top_n=5):
+        """Return the top_n (contexts, metadata) by cross-encoder score"""
+        scored = []
+        for start in range(0, len(contexts), self.batch_size):
+            batch = contexts[start:start + self.batch_size]
+            scores = self.model.predict([(question, context) for context in batch], batch_size=self.batch_size)
+            scored.extend((float(score), start + i) for i, score in enumerate(scores))
+
+            if len(scored) >= top_n and start + self.batch_size < len(contexts):
+                cutoff = sorted((score for score, _ in scored), reverse=True)[top_n - 1]
+                if cutoff - max(float(score) for score in scores) >= self.margin:
+                    break
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        top = scored[:top_n]
+        reranked_contexts = [contexts[i] for _, i in top]
+        reranked_metadata = [
+            {**metadata_list[i], 'rerank_score': score, 'candidates_scored': len(scored)}
+            for score, i in top
+        ]
+        return reranked_contexts, reranked_metadata
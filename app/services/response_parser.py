@@ -0,0 +1,443 @@
+# services/response_parser.py
+import json
+import re
+
+_TABLE_SEPARATOR = re.compile(r'^[\s|:\-]+$')
+_THEME_LINE = re.compile(r'^theme(?:\s+name)?(?:\s*\d+)?\s*:\s*(.*)$', re.IGNORECASE)
+_SUPPORTING_LINE = re.compile(r'^supporting\s+(?:docs|documents)\s*:\s*(.*)$', re.IGNORECASE)
+_SUMMARY_LINE = re.compile(r'^summary\s*:\s*(.*)$', re.IGNORECASE)
+_SYNTHESIZED_LINE = re.compile(r'^(?:synthesized\s+answer|conclusion)\s*(?::\s*(.*))?$', re.IGNORECASE)
+_INDIVIDUAL_HEADING = re.compile(r'^individual\s+document\s+responses', re.IGNORECASE)
+_DOC_REFERENCE = re.compile(r'[^,(]+(?:\([^)]*\))?')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$')
+
+
+def _clean(text):
+    """Strip markdown emphasis and whitespace around a fragment"""
+    return text.strip().strip('*_').strip()
+
+
+def split_doc_references(value):
+    """Split 'DOC1 (Page 2, Para 3), DOC2 (Page 1, Para 1)' into separate references"""
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    if not value:
+        return []
+    return [match.strip() for match in _DOC_REFERENCE.findall(str(value)) if match.strip()]
+
+
+def _close_json(text):
+    """Close any open string, array or object so a truncated JSON document can be loaded"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    text = _DANGLING_KEY.sub('', text.rstrip()).rstrip().rstrip(',')
+    return _TRAILING_COMMA.sub(r'\1', text + ''.join(reversed(stack)))
+
+
+def repair_json(text):
+    """Best-effort load of LLM JSON output: code fences, trailing commas and truncation"""
+    start = text.find('{')
+    if start == -1:
+        return None
+    text = text[start:]
+
+    end = text.rfind('}')
+    if end != -1:
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r'\1', text[:end + 1]))
+        except json.JSONDecodeError:
+            pass
+
+    # Truncated output: close what is open, backing off one element at a time
+    candidate = text
+    for _ in range(8):
+        try:
+            return json.loads(_close_json(candidate))
+        except json.JSONDecodeError:
+            cut = max(candidate.rfind(','), candidate.rfind('{', 0, len(candidate) - 1))
+            if cut <= 0:
+                return None
+            candidate = candidate[:cut]
+    return None
+
+
+def _normalize_structured(data):
+    """Map a JSON response onto the QueryProcessor result layout"""
+    if not isinstance(data, dict):
+        return None
+
+    individual_answers = []
+    for item in data.get('individual_answers') or data.get('individual_responses') or []:
+        if not isinstance(item, dict):
+            continue
+        individual_answers.append({
+            'document_id': str(item.get('document_id') or item.get('doc_id') or '').strip(),
+            'answer': str(item.get('answer') or item.get('extracted_answer') or '').strip(),
+            'citation': str(item.get('citation') or '').strip()
+        })
+
+    themes = []
+    for item in data.get('themes') or []:
+        if not isinstance(item, dict):
+            continue
+        themes.append({
+            'name': str(item.get('name') or item.get('theme') or '').strip(),
+            'summary': str(item.get('summary') or '').strip(),
+            'supporting_docs': split_doc_references(item.get('supporting_docs') or item.get('supporting_documents'))
+        })
+
+    return {
+        'individual_answers': individual_answers,
+        'themes': themes,
+        'synthesized_answer': str(data.get('synthesized_answer') or '').strip()
+    }
+
+
+class _JsonScanner:
+    """Incremental JSON reader that builds the document as text arrives.
+
+    Each character is looked at once: completed values are attached to
+    their container right away, and the string being written is decoded
+    only when a snapshot asks for it. Leading text (such as a ```json fence)
+    and anything after the top-level object are ignored; trailing commas
+    are tolerated. Anything else that is not JSON sets error, and the
+    caller falls back to repair_json / markdown.
+    """
+
+    _STRING_RUN = re.compile(r'[^"\\]+')
+    _SCALAR_RUN = re.compile(r'[^\s,:{}\[\]"]+')
+
+    def __init__(self):
+        self.root = None
+        self.done = False
+        self.error = False
+        self._stack = []        # open containers
+        self._keys = []         # per open container: pending dict key (None when a key is expected)
+        self._string = None     # raw characters of the string being read
+        self._escaped = False
+        self._target = None     # (container, key) the string being read belongs to; None for keys
+        self._scalar = ""
+
+    def feed(self, text):
+        i, n = 0, len(text)
+        while i < n and not (self.done or self.error):
+            if self._string is not None:
+                match = self._STRING_RUN.match(text, i)
+                if match and not self._escaped:
+                    self._string.append(match.group())
+                    i = match.end()
+                    continue
+                char = text[i]
+                i += 1
+                self._string.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._string.pop()
+                    self._end_string()
+                continue
+
+            char = text[i]
+            if self.root is None:
+                # Skip anything before the object, e.g. a code fence
+                i += 1
+                if char == '{':
+                    self.root = {}
+                    self._stack.append(self.root)
+                    self._keys.append(None)
+                continue
+
+            if char.isspace():
+                i += 1
+                self._end_scalar()
+            elif char == '"':
+                i += 1
+                self._end_scalar()
+                self._start_string()
+            elif char in '{[':
+                i += 1
+                self._end_scalar()
+                container = {} if char == '{' else []
+                self._attach(container)
+                self._stack.append(container)
+                self._keys.append(None)
+            elif char in '}]':
+                i += 1
+                self._end_scalar()
+                if not isinstance(self._stack[-1], dict if char == '}' else list):
+                    self.error = True
+                    return
+                self._stack.pop()
+                self._keys.pop()
+                if not self._stack:
+                    self.done = True
+            elif char == ',':
+                i += 1
+                self._end_scalar()
+            elif char == ':':
+                i += 1
+                if self._scalar or not isinstance(self._stack[-1], dict) or self._keys[-1] is None:
+                    self.error = True
+            else:
+                match = self._SCALAR_RUN.match(text, i)
+                self._scalar += match.group()
+                i = match.end()
+
+    def _start_string(self):
+        container = self._stack[-1]
+        self._string = []
+        self._escaped = False
+        if isinstance(container, dict) and self._keys[-1] is None:
+            self._target = None
+        else:
+            self._target = self._attach("")
+
+    def _end_string(self):
+        value = self._decode("".join(self._string))
+        self._string = None
+        if value is None:
+            self.error = True
+        elif self._target is None:
+            self._keys[-1] = value
+        else:
+            container, key = self._target
+            container[key] = value
+            self._target = None
+
+    def _end_scalar(self):
+        if not self._scalar:
+            return
+        try:
+            value = json.loads(self._scalar)
+        except json.JSONDecodeError:
+            self.error = True
+            return
+        finally:
+            self._scalar = ""
+        self._attach(value)
+
+    def _attach(self, value):
+        """Put value into the open container; returns (container, key) where it went"""
+        container = self._stack[-1]
+        if isinstance(container, list):
+            container.append(value)
+            return container, len(container) - 1
+        key = self._keys[-1]
+        if key is None:
+            self.error = True
+            return container, None
+        container[key] = value
+        self._keys[-1] = None
+        return container, key
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            return json.loads('"' + raw + '"', strict=False)
+        except json.JSONDecodeError:
+            return None
+
+    def snapshot(self):
+        """The document so far, with the string being written filled in up to where it has arrived"""
+        if self._string is not None and self._target is not None:
+            # Drop a trailing, incomplete escape sequence before decoding
+            raw = "".join(self._string)
+            raw = raw[:-1] if self._escaped else re.sub(r'\\u[0-9a-fA-F]{0,3}$', '', raw)
+            value = self._decode(raw)
+            if value is not None:
+                container, key = self._target
+                container[key] = value
+        return self.root
+
+
+class ResponseParser:
+    """Single-pass, incremental parser for DocumentQAAgent responses.
+
+    Accepts either the JSON layout requested in JSON mode or the markdown layout
+    (table, theme blocks, synthesized answer). Text can be fed in arbitrary
+    pieces as it streams in and is scanned once; snapshot() returns the best
+    result so far and close() the final one. JSON the incremental scanner
+    cannot read is repaired at close(), and if that fails the buffered text
+    is parsed as markdown instead.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._pending = ""
+        self._mode = None
+        self._json = _JsonScanner()
+        self._reset_markdown()
+
+    def _reset_markdown(self):
+        self._section = None
+        self._answers = []
+        self._themes = []
+        self._current_theme = None
+        self._synthesized = []
+
+    def feed(self, text):
+        """Consume the next piece of the response"""
+        if not text:
+            return
+        self._buffer.append(text)
+
+        if self._mode is None:
+            head = "".join(self._buffer).lstrip()
+            if not head:
+                return
+            if head[0] == '{' or head.startswith('```json'):
+                self._mode = 'json'
+            elif head[0] == '`' and len(head) < 7:
+                return
+            else:
+                self._mode = 'markdown'
+            text = "".join(self._buffer)
+
+        if self._mode == 'json':
+            self._json.feed(text)
+        elif self._mode == 'markdown':
+            lines = (self._pending + text).split('\n')
+            self._pending = lines.pop()
+            for line in lines:
+                self._consume_line(line)
+
+    def snapshot(self):
+        """Result parsed from the text received so far"""
+        if self._mode == 'json':
+            return _normalize_structured(self._json.snapshot()) or self._empty()
+        return self._markdown_result(self._pending)
+
+    def close(self):
+        """Finish parsing and return the final result"""
+        text = "".join(self._buffer)
+        if self._mode == 'json':
+            # A truncated response keeps whatever had arrived, as in a snapshot
+            data = self._json.snapshot() if not self._json.error else repair_json(text)
+            result = _normalize_structured(data)
+            if result is not None:
+                return result
+            # Not JSON after all: fall back to the markdown layout
+            self._reset_markdown()
+            lines = text.split('\n')
+            self._pending = lines.pop()
+            for line in lines:
+                self._consume_line(line)
+        elif self._mode is None and text:
+            self._mode = 'markdown'
+            self._pending = text
+
+        if self._pending:
+            self._consume_line(self._pending)
+            self._pending = ""
+        return self._markdown_result()
+
+    @staticmethod
+    def _empty():
+        return {'individual_answers': [], 'themes': [], 'synthesized_answer': ''}
+
+    def _consume_line(self, line):
+        stripped = line.strip()
+        if not stripped:
+            return
+
+        if stripped.startswith('|'):
+            self._consume_table_row(stripped)
+            return
+
+        plain = _clean(stripped.lstrip('#').strip())
+        plain = re.sub(r'\*\*|__', '', plain).strip()
+
+        if _INDIVIDUAL_HEADING.match(plain):
+            self._section = 'table'
+            return
+
+        match = _SYNTHESIZED_LINE.match(plain)
+        if match:
+            self._close_theme()
+            self._section = 'synthesized'
+            if match.group(1) and match.group(1).strip():
+                self._synthesized.append(match.group(1).strip())
+            return
+
+        match = _THEME_LINE.match(plain)
+        if match:
+            self._close_theme()
+            self._section = 'theme'
+            self._current_theme = {'name': _clean(match.group(1)), 'summary': '', 'supporting_docs': []}
+            return
+
+        if self._section == 'theme' and self._current_theme is not None:
+            match = _SUPPORTING_LINE.match(plain)
+            if match:
+                self._current_theme['supporting_docs'] = split_doc_references(match.group(1))
+                return
+            match = _SUMMARY_LINE.match(plain)
+            if match:
+                self._current_theme['summary'] = match.group(1).strip()
+                return
+            if self._current_theme['summary']:
+                self._current_theme['summary'] += ' ' + plain
+            elif not self._current_theme['name']:
+                self._current_theme['name'] = plain
+            return
+
+        if self._section == 'synthesized':
+            self._synthesized.append(plain)
+
+    def _consume_table_row(self, row):
+        if _TABLE_SEPARATOR.match(row):
+            return
+        cells = [re.sub(r'\*\*|__', '', _clean(cell)).strip() for cell in row.strip('|').split('|')]
+        if len(cells) < 2 or cells[0].lower() in ('document id', 'doc id', 'doc_id'):
+            return
+        self._answers.append({
+            'document_id': cells[0],
+            'answer': cells[1],
+            'citation': cells[2] if len(cells) > 2 else ''
+        })
+
+    def _close_theme(self):
+        if self._current_theme is not None:
+            self._themes.append(self._current_theme)
+            self._current_theme = None
+
+    def _markdown_result(self, pending=""):
+        themes = list(self._themes)
+        if self._current_theme is not None:
+            themes.append(dict(self._current_theme))
+        synthesized = list(self._synthesized)
+        if pending.strip() and self._section == 'synthesized':
+            synthesized.append(_clean(pending))
+        return {
+            'individual_answers': list(self._answers),
+            'themes': themes,
+            'synthesized_answer': ' '.join(synthesized)
+        }
+
+
+def parse_response(text):
+    """Parse a complete LLM response in one pass"""
+    parser = ResponseParser()
+    parser.feed(text)
+    return parser.close()
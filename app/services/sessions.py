@@ -0,0 +1,170 @@
+# services/sessions.py
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+STOPWORDS = set("""
+a about above after again all also am an and any are as at be because been before being between both but by can
+could did do does doing during each few for from further had has have having he her here hers him his how i if in
+into is it its itself just me more most my no nor not now of off on once only or other our out over own same she
+should so some such than that the their them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours
+tell give show explain describe list find mention mentioned say said document documents
+please again else elaborate detail details summarize summary compare briefly exactly
+""".split())
+
+def content_terms(text):
+    """Lowercased words that carry meaning for retrieval"""
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2 and word not in STOPWORDS}
+
+def first_sentence(text, limit=200):
+    sentence = re.split(r'(?<=[.!?])\s+', text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + "..."
+
+class QuerySession:
+    """Conversation state of one session: bounded history and the chunks retrieved so far.
+
+    The last max_turns turns are kept verbatim; older ones are folded into
+    a summary of at most summary_chars characters (question plus the first
+    sentence of its answer). Retrieved chunks are kept with their normalized
+    embeddings (at most max_chunks, most recent first) so follow-up
+    questions can be answered by re-scoring them instead of searching the
+    index again. The chunk cache is dropped when the index generation,
+    embedding model or search filters change.
+    """
+
+    def __init__(self, session_id, tenant=None, max_turns=4, summary_chars=1500, max_chunks=50):
+        self.session_id = session_id
+        self.tenant = tenant
+        self.max_turns = max_turns
+        self.summary_chars = summary_chars
+        self.max_chunks = max_chunks
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = threading.Lock()
+
+        self.turns = deque()
+        self.summary = ""
+        self.terms = set()
+        self.chunks = OrderedDict()  # (doc_id, text) -> (text, metadata, embedding)
+        self.index_state = None
+
+    def sync(self, version, embedding_model, filters=None):
+        """Forget cached chunks retrieved from another index generation, model or set of filters"""
+        state = (version, embedding_model, json.dumps(filters, sort_keys=True, default=str) if filters else None)
+        if self.index_state != state:
+            self.chunks.clear()
+            self.terms = set()
+            self.index_state = state
+
+    def new_terms(self, question):
+        return content_terms(question) - self.terms
+
+    @staticmethod
+    def chunk_key(text, metadata):
+        return (metadata.get('doc_id'), text)
+
+    def missing_chunks(self, contexts, metadata_list):
+        """Positions of the retrieved chunks that are not cached yet (so only those get embedded)"""
+        return [i for i, (text, metadata) in enumerate(zip(contexts, metadata_list))
+                if self.chunk_key(text, metadata) not in self.chunks]
+
+    def add_chunks(self, contexts, metadata_list, embeddings, terms):
+        for text, metadata, embedding in zip(contexts, metadata_list, embeddings):
+            key = self.chunk_key(text, metadata)
+            self.chunks[key] = (text, metadata, np.asarray(embedding, dtype='float32'))
+            self.chunks.move_to_end(key, last=False)
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem()
+        self.terms |= terms
+
+    def rank(self, query_embedding, k):
+        """Cached chunks ordered by cosine similarity to the query, with fresh scores"""
+        if not self.chunks:
+            return [], []
+        entries = list(self.chunks.values())
+        scores = np.stack([entry[2] for entry in entries]) @ np.asarray(query_embedding, dtype='float32')
+        contexts, metadata_list = [], []
+        for i in np.argsort(-scores)[:k]:
+            text, metadata, _ = entries[i]
+            contexts.append(text)
+            metadata_list.append({**metadata, 'score': float(scores[i])})
+        return contexts, metadata_list
+
+    def history_text(self):
+        """Summary of older turns plus the recent ones, for the prompt; empty on the first turn"""
+        lines = [f"Earlier: {self.summary}"] if self.summary else []
+        for question, answer in self.turns:
+            lines.append(f"Q: {question}\nA: {first_sentence(answer, 500)}")
+        return "\n".join(lines)
+
+    def add_turn(self, question, answer):
+        self.turns.append((question, answer))
+        while len(self.turns) > self.max_turns:
+            old_question, old_answer = self.turns.popleft()
+            self.summary = f"{self.summary} Q: {old_question} A: {first_sentence(old_answer)}".strip()
+            if len(self.summary) > self.summary_chars:
+                # Drop the oldest part of the summary
+                self.summary = "..." + self.summary[-self.summary_chars:]
+
+    def info(self):
+        return {
+            'session_id': self.session_id,
+            'tenant': self.tenant,
+            'turns': len(self.turns),
+            'summarized': bool(self.summary),
+            'cached_chunks': len(self.chunks),
+            'created_at': self.created_at,
+            'last_used': self.last_used
+        }
+
+class SessionStore:
+    """Sessions by (tenant, id), evicting the least recently used beyond max_sessions and any idle for ttl seconds.
+
+    Session ids are chosen by clients, so the same id sent for another
+    tenant names a different session and never sees this one's history or
+    cached chunks.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800, **session_options):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.session_options = session_options
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id, tenant=None, create=True):
+        now = time.time()
+        key = (tenant, session_id)
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(key)
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[key] = QuerySession(session_id, tenant, **self.session_options)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(key)
+            session.last_used = now
+            return session
+
+    def delete(self, session_id, tenant=None):
+        with self._lock:
+            return self._sessions.pop((tenant, session_id), None) is not None
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired(time.time())
+            return len(self._sessions)
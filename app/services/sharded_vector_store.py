@@ -0,0 +1,443 @@
+# services/sharded_vector_store.py
+import argparse
+import heapq
+import ipaddress
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import faiss
+import numpy as np
+
+from .encoders import embedding_dimension
+from .metrics import stage
+from .vector_store import INDEX_TYPES, BaseVectorStore, FAISSVectorStore
+from config import config
+
+class ShardedGeneration:
+    """Version stamp for the sharded store; shards keep their own generations"""
+    __slots__ = ('version', 'embedding_model', 'total')
+
+    def __init__(self, version, embedding_model=None):
+        self.version = version
+        self.embedding_model = embedding_model
+        # Chunk count across shards, asked for once per generation
+        self.total = None
+
+class ShardedVectorStore(BaseVectorStore):
+    """Partitions chunks over several FAISSVectorStore shards.
+
+    Chunks are routed by a stable hash of metadata[shard_key] (doc_id by
+    default, or e.g. tenant), queries are encoded once and fanned out to all
+    shards in a thread pool (FAISS releases the GIL during search), and the
+    per-shard top-k lists are merged with a heap. A search filtered on the
+    shard key only goes to the shards its values hash to. Shards may be local
+    stores or RemoteShard clients of ShardServer processes.
+    """
+
+    def __init__(self, num_shards=4, shard_key='doc_id', shards=None, embedding_dim=None, cache_size=1024, model=None,
+                 embedding_model=None, embedding_backend=None, **store_options):
+        self.embedding_model = embedding_model or config.EMBEDDING_MODEL
+        self.embedding_backend = embedding_backend
+        self.embedding_dim = embedding_dim or embedding_dimension(self.embedding_model, embedding_backend)
+        self.shard_key = shard_key
+        self.model = model
+        self.shards = shards or [
+            FAISSVectorStore(self.embedding_dim, cache_size=0, model=model, embedding_model=self.embedding_model,
+                             embedding_backend=embedding_backend, **store_options)
+            for _ in range(num_shards)
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+        self._version_lock = threading.Lock()
+        self._generation = ShardedGeneration(0, self.embedding_model)
+        self._init_caches(cache_size)
+
+    def _bump_version(self):
+        with self._version_lock:
+            self._generation = ShardedGeneration(self._generation.version + 1, self.embedding_model)
+
+    def _map(self, fn):
+        """Run fn(shard) on every shard in parallel and return the results in shard order"""
+        return list(self._executor.map(fn, self.shards))
+
+    def shard_for(self, metadata):
+        """Stable shard number for a chunk (crc32, so it survives restarts)"""
+        key = metadata.get(self.shard_key, metadata.get('doc_id', ''))
+        return zlib.crc32(str(key).encode('utf-8')) % len(self.shards)
+
+    def snapshot(self):
+        return self._generation
+
+    def total_chunks(self, generation=None):
+        # Every write through this store bumps the generation
+        generation = generation or self._generation
+        if generation.total is None:
+            generation.total = sum(self._map(lambda shard: shard.total_chunks()))
+        return generation.total
+
+    def shards_for(self, filters):
+        """Shard numbers that can hold chunks matching filters: all of them unless the shard key is filtered on"""
+        accepted = (filters or {}).get(self.shard_key)
+        if accepted is None:
+            return list(range(len(self.shards)))
+        values = accepted if isinstance(accepted, (list, tuple, set)) else [accepted]
+        return sorted({self.shard_for({self.shard_key: value}) for value in values})
+
+    @property
+    def document_summary(self):
+        summary = {}
+        for shard_summary in self._map(lambda shard: shard.document_summary):
+            for doc_id, doc in shard_summary.items():
+                merged = summary.setdefault(doc_id, dict(doc, chunks_count=0))
+                merged['chunks_count'] += doc['chunks_count']
+        return summary
+
+    @property
+    def disk_version(self):
+        return max(self._map(lambda shard: shard.disk_version), default=0)
+
+    def add_documents(self, chunks, metadata_list):
+        """Encode once, then add each shard's slice of the chunks"""
+        with stage('embed'):
+            embeddings = np.asarray(self.model.encode(chunks, normalize_embeddings=True), dtype='float32')
+
+        by_shard = {}
+        for i, metadata in enumerate(metadata_list):
+            by_shard.setdefault(self.shard_for(metadata), []).append(i)
+
+        def add(shard_no):
+            rows = by_shard[shard_no]
+            self.shards[shard_no].add_embeddings(
+                [chunks[i] for i in rows], [metadata_list[i] for i in rows], embeddings[rows]
+            )
+
+        list(self._executor.map(add, by_shard))
+        self._bump_version()
+
+    def clear(self):
+        self._map(lambda shard: shard.clear())
+        self._bump_version()
+
+    def _search_vectors(self, generation, query_embeddings, k, filters=None):
+        shard_nos = self.shards_for(filters)
+        per_shard = list(self._executor.map(
+            lambda shard_no: self.shards[shard_no].search_vectors(query_embeddings, k, filters), shard_nos
+        ))
+
+        results = []
+        for query_no in range(len(query_embeddings)):
+            candidates = []
+            for shard_no, shard_hits in zip(shard_nos, per_shard):
+                for hit in shard_hits[query_no]:
+                    candidates.append(dict(hit, index=(shard_no, hit['index'])))
+            results.append(heapq.nlargest(k, candidates, key=lambda hit: hit['score']))
+        return results
+
+    def index_stats(self, recall_sample=0, k=10):
+        """Totals across shards, recall weighted by shard size, plus per-shard stats"""
+        per_shard = self._map(lambda shard: shard.index_stats(recall_sample, k))
+        total = sum(stats['chunks'] for stats in per_shard)
+        index_bytes = sum(stats['index_bytes'] for stats in per_shard)
+        float32_bytes = sum(stats['float32_bytes'] for stats in per_shard)
+        stats = {
+            'chunks': total,
+            'index_bytes': index_bytes,
+            'float_store_bytes': sum(stats.get('float_store_bytes', 0) for stats in per_shard),
+            'float32_bytes': float32_bytes,
+            'compression': float32_bytes / index_bytes if index_bytes else None,
+            'shards': per_shard,
+        }
+        for key in ('index_recall_at_k', 'recall_at_k'):
+            measured = [s for s in per_shard if key in s]
+            if measured:
+                stats[key] = sum(s[key] * s['chunks'] for s in measured) / max(1, sum(s['chunks'] for s in measured))
+        return stats
+
+    def rebuild(self, embedding_model=None, index_type=None, batch_size=256, on_batch=None):
+        """Rebuild the shards one after another, e.g. to change the index type.
+
+        Each shard swaps in its rebuilt generation atomically. Queries are
+        encoded once for all shards, so the embedding model cannot be changed
+        this way while serving.
+        """
+        if embedding_model and embedding_model != self.embedding_model:
+            raise ValueError(
+                "A sharded store cannot change embedding model while serving; rebuild it offline with the new model"
+            )
+
+        # Progress is reported against the chunk count at the start
+        expected = sum(self._map(lambda shard: shard.total_chunks()))
+        rebuilt = 0
+        for shard in self.shards:
+            def progress(done, total, before=rebuilt):
+                on_batch(before + done, max(expected, before + done))
+            rebuilt += shard.rebuild(index_type=index_type, batch_size=batch_size, on_batch=progress if on_batch else None)
+            if on_batch:
+                on_batch(rebuilt, max(expected, rebuilt))
+            self._bump_version()
+        return rebuilt
+
+    def _shard_path(self, filepath, shard_no):
+        return f"{filepath}.shard{shard_no}"
+
+    def save_index(self, filepath="vector_store"):
+        """Each shard saves (and later loads) its own generation files"""
+        with open(f"{filepath}.shards.json", 'w') as f:
+            json.dump({'num_shards': len(self.shards), 'shard_key': self.shard_key}, f)
+        list(self._executor.map(
+            lambda shard_no: self.shards[shard_no].save_index(self._shard_path(filepath, shard_no)),
+            range(len(self.shards))
+        ))
+
+    def _check_layout(self, filepath):
+        if not os.path.exists(f"{filepath}.shards.json"):
+            return
+        with open(f"{filepath}.shards.json") as f:
+            layout = json.load(f)
+        if layout['num_shards'] != len(self.shards) or layout['shard_key'] != self.shard_key:
+            raise ValueError(
+                f"Index at {filepath} has {layout['num_shards']} shards keyed by {layout['shard_key']}, "
+                f"store is configured for {len(self.shards)} keyed by {self.shard_key}"
+            )
+
+    def load_index(self, filepath="vector_store", use_mmap=False):
+        self._check_layout(filepath)
+        loaded = list(self._executor.map(
+            lambda shard_no: self.shards[shard_no].load_index(self._shard_path(filepath, shard_no), use_mmap=use_mmap),
+            range(len(self.shards))
+        ))
+        self._bump_version()
+        return any(loaded)
+
+    def refresh(self, filepath="vector_store"):
+        refreshed = list(self._executor.map(
+            lambda shard_no: self.shards[shard_no].refresh(self._shard_path(filepath, shard_no)),
+            range(len(self.shards))
+        ))
+        if any(refreshed):
+            self._bump_version()
+        return any(refreshed)
+
+    def delete_index(self, filepath="vector_store"):
+        list(self._executor.map(
+            lambda shard_no: self.shards[shard_no].delete_index(self._shard_path(filepath, shard_no)),
+            range(len(self.shards))
+        ))
+        if os.path.exists(f"{filepath}.shards.json"):
+            os.unlink(f"{filepath}.shards.json")
+
+# Methods and attributes of FAISSVectorStore a shard server exposes
+SHARD_API = {
+    'add_embeddings', 'search_vectors', 'clear', 'total_chunks', 'index_stats',
+    'save_index', 'load_index', 'refresh', 'delete_index', 'rebuild',
+    'document_summary', 'disk_version'
+}
+
+# Of those, the methods whose filepath names files on the shard server; it
+# is reduced to a file name inside the server's data directory
+PATH_METHODS = {'save_index', 'load_index', 'refresh', 'delete_index'}
+
+# Keys that must never protect a shard: unset, or this module's old default
+WEAK_AUTHKEYS = {b"", b"shard"}
+MIN_REMOTE_AUTHKEY_BYTES = 16
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def check_authkey(authkey, host):
+    """Raise ValueError unless authkey may protect a shard connection to or on host.
+
+    multiprocessing.connection unpickles whatever an authenticated peer
+    sends, so the key is all that keeps the network from running code on the
+    shard server. It must be set explicitly, and be at least
+    MIN_REMOTE_AUTHKEY_BYTES long for anything but a loopback address.
+    """
+    if not authkey or authkey in WEAK_AUTHKEYS:
+        raise ValueError("SHARD_AUTHKEY must be set to a secret shared by the app and its shard servers")
+    if not is_loopback(host) and len(authkey) < MIN_REMOTE_AUTHKEY_BYTES:
+        raise ValueError(
+            f"SHARD_AUTHKEY must be at least {MIN_REMOTE_AUTHKEY_BYTES} bytes for shards off this host ({host})"
+        )
+
+class RemoteShard:
+    """Client for a shard hosted by ShardServer in another process or node"""
+
+    def __init__(self, address, authkey):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        check_authkey(authkey, self.address[0])
+        self.authkey = authkey
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _call(self, name, *args, **kwargs):
+        with self._lock:
+            if self._conn is None:
+                self._conn = Client(self.address, authkey=self.authkey)
+            try:
+                self._conn.send((name, args, kwargs))
+                status, result = self._conn.recv()
+            except (EOFError, OSError):
+                self._conn = None
+                raise
+        return self._result(name, status, result)
+
+    def _call_once(self, name, *args, **kwargs):
+        """Long-running call on its own connection, so searches are not queued behind it"""
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send((name, args, kwargs))
+            status, result = conn.recv()
+        return self._result(name, status, result)
+
+    def _result(self, name, status, result):
+        if status != 'ok':
+            raise RuntimeError(f"Shard {self.address[0]}:{self.address[1]} failed on {name}: {result}")
+        return result
+
+    def add_embeddings(self, chunks, metadata_list, embeddings):
+        return self._call('add_embeddings', chunks, metadata_list, embeddings)
+
+    def search_vectors(self, query_embeddings, k=5, filters=None):
+        return self._call('search_vectors', query_embeddings, k, filters)
+
+    def clear(self):
+        return self._call('clear')
+
+    def total_chunks(self, generation=None):
+        return self._call('total_chunks')
+
+    def index_stats(self, recall_sample=0, k=10):
+        return self._call('index_stats', recall_sample, k)
+
+    def save_index(self, filepath="vector_store"):
+        return self._call('save_index', filepath)
+
+    def load_index(self, filepath="vector_store", use_mmap=False):
+        return self._call('load_index', filepath, use_mmap=use_mmap)
+
+    def refresh(self, filepath="vector_store"):
+        return self._call('refresh', filepath)
+
+    def delete_index(self, filepath="vector_store"):
+        return self._call('delete_index', filepath)
+
+    def rebuild(self, embedding_model=None, index_type=None, batch_size=256, on_batch=None):
+        # Progress callbacks cannot cross the connection; progress is per shard
+        return self._call_once('rebuild', embedding_model=embedding_model, index_type=index_type, batch_size=batch_size)
+
+    @property
+    def document_summary(self):
+        return self._call('document_summary')
+
+    @property
+    def disk_version(self):
+        return self._call('disk_version')
+
+class ShardServer:
+    """Hosts one FAISSVectorStore shard behind a multiprocessing.connection listener.
+
+    Index files are only ever read and written inside data_dir, whatever
+    path a client asks for.
+    """
+
+    def __init__(self, address, authkey, embedding_dim=None, data_dir=None, **store_options):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        check_authkey(authkey, self.address[0])
+        self.authkey = authkey
+        self.data_dir = os.path.abspath(data_dir or config.DATA_DIR)
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.store = FAISSVectorStore(embedding_dim, cache_size=0, **store_options)
+
+    def _local_path(self, filepath):
+        name = os.path.basename(str(filepath))
+        if name in ('', '.', '..'):
+            raise ValueError(f"Invalid index path: {filepath!r}")
+        return os.path.join(self.data_dir, name)
+
+    def _confine_path(self, args, kwargs):
+        """args and kwargs of a PATH_METHODS call with filepath moved into data_dir"""
+        if 'filepath' in kwargs:
+            return args, dict(kwargs, filepath=self._local_path(kwargs['filepath']))
+        if args:
+            return (self._local_path(args[0]),) + tuple(args[1:]), kwargs
+        return (self._local_path("vector_store"),), kwargs
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"Shard server listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError) as e:
+                    # A client with the wrong key must not take the shard down
+                    print(f"Rejected shard connection: {e!r}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    name, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if name not in SHARD_API:
+                    conn.send(('error', f"Unknown shard method: {name}"))
+                    continue
+                try:
+                    if name in PATH_METHODS:
+                        args, kwargs = self._confine_path(args, kwargs)
+                    attribute = getattr(self.store, name)
+                    result = attribute(*args, **kwargs) if callable(attribute) else attribute
+                    conn.send(('ok', result))
+                except Exception as e:
+                    conn.send(('error', repr(e)))
+
+def build_vector_store(backend="faiss", num_shards=4, shard_key='doc_id', shard_addresses=None, authkey=None,
+                       **store_options):
+    """Vector store for the configured backend ("faiss" or "sharded").
+
+    store_options (index_type, pq_m, ...) are passed to each FAISSVectorStore;
+    remote shards take theirs from the shard server command line and are
+    reached with authkey.
+    """
+    if backend != "sharded":
+        return FAISSVectorStore(**store_options)
+    if shard_addresses:
+        shards = [RemoteShard(address, authkey) for address in shard_addresses]
+        return ShardedVectorStore(
+            shard_key=shard_key, shards=shards, embedding_dim=store_options.get('embedding_dim'),
+            embedding_model=store_options.get('embedding_model'),
+            embedding_backend=store_options.get('embedding_backend')
+        )
+    return ShardedVectorStore(num_shards, shard_key=shard_key, **store_options)
+
+if __name__ == "__main__":
+    # SHARD_AUTHKEY=... python -m services.sharded_vector_store --address 127.0.0.1:7001
+    parser = argparse.ArgumentParser(description="Serve one vector store shard")
+    parser.add_argument("--address", required=True, help="host:port to listen on")
+    parser.add_argument("--authkey", default=os.getenv("SHARD_AUTHKEY", ""),
+                        help="secret shared with the app (default: SHARD_AUTHKEY)")
+    parser.add_argument("--data-dir", default=config.DATA_DIR, help="directory the shard's index files live in")
+    parser.add_argument("--embedding-dim", type=int, default=None)
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--pq-m", type=int, default=48)
+    args = parser.parse_args()
+    ShardServer(
+        args.address, args.authkey.encode(), args.embedding_dim, data_dir=args.data_dir, index_type=args.index_type,
+        pq_m=args.pq_m, embedding_model=args.embedding_model
+    ).serve_forever()
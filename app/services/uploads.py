@@ -0,0 +1,166 @@
+# services/uploads.py
+import hashlib
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Hex sha256 of a file's content, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ChunkedUploads:
+    """Resumable uploads that arrive in chunks and are processed once complete.
+
+    An upload is identified by the file's sha256 (and tenant), so a client
+    that retries or restarts gets the same upload back and continues from
+    the bytes already received. Partial files live in upload_dir; ones left
+    untouched for stale_after seconds are removed, as are finished uploads'
+    states after the same time.
+    """
+
+    def __init__(self, upload_dir, max_file_size, stale_after=24 * 3600):
+        self.upload_dir = Path(upload_dir)
+        self.max_file_size = max_file_size
+        self.stale_after = stale_after
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def upload_id(sha256, tenant=None):
+        return hashlib.sha256(f"{sha256}|{tenant or ''}".encode()).hexdigest()[:32]
+
+    def _path(self, state):
+        return self.upload_dir / f"{state['upload_id']}{state['extension']}"
+
+    def _cleanup(self, now):
+        for upload_id, state in list(self._uploads.items()):
+            if state['state'] in ('done', 'failed', 'duplicate') and now - state['updated_at'] > self.stale_after:
+                del self._uploads[upload_id]
+        for path in self.upload_dir.glob("*.part"):
+            try:
+                if now - path.stat().st_mtime > self.stale_after:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+
+    def start(self, filename, size, sha256, doc_id=None, tenant=None):
+        """Create or resume an upload; returns its state"""
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256 or ""):
+            raise ValueError("sha256 must be 64 lowercase hex characters")
+        if size < 0 or size > self.max_file_size:
+            raise ValueError(f"File size ({size} bytes) exceeds maximum ({self.max_file_size} bytes)")
+
+        now = time.time()
+        upload_id = self.upload_id(sha256, tenant)
+        with self._lock:
+            self.upload_dir.mkdir(parents=True, exist_ok=True)
+            self._cleanup(now)
+            state = self._uploads.get(upload_id)
+            # A failed upload starts over; any other state is resumed as is
+            if state is not None and state['state'] != 'failed':
+                return dict(state)
+
+            state = {
+                'upload_id': upload_id,
+                'filename': filename,
+                'extension': Path(filename).suffix.lower(),
+                'size': size,
+                'sha256': sha256,
+                'doc_id': doc_id,
+                'tenant': tenant,
+                'received': 0,
+                'state': 'receiving',
+                'document_id': None,
+                'chunks_processed': None,
+                'error': None,
+                'updated_at': now
+            }
+            part = Path(f"{self._path(state)}.part")
+            if part.exists() and part.stat().st_size <= size:
+                state['received'] = part.stat().st_size
+            else:
+                part.unlink(missing_ok=True)
+            self._uploads[upload_id] = state
+            return dict(state)
+
+    def clear_finished(self):
+        """Forget finished uploads (done or duplicate), e.g. once the index is cleared, so they can be sent again"""
+        with self._lock:
+            for upload_id, state in list(self._uploads.items()):
+                if state['state'] in ('done', 'duplicate'):
+                    del self._uploads[upload_id]
+
+    def status(self, upload_id):
+        with self._lock:
+            state = self._uploads.get(upload_id)
+            return dict(state) if state is not None else None
+
+    def update(self, upload_id, **fields):
+        with self._lock:
+            state = self._uploads[upload_id]
+            state.update(fields, updated_at=time.time())
+            return dict(state)
+
+    def append(self, upload_id, offset, data):
+        """Write the chunk starting at offset; offset must equal the bytes received so far"""
+        with self._lock:
+            state = self._uploads.get(upload_id)
+            if state is None:
+                raise KeyError(upload_id)
+            if state['state'] != 'receiving':
+                raise RuntimeError(f"Upload is {state['state']}, not receiving")
+            if offset != state['received']:
+                raise ValueError(f"Expected offset {state['received']}, got {offset}")
+            if state['received'] + len(data) > state['size']:
+                raise ValueError("Chunk goes past the declared file size")
+            with open(f"{self._path(state)}.part", 'ab') as f:
+                f.write(data)
+            state['received'] += len(data)
+            state['updated_at'] = time.time()
+            return dict(state)
+
+    def complete(self, upload_id):
+        """Check the received file against its size and hash; returns the path to process.
+
+        The file is hashed without holding the lock, so other uploads are not
+        held up; while it is, this upload is 'verifying' and takes no chunks.
+        """
+        with self._lock:
+            state = self._uploads.get(upload_id)
+            if state is None:
+                raise KeyError(upload_id)
+            if state['state'] != 'receiving':
+                raise RuntimeError(f"Upload is {state['state']}, not receiving")
+            if state['received'] != state['size']:
+                raise ValueError(f"Received {state['received']} of {state['size']} bytes")
+            path = self._path(state)
+            part = Path(f"{path}.part")
+            part.touch()
+            state.update(state='verifying', updated_at=time.time())
+
+        try:
+            matches = file_sha256(part) == state['sha256']
+        except Exception:
+            self.update(upload_id, state='receiving')
+            raise
+
+        with self._lock:
+            if not matches:
+                part.unlink()
+                state.update(state='receiving', received=0, updated_at=time.time())
+                raise ValueError("Uploaded content does not match its sha256; upload it again")
+
+            os.replace(part, path)
+            state.update(state='processing', updated_at=time.time())
+            return path
+
+    @staticmethod
+    def public(state):
+        """State as returned to clients"""
+        return {key: value for key, value in state.items() if key not in ('extension', 'updated_at')}
@@ -4,78 +4,929 @@ import faiss
 import numpy as np
 import pickle
 import os
-from sentence_transformers import SentenceTransformer
-
-class FAISSVectorStore:
-    def __init__(self, embedding_dim=384):
-        self.embedding_dim = embedding_dim
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.index = faiss.IndexFlatIP(embedding_dim)
-        self.documents = []
-        self.metadata = []
+import glob
+import itertools
+import json
+import mmap
+import tempfile
+import threading
+from collections import OrderedDict
+from .encoders import embedding_dimension, get_encoder
+from .metrics import stage
+from config import config
+
+class IndexGeneration:
+    """Immutable snapshot of the FAISS index and the chunks it covers.
+
+    A generation is never modified once published. Readers grab the current
+    generation once and use it for the whole request, so they always see an
+    index, documents and metadata that belong together.
+    """
+    __slots__ = (
+        'index', 'delta', 'documents', 'metadata', 'version', 'vectors', 'index_type', 'embedding_model', 'embedding_dim'
+    )
+
+    def __init__(self, index, documents, metadata, version, vectors=None, index_type='flat', embedding_model=None,
+                 delta=None, embedding_dim=None):
+        self.index = index
+        # Chunks added since the base index was last copied; their ids follow the base's
+        self.delta = delta
+        self.documents = documents if isinstance(documents, (ChunkList, RecordView)) else ChunkList(documents)
+        self.metadata = metadata if isinstance(metadata, (ChunkList, RecordView)) else ChunkList(metadata)
+        self.version = version
+        # Exact float32 vectors (memory-mapped from a FloatStore or a saved
+        # .vectors.npy), kept next to quantized indexes that re-rank exactly
+        self.vectors = vectors
+        self.index_type = index_type
+        # Model that produced the vectors; queries against this generation
+        # are encoded with the same model, even mid-way through a re-index
+        self.embedding_model = embedding_model
+        self.embedding_dim = embedding_dim if embedding_dim is not None else index.d
+
+    @property
+    def ntotal(self):
+        """Vectors in the base index and its delta"""
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+class ChunkList:
+    """Append-only sequence whose storage is shared by successive generations.
+
+    A generation sees the first length items of a list that later writes only
+    extend, so adding chunks does not copy the ones already stored.
+    """
+    __slots__ = ('_items', '_length')
+
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._length = len(self._items)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._items[slice(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return self._items[i]
+
+    def __iter__(self):
+        return itertools.islice(self._items, self._length)
+
+    def extend(self, items):
+        """A ChunkList with items appended; shares storage unless another list already extends this one"""
+        extended = ChunkList.__new__(ChunkList)
+        extended._items = self._items if len(self._items) == self._length else self._items[:self._length]
+        extended._items.extend(items)
+        extended._length = len(extended._items)
+        return extended
+
+INDEX_TYPES = ('flat', 'fp16', 'sq8', 'pq')
+
+# Minimum number of vectors before a trainable index is built; until then
+# chunks live in an exact flat index
+DEFAULT_TRAIN_SIZES = {'sq8': 1000, 'pq': 10000}
+
+# Writes go to a delta index that is folded into a copy of the base index
+# once it holds this many vectors, so the base is copied once per
+# DEFAULT_DELTA_SIZE chunks rather than on every write
+DEFAULT_DELTA_SIZE = 4096
+
+def check_index_type(index_type, embedding_dim, pq_m=48):
+    """Raise ValueError unless index_type can be built for vectors of embedding_dim"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}. Choose from {INDEX_TYPES}")
+    if index_type == 'pq' and embedding_dim % pq_m:
+        raise ValueError(f"PQ_M ({pq_m}) must divide the embedding dimension ({embedding_dim})")
+
+def make_index(index_type, embedding_dim, pq_m=48):
+    """Empty inner-product FAISS index of the given type"""
+    if index_type == 'flat':
+        return faiss.IndexFlatIP(embedding_dim)
+    if index_type == 'fp16':
+        return faiss.IndexScalarQuantizer(embedding_dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    if index_type == 'sq8':
+        return faiss.IndexScalarQuantizer(embedding_dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    if index_type == 'pq':
+        return faiss.IndexPQ(embedding_dim, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+    raise ValueError(f"Unknown index type: {index_type}. Choose from {INDEX_TYPES}")
+
+class FloatStore:
+    """Append-only float32 vectors in an unlinked temporary file, read through memory maps.
+
+    Generations hold a view of the first N rows. Rows are never rewritten,
+    so a view stays valid while later writes append, and the vectors cost
+    page cache rather than process memory. The file lives under directory
+    (not /tmp, which is often RAM-backed) and disappears with its last view.
+    """
+
+    def __init__(self, dim, directory=None):
+        self.dim = dim
+        self.rows = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.TemporaryFile(prefix="vectors-", dir=directory)
+        self._view = None
+
+    def owns(self, vectors):
+        """Whether vectors is this store's latest view, i.e. can be appended to"""
+        return vectors is not None and vectors is self._view
+
+    def append(self, vectors, block_rows=65536):
+        """Append rows (copied in blocks, so vectors may be a large memmap); returns the view of all rows"""
+        self._file.seek(self.rows * self.dim * 4)
+        for start in range(0, len(vectors), block_rows):
+            block = np.ascontiguousarray(vectors[start:start + block_rows], dtype='float32')
+            self._file.write(block.tobytes())
+            self.rows += len(block)
+        self._file.flush()
+        if self.rows:
+            self._view = np.memmap(self._file, dtype='float32', mode='r', shape=(self.rows, self.dim))
+        return self._view
+
+class RecordFile:
+    """Read-only, memory-mapped chunk records of one saved generation.
+
+    Records are JSON lines ({"text": ..., "metadata": ...}) located through an
+    int64 offsets array, so a record is decoded only when a search returns it
+    and the pages are shared by every process that maps the same file.
+    """
+
+    def __init__(self, base_path):
+        self.offsets = np.load(f"{base_path}.offsets.npy", mmap_mode='r')
+        self._file = open(f"{base_path}.records", 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self._mmap[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+class RecordView:
+    """Sequence over one field ('text' or 'metadata') of a RecordFile"""
+
+    def __init__(self, record_file, field):
+        self._records = record_file
+        self._field = field
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._records.record(i)[self._field]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def matches_filters(metadata, filters):
+    """Whether metadata has, for every filter key, the value or one of the list of values given"""
+    for key, accepted in (filters or {}).items():
+        value = metadata.get(key)
+        if isinstance(accepted, (list, tuple, set)):
+            if value not in accepted and str(value) not in map(str, accepted):
+                return False
+        elif value != accepted and str(value) != str(accepted):
+            return False
+    return True
+
+class BaseVectorStore:
+    """Query-side behaviour shared by FAISSVectorStore and ShardedVectorStore.
+
+    Subclasses provide snapshot(), total_chunks(generation) and
+    _search_vectors(generation, query_embeddings, k, filters); this class
+    adds the query caches, batched search and filtered pagination on top.
+    """
+
+    def _init_caches(self, cache_size):
+        # LRU caches: (model, query text) -> embedding, and (generation, query, k, filters) -> hits.
+        # Hits from older generations simply age out of the cache.
+        self.cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._embedding_cache = OrderedDict()
+        self._result_cache = OrderedDict()
+        self.cache_stats = {'embedding_hits': 0, 'embedding_misses': 0, 'result_hits': 0, 'result_misses': 0}
+
+    @property
+    def model(self):
+        """Encoder for the store's current embedding model"""
+        return self.encoder(self.embedding_model)
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    def encoder(self, embedding_model):
+        # Loaded on first use, so stores that never encode (shard servers,
+        # stores that get replaced) never pay for the model; encoders are
+        # shared with DocumentEmbedder. An injected model is used as long as
+        # it is the requested one.
+        if self._model is not None and getattr(self._model, 'name', embedding_model) == embedding_model:
+            return self._model
+        return get_encoder(embedding_model, self.embedding_backend)
+
+    def _cache_get(self, cache, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def encode_queries(self, queries, embedding_model=None):
+        """Normalized query embeddings, encoding only the queries not already cached"""
+        embedding_model = embedding_model or self.embedding_model
+        with self._cache_lock:
+            cached = {
+                query: self._cache_get(self._embedding_cache, (embedding_model, query)) for query in dict.fromkeys(queries)
+            }
+        missing = [query for query, embedding in cached.items() if embedding is None]
+
+        if missing:
+            encoder = self.encoder(embedding_model)
+            with stage('embed_query'):
+                embeddings = np.asarray(encoder.encode(missing, normalize_embeddings=True), dtype='float32')
+            with self._cache_lock:
+                for query, embedding in zip(missing, embeddings):
+                    cached[query] = embedding
+                    self._cache_put(self._embedding_cache, (embedding_model, query), embedding)
+
+        with self._cache_lock:
+            self.cache_stats['embedding_hits'] += len(queries) - len(missing)
+            self.cache_stats['embedding_misses'] += len(missing)
+        return np.vstack([cached[query] for query in queries])
+
+    def search(self, query, k=5, filters=None):
+        """Search for similar documents, optionally only those whose metadata matches filters"""
+        if filters:
+            hits, _ = self.search_page(query, limit=k, filters=filters)
+            return [hit['text'] for hit in hits], [{**hit['metadata'], 'score': hit['score']} for hit in hits]
+        results, result_metadata = self.search_batch([query], k=k)[0]
+        return results, result_metadata
+
+    def search_batch(self, queries, k=5):
+        """Search for several queries with one encode call and one FAISS search"""
+        batch_results = []
+        for hits in self.search_hits_batch(queries, k):
+            batch_results.append((
+                [hit['text'] for hit in hits],
+                [{**hit['metadata'], 'score': hit['score']} for hit in hits]
+            ))
+        return batch_results
+
+    def search_hits_batch(self, queries, k=5, generation=None, filters=None):
+        """Scored hits (index, text, metadata, score) for each query, best first.
+
+        With filters, only the hits among the top k whose metadata matches.
+        """
+        generation = generation or self.snapshot()
+        queries = list(queries)
+        if self.total_chunks(generation) == 0 or not queries:
+            return [[] for _ in queries]
+
+        filter_key = json.dumps(filters, sort_keys=True, default=str) if filters else None
+        results = [None] * len(queries)
+        missing = []
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                results[i] = self._cache_get(self._result_cache, (generation.version, query, k, filter_key))
+                if results[i] is None:
+                    missing.append(i)
+            self.cache_stats['result_hits'] += len(queries) - len(missing)
+            self.cache_stats['result_misses'] += len(missing)
+
+        if missing:
+            query_embeddings = self.encode_queries([queries[i] for i in missing], generation.embedding_model)
+            with stage('vector_search'):
+                computed = self._search_vectors(generation, query_embeddings, k, filters)
+            with self._cache_lock:
+                for i, hits in zip(missing, computed):
+                    self._cache_put(self._result_cache, (generation.version, queries[i], k, filter_key), hits)
+                    results[i] = hits
+
+        return results
+
+    def search_page(self, query, offset=0, limit=10, filters=None, max_depth=1000):
+        """One page of hits for a query, optionally filtered on metadata fields.
+
+        Filters map a metadata key to a value or a list of accepted values.
+        Returns (hits, has_more). Candidate depth doubles until the page is
+        filled, the index is exhausted or max_depth is reached.
+        """
+        generation = self.snapshot()
+        total = min(self.total_chunks(generation), max_depth)
+        k = min(max(offset + limit + 1, 10), total)
+        while True:
+            hits = self.search_hits_batch([query], k, generation=generation, filters=filters)[0]
+            if len(hits) > offset + limit or k >= total:
+                break
+            k = min(k * 2, total)
+
+        return hits[offset:offset + limit], len(hits) > offset + limit
+
+class FAISSVectorStore(BaseVectorStore):
+    def __init__(self, embedding_dim=None, cache_size=1024, model=None, index_type='flat', pq_m=48,
+                 train_size=None, exact_rerank=None, rerank_factor=4, embedding_model=None,
+                 embedding_backend=None, reembed_on_model_change=False, float_store_dir=None,
+                 delta_size=DEFAULT_DELTA_SIZE):
+        self.embedding_model = embedding_model or config.EMBEDDING_MODEL
+        self.embedding_backend = embedding_backend
+        self.embedding_dim = embedding_dim or embedding_dimension(self.embedding_model, embedding_backend)
+        check_index_type(index_type, self.embedding_dim, pq_m)
+        self.reembed_on_model_change = reembed_on_model_change
+        self.model = model
         self.doc_counter = 0
-        
+
+        # Quantization: fp16/sq8 scalar quantizers or PQ; PQ results are
+        # re-ranked against the exact float vectors unless exact_rerank says otherwise
+        self.index_type = index_type
+        self.pq_m = pq_m
+        self.train_size = train_size or DEFAULT_TRAIN_SIZES.get(index_type, 0)
+        self.exact_rerank = exact_rerank
+        self.rerank_factor = rerank_factor
+        self.float_store_dir = float_store_dir or config.DATA_DIR
+        self._float_store = None
+        self.delta_size = delta_size
+
+        # Copy-on-write: writers build the next generation off to the side
+        # (serialized by the write lock) and publish it with a single
+        # attribute assignment, so searches never block and never see a
+        # half-applied write. Only the small delta index is copied per
+        # write; the base index and chunk lists are shared between generations.
+        self._write_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._generation = IndexGeneration(
+            self._empty_index(), [], [], 0, index_type=index_type, embedding_model=self.embedding_model,
+            embedding_dim=self.embedding_dim
+        )
+        # Bumped whenever the chunk list is replaced rather than appended to
+        # (clear, load), so a running re-index knows its snapshot is stale
+        self._resets = 0
+
+        # Version of the on-disk generation last saved or loaded (see save_index)
+        self.disk_version = 0
+        self.document_summary = {}
+
+        self._init_caches(cache_size)
+
+    @property
+    def index(self):
+        return self._generation.index
+
+    @property
+    def documents(self):
+        return self._generation.documents
+
+    @property
+    def metadata(self):
+        return self._generation.metadata
+
+    def snapshot(self):
+        """The current generation; stays valid however many writes follow"""
+        return self._generation
+
+    def total_chunks(self, generation=None):
+        return (generation or self._generation).ntotal
+
+    def _publish(self, index, documents, metadata, vectors=None, index_type='flat', delta=None):
+        """Atomically swap in a new generation (caller holds the write lock)"""
+        self._generation = IndexGeneration(
+            index, documents, metadata, self._generation.version + 1, vectors=vectors, index_type=index_type,
+            embedding_model=self.embedding_model, delta=delta, embedding_dim=self.embedding_dim
+        )
+        return self._generation
+
+    def _empty_index(self):
+        """Trainable types start as an exact flat index until train_size vectors arrive"""
+        if self.index_type in DEFAULT_TRAIN_SIZES:
+            return faiss.IndexFlatIP(self.embedding_dim)
+        return make_index(self.index_type, self.embedding_dim, self.pq_m)
+
+    @staticmethod
+    def _empty_delta(index):
+        """Empty index of the same type and training as index, to add vectors next to it"""
+        if isinstance(index, faiss.IndexFlat):
+            return faiss.IndexFlatIP(index.d)
+        delta = faiss.clone_index(index)
+        delta.reset()
+        return delta
+
+    @staticmethod
+    def _merged_index(generation):
+        """The generation's base and delta as one index (the base itself when the delta is empty)"""
+        if generation.delta is None or generation.delta.ntotal == 0:
+            return generation.index
+        index = faiss.clone_index(generation.index)
+        index.merge_from(faiss.clone_index(generation.delta))
+        return index
+
     def add_documents(self, chunks, metadata_list):
         """Add document chunks to FAISS index"""
-        embeddings = self.model.encode(chunks)
-        
-        #normalize the embedding for cosine similarity 
-        faiss.normalize_L2(embeddings)
-        
-        #adding to the index
-        self.index.add(embeddings.astype('float32'))
-        
-        # Store documents and metadata
-        self.documents.extend(chunks)
-        self.metadata.extend(metadata_list)
-        
-        print(f"Added {len(chunks)} chunks to vector store. Total: {len(self.documents)}")
-        
-    def search(self, query, k=5):
-        """Search for similar documents"""
-        if self.index.ntotal == 0:
-            return [], []
-            
-        query_embedding = self.model.encode([query])
-        faiss.normalize_L2(query_embedding)
-        scores, indices = self.index.search(query_embedding.astype('float32'), k)
-        
-        # Get results
+        while True:
+            #normalized by the model, for cosine similarity
+            embedding_model = self.embedding_model
+            with stage('embed'):
+                embeddings = self.encoder(embedding_model).encode(chunks, normalize_embeddings=True)
+
+            # A re-index may have switched models while we were encoding
+            if self.add_embeddings(chunks, metadata_list, embeddings, embedding_model=embedding_model):
+                return
+
+    def add_embeddings(self, chunks, metadata_list, embeddings, embedding_model=None):
+        """Add chunks whose normalized embeddings were computed by the caller.
+
+        Returns False without adding anything when embedding_model is given
+        and is no longer the store's model.
+        """
+        if isinstance(self._generation.documents, RecordView):
+            raise RuntimeError("Vector store is a read-only memory-mapped replica")
+
+        embeddings = np.asarray(embeddings, dtype='float32')
+        with self._write_lock, stage('index_add'):
+            if embedding_model is not None and embedding_model != self.embedding_model:
+                return False
+            current = self._generation
+            # An empty store takes the configured type; otherwise keep the
+            # generation's own type (changing it is a re-index)
+            index_type = current.index_type if current.ntotal else self.index_type
+
+            needs_training = index_type in DEFAULT_TRAIN_SIZES and isinstance(current.index, faiss.IndexFlat)
+            if needs_training and current.ntotal + len(embeddings) >= self.train_size:
+                # Enough data: build the quantized index from every vector so
+                # far; until now they were only held by the flat index
+                vectors = np.vstack([self._merged_index(current).reconstruct_n(0, current.ntotal), embeddings])
+                index = make_index(index_type, self.embedding_dim, self.pq_m)
+                index.train(vectors)
+                index.add(vectors)
+                delta = None
+                print(f"Trained {index_type} index on {len(vectors)} vectors")
+                vectors = self._extend_float_store(None, vectors) if self._keeps_float_store(index_type) else None
+            else:
+                index, delta = self._append(current, embeddings)
+                vectors = None
+                if self._keeps_float_store(index_type) and not isinstance(index, faiss.IndexFlat):
+                    vectors = self._extend_float_store(current.vectors, embeddings)
+
+            # Store documents and metadata
+            generation = self._publish(
+                index,
+                current.documents.extend(chunks),
+                current.metadata.extend(metadata_list),
+                vectors=vectors,
+                index_type=index_type,
+                delta=delta
+            )
+
+        print(f"Added {len(chunks)} chunks to vector store. Total: {len(generation.documents)}")
+        return True
+
+    def _append(self, current, embeddings):
+        """(index, delta) of current plus embeddings (caller holds the write lock).
+
+        Readers keep using current: embeddings go to a copy of the small
+        delta index, which is folded into a copy of the base once it reaches
+        delta_size. merge_from leaves the delta empty but trained, ready to
+        take the next writes.
+        """
+        if current.ntotal == 0:
+            index = self._empty_index()
+            index.add(embeddings)
+            return index, None
+
+        index = current.index
+        delta = faiss.clone_index(current.delta) if current.delta is not None else self._empty_delta(index)
+        delta.add(embeddings)
+        if delta.ntotal >= self.delta_size:
+            index = faiss.clone_index(index)
+            index.merge_from(delta)
+        return index, delta
+
+    def _keeps_float_store(self, index_type):
+        """Exact float vectors are only kept for quantized types that re-rank (default: pq)"""
+        if index_type == 'flat':
+            return False
+        return index_type == 'pq' if self.exact_rerank is None else self.exact_rerank
+
+    def _extend_float_store(self, vectors, embeddings):
+        """On-disk float store holding vectors followed by embeddings (caller holds the write lock)"""
+        if self._float_store is None or not self._float_store.owns(vectors):
+            # Loaded, rebuilt or freshly trained: start a new file from the current rows
+            self._float_store = FloatStore(self.embedding_dim, self.float_store_dir)
+            if vectors is not None:
+                self._float_store.append(vectors)
+        return self._float_store.append(embeddings)
+
+    def clear(self):
+        """Drop all chunks by publishing an empty generation"""
+        with self._write_lock:
+            self._resets += 1
+            self._publish(self._empty_index(), [], [], index_type=self.index_type)
+
+    def search_vectors(self, query_embeddings, k=5, filters=None):
+        """Hits for already encoded queries against the current generation"""
+        return self._search_vectors(self._generation, query_embeddings, k, filters)
+
+    def _uses_exact_rerank(self, generation):
+        return (
+            self._keeps_float_store(generation.index_type)
+            and generation.vectors is not None
+            and not isinstance(generation.index, faiss.IndexFlat)
+        )
+
+    @staticmethod
+    def _index_search(generation, query_embeddings, k):
+        """(scores, ids) rows from the base index and its delta, merged best first"""
+        scores, ids = generation.index.search(query_embeddings, k)
+        delta = generation.delta
+        if delta is None or delta.ntotal == 0:
+            return scores, ids
+
+        delta_scores, delta_ids = delta.search(query_embeddings, k)
+        delta_ids = np.where(delta_ids == -1, -1, delta_ids + generation.index.ntotal)
+        scores, ids = np.hstack([scores, delta_scores]), np.hstack([ids, delta_ids])
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def _search_ids(self, generation, query_embeddings, k, exact_rerank=True):
+        """(scores, ids) rows, optionally re-ranked against the exact float vectors"""
+        query_embeddings = np.asarray(query_embeddings, dtype='float32')
+        if not (exact_rerank and self._uses_exact_rerank(generation)):
+            return self._index_search(generation, query_embeddings, k)
+
+        # Over-fetch from the quantized index, then re-score exactly
+        depth = min(k * self.rerank_factor, generation.ntotal)
+        _, candidates = self._index_search(generation, query_embeddings, depth)
+        scores = np.full((len(query_embeddings), k), -np.inf, dtype='float32')
+        ids = np.full((len(query_embeddings), k), -1, dtype='int64')
+        for row, (query, row_candidates) in enumerate(zip(query_embeddings, candidates)):
+            row_candidates = np.sort(row_candidates[row_candidates != -1])
+            exact = np.asarray(generation.vectors[row_candidates]) @ query
+            order = np.argsort(-exact)[:k]
+            scores[row, :len(order)] = exact[order]
+            ids[row, :len(order)] = row_candidates[order]
+        return scores, ids
+
+    def _search_vectors(self, generation, query_embeddings, k, filters=None):
+        if generation.ntotal == 0:
+            return [[] for _ in query_embeddings]
+
+        scores, indices = self._search_ids(generation, query_embeddings, k)
         results = []
-        result_metadata = []
-        
-        for i, idx in enumerate(indices[0]):
-            if idx != -1 and idx < len(self.documents):
-                results.append(self.documents[idx])
-                result_metadata.append(self.metadata[idx])
-                
-        return results, result_metadata
-    
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, idx in zip(row_scores, row_indices):
+                if idx == -1 or idx >= len(generation.documents):
+                    continue
+                metadata = generation.metadata[idx]
+                if matches_filters(metadata, filters):
+                    hits.append({'index': int(idx), 'text': generation.documents[idx], 'metadata': metadata, 'score': float(score)})
+            results.append(hits)
+        return results
+
+    def index_stats(self, recall_sample=0, k=10):
+        """Memory footprint of the index and, optionally, measured recall@k.
+
+        Recall is measured on recall_sample stored vectors used as queries,
+        against exact inner-product search over the float store; it is
+        reported both for the raw index and after exact re-ranking.
+        """
+        generation = self._generation
+        total = generation.ntotal
+        code_size = getattr(generation.index, 'code_size', self.embedding_dim * 4)
+        float_rows = len(generation.vectors) if generation.vectors is not None else 0
+        stats = {
+            'index_type': generation.index_type,
+            'faiss_index': type(generation.index).__name__,
+            'chunks': total,
+            'bytes_per_vector': code_size,
+            'index_bytes': total * code_size,
+            'float32_bytes': total * self.embedding_dim * 4,
+            'compression': self.embedding_dim * 4 / code_size,
+            # Exact vectors kept for re-ranking; memory-mapped, so they use page cache, not heap
+            'float_store_bytes': float_rows * self.embedding_dim * 4,
+            'float_store_on_disk': isinstance(generation.vectors, np.memmap),
+            'exact_rerank': self._uses_exact_rerank(generation),
+        }
+
+        if recall_sample and total:
+            k = min(k, total)
+            if isinstance(generation.index, faiss.IndexFlat):
+                # Exact flat index: recall is 1 by construction
+                stats['index_recall_at_k'] = stats['recall_at_k'] = 1.0
+            elif generation.vectors is None:
+                stats['recall_note'] = "no float store is kept without exact re-ranking (INDEX_EXACT_RERANK=true)"
+            else:
+                rng = np.random.default_rng(0)
+                sample = np.sort(rng.choice(total, size=min(recall_sample, total), replace=False))
+                queries = np.ascontiguousarray(generation.vectors[sample], dtype='float32')
+                _, exact_ids = faiss.knn(queries, np.asarray(generation.vectors, dtype='float32'), k,
+                                         metric=faiss.METRIC_INNER_PRODUCT)
+
+                def recall(ids):
+                    return float(np.mean([
+                        len(set(row[row != -1]) & set(truth)) / k for row, truth in zip(ids, exact_ids)
+                    ]))
+
+                stats['recall_k'] = k
+                stats['index_recall_at_k'] = recall(self._search_ids(generation, queries, k, exact_rerank=False)[1])
+                stats['recall_at_k'] = recall(self._search_ids(generation, queries, k)[1])
+        return stats
+
+    @staticmethod
+    def read_disk_version(filepath):
+        """Latest generation number published under filepath, 0 if none"""
+        try:
+            with open(f"{filepath}.version") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    @staticmethod
+    def summarize_documents(metadata):
+        """Chunk counts per doc_id, the shape DocumentManager keeps in processed_documents"""
+        summary = {}
+        for item in metadata:
+            doc = summary.setdefault(item.get('doc_id'), {'path': item.get('source'), 'chunks_count': 0, 'processed': True})
+            doc['chunks_count'] += 1
+            for field in ('sha256', 'tenant'):
+                if item.get(field):
+                    doc[field] = item[field]
+        return summary
+
     def save_index(self, filepath="vector_store"):
-        """Save FAISS index and metadata"""
-        # Save FAISS index
-        faiss.write_index(self.index, f"{filepath}.index")
-        
-        # Save documents and metadata
-        with open(f"{filepath}.pkl", 'wb') as f:
-            pickle.dump({
-                'documents': self.documents,
-                'metadata': self.metadata,
-                'embedding_dim': self.embedding_dim
-            }, f)
-            
-    def load_index(self, filepath="vector_store"):
-        """Load FAISS index and metadata"""
+        """Save the current generation as a new numbered generation on disk.
+
+        Files are written under {filepath}.g{N}.* and only then published by
+        atomically replacing {filepath}.version, so readers in other
+        processes never open a half-written generation. The two previous
+        generations are kept for readers that are still loading them.
+        """
+        generation = self._generation
+
+        with self._save_lock:
+            version = max(self.read_disk_version(filepath), self.disk_version) + 1
+            base_path = f"{filepath}.g{version}"
+
+            # Save FAISS index
+            faiss.write_index(self._merged_index(generation), f"{base_path}.index")
+
+            # Save documents and metadata as offset-addressed JSON lines
+            offsets = [0]
+            with open(f"{base_path}.records", 'wb') as f:
+                for text, metadata in zip(generation.documents, generation.metadata):
+                    line = json.dumps({'text': text, 'metadata': metadata}, default=str).encode('utf-8') + b"\n"
+                    f.write(line)
+                    offsets.append(offsets[-1] + len(line))
+            np.save(f"{base_path}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+            # Exact float store for quantized indexes
+            if generation.vectors is not None:
+                np.save(f"{base_path}.vectors.npy", np.asarray(generation.vectors, dtype='float32'))
+
+            document_summary = self.summarize_documents(generation.metadata)
+            with open(f"{base_path}.json", 'w') as f:
+                json.dump({
+                    # From the generation: a re-index may switch the store's model while this one is saved
+                    'embedding_model': generation.embedding_model,
+                    'embedding_dim': generation.embedding_dim,
+                    'index_type': generation.index_type,
+                    'total_chunks': len(generation.documents),
+                    'documents': document_summary
+                }, f)
+
+            with open(f"{filepath}.version.tmp", 'w') as f:
+                f.write(str(version))
+            os.replace(f"{filepath}.version.tmp", f"{filepath}.version")
+
+            self.disk_version = version
+            self.document_summary = document_summary
+            self._remove_generations(filepath, keep_from=version - 2)
+
+    def _remove_generations(self, filepath, keep_from=None):
+        """Delete saved generations older than keep_from (all of them if None)"""
+        prefix = f"{filepath}.g"
+        for path in glob.glob(f"{glob.escape(filepath)}.g*.*"):
+            number = path[len(prefix):].split('.', 1)[0]
+            if number.isdigit() and (keep_from is None or int(number) < keep_from):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def delete_index(self, filepath="vector_store"):
+        """Remove every saved generation, the version file and legacy files"""
+        with self._save_lock:
+            self._remove_generations(filepath)
+            for path in [f"{filepath}.version", f"{filepath}.index", f"{filepath}.pkl"]:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def load_index(self, filepath="vector_store", use_mmap=False):
+        """Load FAISS index and metadata.
+
+        With use_mmap the index and chunk records are mapped read-only instead
+        of read into memory, so worker processes share the same pages.
+        """
+        version = self.read_disk_version(filepath)
+        if version:
+            self._load_generation(filepath, version, use_mmap)
+            return True
+
+        # Legacy single-file layout ({filepath}.index + {filepath}.pkl)
         if os.path.exists(f"{filepath}.index") and os.path.exists(f"{filepath}.pkl"):
-            self.index = faiss.read_index(f"{filepath}.index")
-            
+            index = faiss.read_index(f"{filepath}.index")
+
             # Load documents and metadata
             with open(f"{filepath}.pkl", 'rb') as f:
                 data = pickle.load(f)
-                self.documents = data['documents']
-                self.metadata = data['metadata']
-                self.embedding_dim = data['embedding_dim']
-            
-            print(f"Loaded vector store with {len(self.documents)} documents")
+
+            # Indexes from before model selection were built with all-MiniLM-L6-v2
+            documents, metadata = data['documents'], data['metadata']
+            index, vectors, index_type = self._check_embedding_model(
+                filepath, 'all-MiniLM-L6-v2', data['embedding_dim'], index, documents, metadata, None, 'flat'
+            )
+
+            with self._write_lock:
+                self._resets += 1
+                generation = self._publish(index, documents, metadata, vectors=vectors, index_type=index_type)
+            self.document_summary = self.summarize_documents(generation.metadata)
+
+            print(f"Loaded vector store with {len(generation.documents)} documents")
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def refresh(self, filepath="vector_store"):
+        """Hot-reload (memory-mapped) if another process published a newer generation"""
+        version = self.read_disk_version(filepath)
+        if version == 0 or version == self.disk_version:
+            return False
+        self._load_generation(filepath, version, use_mmap=True)
+        return True
+
+    def _load_generation(self, filepath, version, use_mmap):
+        base_path = f"{filepath}.g{version}"
+        with open(f"{base_path}.json") as f:
+            manifest = json.load(f)
+
+        if use_mmap:
+            flags = faiss.IO_FLAG_MMAP | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0) | faiss.IO_FLAG_READ_ONLY
+            index = faiss.read_index(f"{base_path}.index", flags)
+            records = RecordFile(base_path)
+            documents, metadata = RecordView(records, 'text'), RecordView(records, 'metadata')
+        else:
+            index = faiss.read_index(f"{base_path}.index")
+            documents, metadata = [], []
+            with open(f"{base_path}.records", 'rb') as f:
+                for line in f:
+                    record = json.loads(line)
+                    documents.append(record['text'])
+                    metadata.append(record['metadata'])
+
+        index_type = manifest.get('index_type', 'flat')
+        vectors = None
+        if os.path.exists(f"{base_path}.vectors.npy") and self._keeps_float_store(index_type):
+            vectors = np.load(f"{base_path}.vectors.npy", mmap_mode='r')
+
+        built_with = manifest.get('embedding_model', 'all-MiniLM-L6-v2')
+        if use_mmap:
+            # Read-only replicas follow whichever model the writer built the
+            # generation with (e.g. after a re-index to a new model)
+            embedding_model, embedding_dim = built_with, manifest['embedding_dim']
+        else:
+            index, vectors, index_type = self._check_embedding_model(
+                filepath, built_with, manifest['embedding_dim'], index, documents, metadata, vectors, index_type
+            )
+            embedding_model, embedding_dim = self.embedding_model, self.embedding_dim
+
+        with self._write_lock:
+            self._resets += 1
+            self.embedding_model, self.embedding_dim = embedding_model, embedding_dim
+            generation = self._publish(index, documents, metadata, vectors=vectors, index_type=index_type)
+            self.disk_version = version
+            self.document_summary = manifest['documents']
+
+        print(f"Loaded vector store generation {version} with {len(generation.documents)} documents")
+
+    def _check_embedding_model(self, filepath, built_with, built_dim, index, documents, metadata, vectors,
+                               index_type):
+        """Guard against searching vectors from a different embedding model.
+
+        A saved index is only usable by the model that built it. If the
+        configured model differs, either refuse to load or, when
+        reembed_on_model_change is set, re-embed the stored chunk text.
+        Returns the (index, vectors, index_type) to publish.
+        """
+        if built_with == self.embedding_model and built_dim == self.embedding_dim:
+            return index, vectors, index_type
+
+        if not self.reembed_on_model_change:
+            raise ValueError(
+                f"Index at {filepath} was built with {built_with} ({built_dim} dims) but the store is "
+                f"configured for {self.embedding_model} ({self.embedding_dim} dims). "
+                f"Set REEMBED_ON_MODEL_CHANGE=true on the writer to re-embed the stored chunks."
+            )
+
+        print(f"Re-embedding {len(documents)} chunks: {built_with} -> {self.embedding_model}")
+        generation = self.build_generation(documents, metadata)
+        return self._merged_index(generation), generation.vectors, generation.index_type
+
+    def staging_store(self, embedding_model=None, index_type=None):
+        """Empty store with this store's settings, to build a generation off to the side"""
+        embedding_model = embedding_model or self.embedding_model
+        embedding_dim = self.embedding_dim if embedding_model == self.embedding_model else None
+        return FAISSVectorStore(
+            embedding_dim, cache_size=0, model=self._model, index_type=index_type or self.index_type,
+            pq_m=self.pq_m, train_size=self.train_size, exact_rerank=self.exact_rerank,
+            rerank_factor=self.rerank_factor, embedding_model=embedding_model, embedding_backend=self.embedding_backend,
+            float_store_dir=self.float_store_dir, delta_size=self.delta_size
+        )
+
+    def build_generation(self, documents, metadata, batch_size=256):
+        """Embed chunk text with the current model and build a complete generation from it"""
+        documents = list(documents)
+        batches = [
+            self.model.encode(documents[start:start + batch_size], normalize_embeddings=True)
+            for start in range(0, len(documents), batch_size)
+        ]
+        staging = self.staging_store()
+        if batches:
+            staging.add_embeddings(documents, list(metadata), np.vstack(batches))
+        return staging.snapshot()
+
+    def rebuild(self, embedding_model=None, index_type=None, batch_size=256, on_batch=None):
+        """Re-embed every stored chunk into a new generation and swap it in.
+
+        Used to migrate to another embedding model or index type while the
+        store keeps serving. The chunks of a snapshot are embedded without
+        holding the write lock; chunks added meanwhile are caught up, the last
+        few under the lock so no write is lost, and the rebuilt generation is
+        then published in one step. on_batch(done, total) is called after
+        every batch and may raise to abort the rebuild. Returns the number of
+        chunks in the new generation.
+        """
+        if isinstance(self._generation.documents, RecordView):
+            raise RuntimeError("Vector store is a read-only memory-mapped replica")
+        # Fails here, before anything is embedded, if the index type does not fit the model
+        staging = self.staging_store(embedding_model, index_type)
+        encoder = staging.model
+        resets = self._resets
+        documents, metadata, batches = [], [], []
+
+        def embed(generation, report=True):
+            total = len(generation.documents)
+            for start in range(len(documents), total, batch_size):
+                end = min(start + batch_size, total)
+                chunk_batch = list(generation.documents[start:end])
+                batches.append(np.asarray(encoder.encode(chunk_batch, normalize_embeddings=True), dtype='float32'))
+                documents.extend(chunk_batch)
+                metadata.extend(generation.metadata[start:end])
+                if report and on_batch:
+                    on_batch(end, total)
+
+        def check_not_reset():
+            if self._resets != resets:
+                raise RuntimeError("Vector store was cleared or reloaded during the rebuild")
+
+        # Bulk of the work: embed the current chunks, then whatever was
+        # written in the meantime, until only a small tail is left
+        while True:
+            current = self._generation
+            check_not_reset()
+            if len(current.documents) - len(documents) <= batch_size:
+                break
+            embed(current)
+
+        if batches:
+            staging.add_embeddings(documents, metadata, np.vstack(batches))
+
+        with self._write_lock:
+            check_not_reset()
+            done, first_batch = len(documents), len(batches)
+            embed(self._generation, report=False)
+            if len(documents) > done:
+                staging.add_embeddings(documents[done:], metadata[done:], np.vstack(batches[first_batch:]))
+
+            rebuilt = staging.snapshot()
+            self.embedding_model, self.embedding_dim = staging.embedding_model, staging.embedding_dim
+            self.index_type = staging.index_type
+            generation = self._publish(
+                rebuilt.index, rebuilt.documents, rebuilt.metadata, vectors=rebuilt.vectors,
+                index_type=rebuilt.index_type, delta=rebuilt.delta
+            )
+
+        print(f"Rebuilt vector store: {len(generation.documents)} chunks, "
+              f"{self.embedding_model} / {generation.index_type}")
+        return len(generation.documents)
@@ -1,68 +1,180 @@
-import streamlit as st
+import hashlib
+import json
+import os
+import time
+import uuid
+
 import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_BASE = os.getenv("API_BASE", "http://127.0.0.1:8000")
+
+# Used only when the API's /config cannot be reached
+DEFAULT_CONFIG = {
+    "allowed_extensions": [".bmp", ".csv", ".docx", ".jpeg", ".jpg", ".md", ".pdf", ".png", ".tif", ".tiff", ".txt"],
+    "upload_chunk_size": 4 * 1024 * 1024,
+    "max_file_size": 50 * 1024 * 1024,
+}
+HASH_BLOCK_SIZE = 1024 * 1024
+
+@st.cache_resource
+def get_http():
+    """One pooled HTTP session shared by every rerun of this script"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=["GET", "PUT"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=300)
+def fetch_config():
+    try:
+        response = get_http().get(f"{API_BASE}/config", timeout=5)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException:
+        return DEFAULT_CONFIG
+
+@st.cache_data(ttl=30)
+def fetch_stats():
+    response = get_http().get(f"{API_BASE}/documents", timeout=10)
+    response.raise_for_status()
+    stats = response.json()
+    return {"total_documents": stats["total_documents"], "total_chunks": stats["total_chunks"]}
+
+def file_sha256(file):
+    """sha256 of an uploaded file, read in blocks and remembered for this browser session"""
+    key = f"sha256:{getattr(file, 'file_id', None) or (file.name, file.size)}"
+    if key not in st.session_state:
+        digest = hashlib.sha256()
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+        st.session_state[key] = digest.hexdigest()
+    return st.session_state[key]
+
+def upload_file(file, chunk_size, report):
+    """Upload one file in chunks, resuming from whatever the server already has, and wait until it is indexed"""
+    http = get_http()
+    response = http.post(
+        f"{API_BASE}/uploads",
+        json={"filename": file.name, "size": file.size, "sha256": file_sha256(file)},
+        timeout=30
+    )
+    response.raise_for_status()
+    status = response.json()
+    upload_url = f"{API_BASE}/uploads/{status['upload_id']}"
+
+    while status["state"] == "receiving" and status["received"] < status["size"]:
+        offset = status["received"]
+        file.seek(offset)
+        response = http.put(
+            upload_url, params={"offset": offset}, data=file.read(chunk_size),
+            headers={"Content-Type": "application/octet-stream"}, timeout=120
+        )
+        if response.status_code == 409:
+            # Out of step with the server (e.g. a retried chunk had arrived); continue from its offset
+            response = http.get(upload_url, timeout=30)
+        response.raise_for_status()
+        status = response.json()
+        report(status["received"] / max(status["size"], 1) * 0.5, "uploading")
+
+    if status["state"] == "receiving":
+        response = http.post(f"{upload_url}/complete", timeout=120)
+        response.raise_for_status()
+        status = response.json()
 
-API_BASE = "http://127.0.0.1:8000"
+    while status["state"] == "processing":
+        report(0.75, "processing")
+        time.sleep(0.5)
+        response = http.get(upload_url, timeout=30)
+        response.raise_for_status()
+        status = response.json()
+    return status
+
+def render_result(result, answer_box, themes_box):
+    with answer_box.container():
+        st.subheader("Synthesized Answer")
+        st.markdown(result["synthesized_answer"] or "_Writing..._")
+    with themes_box.container():
+        if result["themes"]:
+            st.subheader("Themes with Citations ")
+        for theme in result["themes"]:
+            st.markdown(f"**{theme['name']}**")
+            st.markdown(theme['summary'])
 
 st.set_page_config(page_title="Document Theme QA", layout="wide")
+client_config = fetch_config()
 st.title("Document Research & Theme Identifier")
 st.header("Upload Documents")
 
-upload_mode = st.radio("Choose upload mode:",["Single Document","Batch Upload"])
-
-if upload_mode == "Single Document":
-    file = st.file_uploader("Upload a PDF or image file", type=["pdf", "png", "jpg","txt","md"])
-    if file and st.button("Upload"):
-        with st.spinner("Uploading..."):
-            response = requests.post(
-                f"{API_BASE}/upload",
-                files={"file": (file.name, file.getvalue())}
-            )
-            if response.ok:
-                st.success("File uploaded and processed successfully")
-                st.json(response.json())
-            else:
-                st.error(response.text)
-else:
-    files = st.file_uploader("Upload multiple files", type=["pdf","png","jpg"],accept_multiple_files=True)
-    if files and st.button("Upload All"):
-        with st.spinner("Uploading batch"):
-            form_files = [("files", (f.name, f.getvalue())) for f in files]
-            response = requests.post(f"{API_BASE}/upload-batch", files=form_files)
-            if response.ok:
-                st.success("Batch upload completed")
-                st.json(response.json())
-            else:
-                st.error(response.text)
+file_types = [ext.lstrip(".") for ext in client_config["allowed_extensions"]]
+files = st.file_uploader("Upload documents", type=file_types, accept_multiple_files=True)
+if files and st.button("Upload"):
+    progress = st.progress(0.0)
+    for i, file in enumerate(files):
+        def report(fraction, step, i=i, file=file):
+            progress.progress((i + fraction) / len(files), text=f"{file.name}: {step}")
+
+        try:
+            status = upload_file(file, client_config["upload_chunk_size"], report)
+        except requests.RequestException as e:
+            st.error(f"{file.name}: upload interrupted ({e}). Click Upload again to resume.")
+            continue
+
+        if status["state"] == "duplicate":
+            st.info(f"{file.name} is already indexed as {status['document_id']}; skipped")
+        elif status["state"] == "done":
+            st.success(f"{file.name} processed: {status['chunks_processed']} chunks")
+        else:
+            st.error(f"{file.name}: {status.get('error') or status['state']}")
+    progress.progress(1.0, text="Done")
+    fetch_stats.clear()
+
 st.header("Ask a Question")
 
+follow_up = st.checkbox("Follow-up mode (questions can refer to earlier answers)")
+if follow_up and st.button("New conversation"):
+    st.session_state.pop("session_id", None)
+
 question = st.text_input("Enter your question")
 
 if st.button("Submit Question") and question.strip():
-    with st.spinner("Processing"):
-        response = requests.post(
-            f"{API_BASE}/query",
-            json={"question": question}
-        )
-        if response.ok:
-            result = response.json()
-            st.success("Response received")
-            
-            st.subheader("Synthesized Answer")
-            st.markdown(result["synthesized_answer"])
+    payload = {"question": question}
+    if follow_up:
+        payload["session_id"] = st.session_state.setdefault("session_id", uuid.uuid4().hex)
 
-            st.subheader("Themes with Citations ")
-            for theme in result["themes"]:
-                st.markdown(f"**{theme['name']}**")
-                st.markdown(theme['summary'])
+    status_box = st.empty()
+    answer_box = st.empty()
+    themes_box = st.empty()
+    status_box.info("Processing")
+    try:
+        with get_http().post(f"{API_BASE}/query/stream", json=payload, stream=True, timeout=(5, 300)) as response:
+            if not response.ok:
+                status_box.error(response.text)
+            else:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "error":
+                        status_box.error(event["detail"])
+                        break
+                    render_result(event, answer_box, themes_box)
+                    if event["type"] == "final":
+                        status_box.success(f"Response received in {event['processing_time']:.1f}s")
+    except requests.RequestException as e:
+        status_box.error(f"Could not reach the API: {e}")
 
-        else:
-            st.error(response.text)
 st.sidebar.header("Document Stats")
 if st.sidebar.button("Refresh Stats"):
-    response = requests.get(f"{API_BASE}/documents")
-    if response.ok:
-        stats = response.json()
-        st.sidebar.metric("Documents", stats["total_documents"])
-        st.sidebar.metric("Chunks", stats["total_chunks"])
-    else:
-        st.sidebar.error("Failed to load stats")
+    fetch_stats.clear()
+try:
+    stats = fetch_stats()
+    st.sidebar.metric("Documents", stats["total_documents"])
+    st.sidebar.metric("Chunks", stats["total_chunks"])
+except requests.RequestException:
+    st.sidebar.error("Failed to load stats")
@@ -0,0 +1,100 @@
+# tests/conftest.py
+import json
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+# The app is run from app/ and imports its modules top-level (config, services.*)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+ANSWER = json.dumps({
+    'individual_answers': [{'document_id': 'acme-doc', 'answer': 'A 5% fine.', 'citation': 'Page 1, Para 1'}],
+    'themes': [{'name': 'Penalties', 'summary': 'Fines.', 'supporting_docs': ['acme-doc (Page 1, Para 1)']}],
+    'synthesized_answer': 'Fines of 5% apply.'
+})
+
+class StubChat:
+    """ChatOpenAI stand-in: answers every prompt with ANSWER, and fails on prompts that mention 'explode'"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def _check(self, messages):
+        if "explode" in messages[-1].content:
+            raise RuntimeError("LLM unavailable")
+
+    def generate(self, batch):
+        from langchain.schema import AIMessage, ChatGeneration, LLMResult
+        self._check(batch[0])
+        return LLMResult(
+            generations=[[ChatGeneration(message=AIMessage(content=ANSWER))]],
+            llm_output={'token_usage': {'prompt_tokens': 100, 'completion_tokens': 20}}
+        )
+
+    def stream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+        self._check(messages)
+        for start in range(0, len(ANSWER), 16):
+            yield AIMessageChunk(content=ANSWER[start:start + 16])
+
+class HashEncoder:
+    """Deterministic stand-in for a sentence encoder: one random unit vector per text"""
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = [np.random.default_rng(zlib.crc32(text.encode())).standard_normal(self.dim) for text in texts]
+        return np.vstack([vector / np.linalg.norm(vector) for vector in vectors]).astype('float32')
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """The API module with a stub LLM and encoder, no documents, and its files under tmp_path"""
+    import services.llm
+    monkeypatch.setattr(services.llm, "ChatOpenAI", StubChat)
+    import main
+    from services.profiler import RequestProfiler
+    from services.sessions import SessionStore
+    from services.uploads import ChunkedUploads
+
+    # FAISS_INDEX_PATH is relative to the working directory
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.query_processor.qa_agent, "llm", StubChat())
+    store = main.doc_manager.vector_store
+    monkeypatch.setattr(store, "_model", HashEncoder(store.embedding_dim))
+    monkeypatch.setattr(main, "profiler", RequestProfiler(tmp_path / "profiles"))
+    monkeypatch.setattr(main, "sessions", SessionStore())
+    monkeypatch.setattr(main, "uploads", ChunkedUploads(tmp_path / "partial", main.config.MAX_FILE_SIZE))
+    main.doc_manager.clear_documents()
+    yield main
+    main.doc_manager.clear_documents()
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)
+
+@pytest.fixture
+def documents(main):
+    """Ten chunks each of an 'acme' and a 'globex' document in the live index"""
+    store = main.doc_manager.vector_store
+    for tenant in ['acme', 'globex']:
+        chunks = [f"{tenant} penalty clause {i}" for i in range(10)]
+        metadata = [{'doc_id': f"{tenant}-doc", 'tenant': tenant, 'page': 1, 'paragraph': i} for i in range(10)]
+        store.add_embeddings(chunks, metadata, store._model.encode(chunks))
+        main.doc_manager.processed_documents[f"{tenant}-doc"] = {
+            'path': f"{tenant}.txt", 'chunks_count': len(chunks), 'processed': True, 'tenant': tenant
+        }
+    return store
+
+@pytest.fixture
+def doc_manager():
+    """A fresh DocumentManager whose vector store embeds with a HashEncoder"""
+    from services.document_manager import DocumentManager
+    manager = DocumentManager()
+    manager.vector_store._model = HashEncoder(manager.vector_store.embedding_dim)
+    return manager
@@ -0,0 +1,71 @@
+# tests/test_bulk_ingest.py
+import json
+import sys
+
+import pytest
+
+from services import bulk_ingest
+from services.bulk_ingest import BulkIngester
+from services.document_manager import DocumentManager
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / "archive"
+    (root / "2021").mkdir(parents=True)
+    for i in range(6):
+        (root / "2021" / f"letter{i}.txt").write_text(f"Penalty notice {i}. A fine under clause {i} applies.")
+    (root / "notes.bin").write_bytes(b"not a document")
+    return root
+
+def ingester(tmp_path, doc_manager, **options):
+    return BulkIngester(doc_manager, index_path=str(tmp_path / "data" / "vector_store"), workers=2, **options)
+
+def test_run_indexes_every_file_and_resumes(tmp_path, archive, doc_manager):
+    summary = ingester(tmp_path, doc_manager, save_every=4).run([str(archive)], progress=False)
+    assert (summary['indexed'], summary['skipped'], summary['failed']) == (6, 0, 0)
+    assert 'interrupted' not in summary
+    assert set(doc_manager.get_document_stats()['documents']) == {f"archive/2021/letter{i}.txt" for i in range(6)}
+    with open(tmp_path / "data" / "vector_store.ingest.json") as f:
+        assert len(json.load(f)['files']) == 6
+
+    # As if the first run's process had exited; a new one resumes from the checkpoint
+    doc_manager._writer_lock_file.close()
+    resumed = DocumentManager()
+    resumed.vector_store._model = doc_manager.vector_store._model
+    summary = ingester(tmp_path, resumed).run([str(archive)], progress=False)
+    assert (summary['indexed'], summary['skipped']) == (0, 6)
+    assert summary['total_chunks'] == doc_manager.vector_store.total_chunks()
+
+def test_interrupted_run_saves_what_it_has(tmp_path, archive, doc_manager, monkeypatch):
+    real_wait = bulk_ingest.wait
+    calls = []
+    def interrupting_wait(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return real_wait(*args, **kwargs)
+    monkeypatch.setattr(bulk_ingest, "wait", interrupting_wait)
+
+    summary = ingester(tmp_path, doc_manager, save_every=100).run([str(archive)], progress=False)
+    assert summary['interrupted'] is True
+    assert 0 < summary['indexed'] < 6
+    with open(tmp_path / "data" / "vector_store.ingest.json") as f:
+        assert len(json.load(f)['files']) == summary['indexed']
+
+def test_cli_reports_an_interrupted_run(monkeypatch, capsys):
+    summary = {'indexed': 2, 'skipped': 0, 'failed': 0, 'chunks': 2, 'changed': [], 'total_chunks': 2,
+               'interrupted': True}
+    monkeypatch.setattr(BulkIngester, "__init__", lambda self, **options: setattr(self, 'checkpoint_path', 'x'))
+    monkeypatch.setattr(BulkIngester, "run", lambda self, paths, progress=True: summary)
+    monkeypatch.setattr(sys, "argv", ["bulk_ingest", "/archive"])
+    with pytest.raises(SystemExit) as exited:
+        bulk_ingest.main()
+    assert exited.value.code == 130
+    assert "Interrupted" in capsys.readouterr().out
+
+def test_refuses_to_run_while_another_writer_holds_the_lock(tmp_path, archive, doc_manager):
+    (tmp_path / "data").mkdir()
+    doc_manager.acquire_writer_lock(str(tmp_path / "data" / "vector_store"))
+    other = ingester(tmp_path, DocumentManager())
+    with pytest.raises(RuntimeError, match="Another writer"):
+        other.run([str(archive)], progress=False)
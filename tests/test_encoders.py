@@ -0,0 +1,24 @@
+# tests/test_encoders.py
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+pytest.importorskip("sentence_transformers")
+
+from benchmarks.bench_encoders import sample_texts
+from config import config
+from services.encoders import OnnxEncoder, SentenceTransformerEncoder
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_onnx_matches_torch(quantize):
+    """The ONNX export (and its int8 quantization) must embed like the PyTorch model"""
+    texts = sample_texts(200)
+    torch_embeddings = SentenceTransformerEncoder(config.EMBEDDING_MODEL).encode(texts, normalize_embeddings=True)
+    onnx_embeddings = OnnxEncoder(config.EMBEDDING_MODEL, config.MODELS_DIR, quantize=quantize).encode(
+        texts, normalize_embeddings=True
+    )
+
+    assert onnx_embeddings.shape == torch_embeddings.shape
+    cosines = np.sum(torch_embeddings * onnx_embeddings, axis=1)
+    assert cosines.min() >= (0.98 if quantize else 0.999)
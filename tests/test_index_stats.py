@@ -0,0 +1,15 @@
+# tests/test_index_stats.py
+
+def test_memory_stats_are_public(client, documents):
+    response = client.get("/index/stats")
+    assert response.status_code == 200
+    assert response.json()['chunks'] == 20
+    assert 'recall_at_k' not in response.json()
+
+def test_measuring_recall_needs_the_admin_token(main, client, documents, monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "secret")
+    assert client.get("/index/stats", params={"recall_sample": 1000}).status_code == 401
+
+    response = client.get("/index/stats", params={"recall_sample": 10}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()['recall_at_k'] == 1.0
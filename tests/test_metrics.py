@@ -0,0 +1,73 @@
+# tests/test_metrics.py
+import json
+import threading
+
+from services import metrics
+
+def samples(client):
+    """Every sample of a /metrics scrape: 'name{labels}' -> value"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    values = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+def increase(before, after, name):
+    return after.get(name, 0.0) - before.get(name, 0.0)
+
+def test_query_updates_counters_histograms_and_stage_timings(client, documents):
+    before = samples(client)
+    response = client.post("/query", json={"question": "Which penalty clause applies?"})
+    assert response.status_code == 200
+    after = samples(client)
+
+    timings = response.json()['stage_timings']
+    assert {'retrieve', 'llm', 'parse'} <= set(timings) and all(seconds >= 0 for seconds in timings.values())
+    assert increase(before, after, 'docqa_llm_requests_total{mode="complete"}') == 1
+    assert increase(before, after, 'docqa_llm_tokens_total{kind="prompt"}') == 100
+    assert increase(before, after, 'docqa_llm_tokens_total{kind="completion"}') == 20
+    for name in ('llm', 'parse', 'retrieve'):
+        assert increase(before, after, f'docqa_stage_duration_seconds_count{{stage="{name}"}}') == 1
+    assert increase(before, after, 'docqa_stage_duration_seconds_sum{stage="llm"}') > 0
+
+    http = '{method="POST",path="/query",status="200"}'
+    assert increase(before, after, f'docqa_http_request_duration_seconds_count{http}') == 1
+    assert after[f'docqa_http_request_duration_seconds_bucket{{method="POST",path="/query",status="200",le="+Inf"}}'] == \
+        after[f'docqa_http_request_duration_seconds_count{http}']
+    assert after['docqa_index_chunks'] == 20 and after['docqa_llm_in_flight'] == 0
+
+def test_streamed_llm_time_is_recorded_as_the_llm_stage(client, documents):
+    before = samples(client)
+    response = client.post("/query/stream", json={"question": "Which penalty clause applies?"})
+    final = json.loads(response.text.splitlines()[-1])
+    after = samples(client)
+
+    assert final['type'] == 'final' and final['stage_timings']['llm'] > 0
+    assert increase(before, after, 'docqa_llm_requests_total{mode="stream"}') == 1
+    # One estimated token per streamed piece
+    assert increase(before, after, 'docqa_llm_tokens_total{kind="completion"}') > 1
+    assert increase(before, after, 'docqa_stage_duration_seconds_count{stage="llm"}') == 1
+
+def test_stage_timings_are_kept_per_request():
+    seen = {}
+
+    def request(name):
+        seen[f"{name} before"] = metrics.request_timings()
+        timings = metrics.start_request()
+        with metrics.stage(name):
+            pass
+        with metrics.stage(name):
+            pass
+        seen[name] = dict(timings)
+
+    threads = [threading.Thread(target=request, args=(name,)) for name in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(seen["first"]) == {"first"} and set(seen["second"]) == {"second"}
+    assert seen["first before"] is None and seen["second before"] is None
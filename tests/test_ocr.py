@@ -0,0 +1,101 @@
+# tests/test_ocr.py
+from PIL import Image, ImageDraw
+import pytest
+
+from config import config
+from services import ocr
+from services.ocr_cache import OCRCache
+
+@pytest.fixture
+def tesseract(tmp_path, monkeypatch):
+    """Stub image_to_string that answers with the region's size; returns the list of calls"""
+    calls = []
+    def image_to_string(region, lang=None, config=None):
+        calls.append(config)
+        return f"{region.width}x{region.height}"
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", image_to_string)
+    monkeypatch.setattr(config, "OCR_DESKEW", False)
+    monkeypatch.setattr(config, "OCR_CACHE_ENABLED", True)
+    monkeypatch.setattr(ocr, "_ocr_cache", OCRCache(tmp_path / "ocr_cache.sqlite3"))
+    monkeypatch.setattr(ocr, "_ocr_settings", None)
+    return calls
+
+def lined_page(width=400, height=300, angle=0):
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for top in range(30, height - 30, 25):
+        draw.rectangle((40, top, width - 40, top + 6), fill=0)
+    return page.rotate(angle, resample=Image.BICUBIC, fillcolor=255) if angle else page
+
+def test_transparent_images_are_flattened_onto_white(monkeypatch):
+    monkeypatch.setattr(config, "OCR_DESKEW", False)
+    gray, dpi = ocr.preprocess_image(Image.new("RGBA", (50, 40), (0, 0, 0, 0)))
+    assert gray.mode == "L" and gray.getextrema() == (255, 255)
+    assert dpi is None
+
+@pytest.mark.parametrize("source_dpi,size", [(150, (200, 160)), (600, (50, 40)), (72, (200, 160))])
+def test_images_are_resampled_to_ocr_dpi(monkeypatch, source_dpi, size):
+    monkeypatch.setattr(config, "OCR_DESKEW", False)
+    monkeypatch.setattr(config, "OCR_DPI", 300)
+    gray, dpi = ocr.preprocess_image(Image.new("L", (100, 80), 255), source_dpi)
+    # Upscaling is capped at 2x
+    assert gray.size == size
+    assert dpi == round(source_dpi * size[0] / 100)
+
+def test_large_images_are_capped_at_ocr_max_dimension(monkeypatch):
+    monkeypatch.setattr(config, "OCR_DESKEW", False)
+    monkeypatch.setattr(config, "OCR_MAX_DIMENSION", 500)
+    gray, _ = ocr.preprocess_image(Image.new("L", (2000, 1000), 255))
+    assert gray.size == (500, 250)
+
+def test_skew_is_measured_and_corrected(monkeypatch):
+    assert abs(ocr.estimate_skew(lined_page(angle=3), max_angle=5) + 3) <= 0.4
+    assert abs(ocr.estimate_skew(lined_page(), max_angle=5)) < 0.2
+
+    monkeypatch.setattr(config, "OCR_MAX_SKEW", 5)
+    monkeypatch.setattr(config, "OCR_DESKEW", True)
+    gray, _ = ocr.preprocess_image(lined_page(angle=3))
+    # Rotated back with expand=True, so the canvas grows
+    assert gray.size != (400, 300)
+
+def test_every_tiff_frame_becomes_a_page(tmp_path, tesseract):
+    path = tmp_path / "scan.tif"
+    frames = [lined_page(200, height) for height in (100, 120, 140)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+    chunks = ocr.extract_text_from_image(str(path), "scan")
+    assert [(chunk['metadata']['page'], chunk['text']) for chunk in chunks] == [
+        (1, "200x100"), (2, "200x120"), (3, "200x140")
+    ]
+    assert all(chunk['metadata']['extracted_via'] == 'OCR' for chunk in chunks)
+
+def test_exif_orientation_is_applied(tmp_path, tesseract):
+    path = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees, as phone cameras record it
+    lined_page(200, 100).convert("RGB").save(path, exif=exif, dpi=(300, 300))
+    assert ocr.extract_text_from_image(str(path))[0]['text'] == "100x200"
+
+def test_cache_hits_skip_tesseract(tesseract):
+    page = lined_page()
+    assert ocr.ocr_images([page]) == ["400x300"]
+    assert len(tesseract) == 1
+    # Same pixels in a new image object still hit
+    assert ocr.ocr_images([page.copy(), page]) == ["400x300", "400x300"]
+    assert len(tesseract) == 1
+    assert ocr.ocr_images([lined_page(400, 280)]) == ["400x280"]
+    assert len(tesseract) == 2
+
+def test_cache_is_invalidated_by_ocr_settings(tesseract, monkeypatch):
+    page = lined_page()
+    ocr.ocr_images([page])
+    monkeypatch.setattr(config, "TESSERACT_CONFIG", "--oem 1 --psm 4")
+    monkeypatch.setattr(ocr, "_ocr_settings", None)
+    ocr.ocr_images([page])
+    assert len(tesseract) == 2 and tesseract[-1].startswith("--oem 1 --psm 4")
+
+def test_disabled_cache_always_runs_tesseract(tesseract, monkeypatch):
+    monkeypatch.setattr(config, "OCR_CACHE_ENABLED", False)
+    page = lined_page()
+    ocr.ocr_images([page, page])
+    assert len(tesseract) == 2
@@ -0,0 +1,53 @@
+# tests/test_profiler.py
+import os
+import pstats
+
+from PIL import Image, ImageDraw
+
+from config import config
+from services import ocr
+from services.profiler import RequestProfiler
+
+def profiled_functions(profiler, profile_id):
+    stats = pstats.Stats(str(profiler.profile_path(profile_id, "prof")))
+    return {(os.path.basename(path), name) for path, _, name in stats.stats}
+
+def test_query_profile_includes_the_worker_thread(main, client, documents, monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "secret")
+    response = client.post(
+        "/query", json={"question": "Which penalty clause applies?"},
+        headers={"X-Profile": "1", "X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+
+    profile_id = response.headers["X-Profile-Id"]
+    assert "POST /query  status=200" in main.profiler.profile_path(profile_id).read_text()
+    # Retrieval, the LLM call and parsing run in the thread pool, not on the request's thread
+    functions = profiled_functions(main.profiler, profile_id)
+    for frame in [("query.py", "process_query"), ("conftest.py", "generate"), ("response_parser.py", "parse_response")]:
+        assert frame in functions
+
+def test_requests_without_the_admin_token_are_not_profiled(main, client, documents):
+    response = client.post("/query", json={"question": "Which penalty clause applies?"}, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert main.profiler.list_profiles() == []
+
+def test_ocr_region_threads_are_profiled(tmp_path, monkeypatch):
+    def stub_image_to_string(region, lang=None, config=None):
+        return "text"
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", stub_image_to_string)
+    monkeypatch.setattr(config, "OCR_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "OCR_DESKEW", False)
+    monkeypatch.setattr(config, "OCR_WORKERS", 4)
+    monkeypatch.setattr(config, "OCR_REGION_PIXELS", 20000)
+
+    page = Image.new("L", (200, 400), 255)
+    draw = ImageDraw.Draw(page)
+    for top in range(20, 400, 40):
+        draw.rectangle((10, top, 190, top + 10), fill=0)
+
+    profiler = RequestProfiler(tmp_path / "profiles")
+    session = profiler.start("ocr")
+    assert ocr.ocr_images([page]) == ["text\ntext\ntext\ntext"]
+    assert ("test_profiler.py", "stub_image_to_string") in profiled_functions(profiler, session.stop(200))
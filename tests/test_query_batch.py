@@ -0,0 +1,65 @@
+# tests/test_query_batch.py
+import json
+import time
+
+def batch(client, questions, **options):
+    response = client.post("/query-batch", json={"questions": questions, **options})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_failed_questions_do_not_fail_the_batch(client, documents):
+    questions = ["Which penalty clause applies?", "Make the model explode", "What fines apply?"]
+    lines = {line['index']: line for line in batch(client, questions)}
+
+    assert sorted(lines) == [0, 1, 2]
+    assert lines[1] == {"index": 1, "question": questions[1], "error": "LLM unavailable"}
+    for index in (0, 2):
+        assert "error" not in lines[index]
+        assert lines[index]['synthesized_answer'] == "Fines of 5% apply."
+        assert lines[index]['individual_answers'][0]['document_id'] == "acme-doc"
+
+def test_lines_stream_in_completion_order_and_carry_their_index(main, client, documents, monkeypatch):
+    answer_from_context = main.query_processor.answer_from_context
+    def slow_first(question, contexts, metadata_list):
+        if question.startswith("slow"):
+            time.sleep(0.5)
+        return answer_from_context(question, contexts, metadata_list)
+    monkeypatch.setattr(main.query_processor, "answer_from_context", slow_first)
+    monkeypatch.setattr(main.config, "LLM_MAX_CONCURRENCY", 4)
+
+    questions = ["slow penalty clause", "penalty clause 1", "penalty clause 2"]
+    lines = batch(client, questions)
+    assert lines[-1]['index'] == 0
+    assert sorted(line['index'] for line in lines) == [0, 1, 2]
+    assert all(line['question'] == questions[line['index']] for line in lines)
+
+def test_retrieval_only_lines_are_in_question_order(client, documents):
+    questions = [f"globex penalty clause {i}" for i in range(5)]
+    lines = batch(client, questions, retrieval_only=True, max_results=3)
+    assert [line['index'] for line in lines] == list(range(5))
+    assert [line['question'] for line in lines] == questions
+    assert all(len(line['hits']) == 3 and "synthesized_answer" not in line for line in lines)
+
+def test_batch_size_is_limited(main, client, documents, monkeypatch):
+    monkeypatch.setattr(main.config, "MAX_BATCH_QUERIES", 2)
+    response = client.post("/query-batch", json={"questions": ["a", "b", "c"]})
+    assert response.status_code == 400
+    assert "Maximum 2 per batch" in response.json()['detail']
+    assert len(batch(client, ["penalty clause", "fines"], retrieval_only=True)) == 2
+
+def test_invalid_batches_are_refused(main, client, documents, monkeypatch):
+    monkeypatch.setattr(main.config, "MAX_QUERY_LENGTH", 20)
+    for questions, detail in [
+        ([], "No questions provided"),
+        (["penalty clause", "  "], "Questions cannot be empty"),
+        (["penalty clause", "x" * 21], "Question too long"),
+    ]:
+        response = client.post("/query-batch", json={"questions": questions})
+        assert response.status_code == 400
+        assert response.json()['detail'].startswith(detail)
+
+def test_batch_without_documents_is_refused(client):
+    response = client.post("/query-batch", json={"questions": ["penalty clause"]})
+    assert response.status_code == 400
+    assert "No documents loaded" in response.json()['detail']
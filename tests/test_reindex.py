@@ -0,0 +1,45 @@
+# tests/test_reindex.py
+import json
+
+import numpy as np
+import pytest
+
+from services.vector_store import FAISSVectorStore
+
+@pytest.fixture
+def admin(main, monkeypatch):
+    monkeypatch.setattr(main.config, "ADMIN_TOKEN", "secret")
+    return {"X-Admin-Token": "secret"}
+
+def test_reindex_needs_the_admin_token(main, client, admin):
+    assert client.post("/reindex", json={"index_type": "flat"}).status_code == 401
+    response = client.post("/reindex", json={"index_type": "flat"}, headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 401
+    assert main.doc_manager.get_reindex_status() is None
+
+def test_reindex_only_switches_to_allowed_models(main, client, admin, monkeypatch):
+    response = client.post("/reindex", json={"embedding_model": "someone/huge-model"}, headers=admin)
+    assert response.status_code == 400
+    assert "REINDEX_MODELS" in response.json()['detail']
+
+    started = []
+    monkeypatch.setattr(main.config, "REINDEX_MODELS", ["someone/huge-model"])
+    monkeypatch.setattr(main.doc_manager, "start_reindex",
+                        lambda **options: started.append(options) or {"from_model": "a", "to_model": "b"})
+    response = client.post("/reindex", json={"embedding_model": "someone/huge-model"}, headers=admin)
+    assert response.status_code == 200
+    assert started[0]['embedding_model'] == "someone/huge-model"
+
+def test_saved_manifest_names_the_generations_model(tmp_path):
+    store = FAISSVectorStore(16, embedding_model='model-a', float_store_dir=tmp_path / "float_store")
+    vectors = np.eye(16, dtype='float32')[:10]
+    store.add_embeddings([f"chunk {i}" for i in range(10)], [{'doc_id': 'doc'}] * 10, vectors)
+    generation = store.snapshot()
+    # As if a re-index to another model had just been published
+    store.embedding_model, store.embedding_dim = 'model-b', 32
+    store._generation = generation
+
+    store.save_index(str(tmp_path / "vector_store"))
+    with open(tmp_path / "vector_store.g1.json") as f:
+        manifest = json.load(f)
+    assert (manifest['embedding_model'], manifest['embedding_dim']) == ('model-a', 16)
@@ -0,0 +1,89 @@
+# tests/test_replicas.py
+import os
+import runpy
+
+import numpy as np
+import pytest
+
+from services import encoders
+from services.vector_store import FAISSVectorStore, RecordView
+
+DIM = 16
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+def random_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_store(tmp_path, embedding_model='model-a'):
+    return FAISSVectorStore(DIM, embedding_model=embedding_model, float_store_dir=tmp_path / "float_store")
+
+def add(store, count, seed):
+    store.add_embeddings([f"chunk {seed}-{i}" for i in range(count)], [{'doc_id': f"doc{seed}"}] * count,
+                         random_vectors(count, seed))
+
+def test_reader_memory_maps_the_published_generation(tmp_path):
+    path = str(tmp_path / "vector_store")
+    writer = make_store(tmp_path)
+    add(writer, 20, 0)
+    writer.save_index(path)
+
+    reader = make_store(tmp_path)
+    assert reader.load_index(path, use_mmap=True)
+    generation = reader.snapshot()
+    assert isinstance(generation.documents, RecordView)
+    assert list(generation.documents) == list(writer.snapshot().documents)
+
+    queries = random_vectors(3, seed=9)
+    assert reader.search_vectors(queries, k=5) == writer.search_vectors(queries, k=5)
+    with pytest.raises(RuntimeError, match="read-only"):
+        reader.rebuild()
+
+def test_reader_refreshes_to_newer_generations_only(tmp_path):
+    path = str(tmp_path / "vector_store")
+    writer = make_store(tmp_path)
+    add(writer, 10, 0)
+    writer.save_index(path)
+    reader = make_store(tmp_path)
+    reader.load_index(path, use_mmap=True)
+    assert not reader.refresh(path)
+
+    add(writer, 5, 1)
+    writer.save_index(path)
+    assert reader.refresh(path)
+    assert reader.total_chunks() == 15 and reader.disk_version == 2
+    assert reader.document_summary['doc1']['chunks_count'] == 5
+    assert not reader.refresh(path)
+
+def test_reader_follows_the_writers_model(tmp_path):
+    path = str(tmp_path / "vector_store")
+    writer = make_store(tmp_path, embedding_model='model-b')
+    add(writer, 10, 0)
+    writer.save_index(path)
+
+    reader = make_store(tmp_path, embedding_model='model-a')
+    reader.load_index(path, use_mmap=True)
+    assert reader.embedding_model == reader.snapshot().embedding_model == 'model-b'
+
+def test_document_manager_refresh_is_rate_limited(tmp_path, doc_manager):
+    path = str(tmp_path / "vector_store")
+    writer = FAISSVectorStore(doc_manager.vector_store.embedding_dim, float_store_dir=tmp_path / "float_store")
+    writer.add_embeddings(["a"], [{'doc_id': 'doc'}], doc_manager.vector_store._model.encode(["a"]))
+    writer.save_index(path)
+
+    assert doc_manager.refresh_vector_store(path, min_interval=60)
+    assert doc_manager.get_document_stats()['total_documents'] == 1
+    writer.add_embeddings(["b"], [{'doc_id': 'doc2'}], doc_manager.vector_store._model.encode(["b"]))
+    writer.save_index(path)
+    # Checked at most once per min_interval
+    assert not doc_manager.refresh_vector_store(path, min_interval=60)
+    assert doc_manager.refresh_vector_store(path, min_interval=0)
+    assert doc_manager.get_document_stats()['total_documents'] == 2
+
+def test_gunicorn_workers_load_the_encoder_at_startup(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(encoders, "get_encoder", lambda *args: loaded.append(args))
+    settings = runpy.run_path(os.path.join(APP_DIR, "gunicorn.conf.py"))
+    assert settings['preload_app'] and settings['raw_env'] == ["SERVING_MODE=reader"]
+    settings['post_worker_init'](worker=None)
+    assert loaded == [()]
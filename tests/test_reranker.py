@@ -0,0 +1,74 @@
+# tests/test_reranker.py
+from config import config
+from services.query import QueryProcessor
+from services.reranker import CrossEncoderReranker
+
+class FakeCrossEncoder:
+    """Scores each (question, context) pair from a table, recording the contexts it was asked about"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.seen = []
+
+    def predict(self, pairs, batch_size=None):
+        self.seen.extend(context for _, context in pairs)
+        return [self.scores[context] for _, context in pairs]
+
+def candidates(scores):
+    contexts = list(scores)
+    return contexts, [{'doc_id': context, 'score': 1.0 - i / 100} for i, context in enumerate(contexts)]
+
+def test_results_are_ordered_by_cross_encoder_score():
+    scores = {'a': 0.1, 'b': 3.0, 'c': 1.5, 'd': 2.0}
+    reranker = CrossEncoderReranker(batch_size=2, margin=100, model=FakeCrossEncoder(scores))
+    contexts, metadata_list = reranker.rerank("q", *candidates(scores), top_n=3)
+    assert contexts == ['b', 'd', 'c']
+    assert [metadata['rerank_score'] for metadata in metadata_list] == [3.0, 2.0, 1.5]
+    assert all(metadata['candidates_scored'] == 4 for metadata in metadata_list)
+    # Dense metadata is kept alongside the new score
+    assert metadata_list[0]['doc_id'] == 'b' and metadata_list[0]['score'] == 0.99
+
+def test_scoring_stops_once_deeper_batches_cannot_make_the_cut():
+    scores = {'a': 9.0, 'b': 8.0, 'c': 1.0, 'd': 0.5, 'e': 7.5, 'f': 7.0}
+    model = FakeCrossEncoder(scores)
+    reranker = CrossEncoderReranker(batch_size=2, margin=2.0, model=model)
+    contexts, metadata_list = reranker.rerank("q", *candidates(scores), top_n=2)
+    assert model.seen == ['a', 'b', 'c', 'd']
+    assert contexts == ['a', 'b'] and metadata_list[0]['candidates_scored'] == 4
+
+def test_close_scores_keep_scoring_deeper_batches():
+    scores = {'a': 9.0, 'b': 8.0, 'c': 7.0, 'd': 6.5, 'e': 8.5, 'f': 1.0}
+    model = FakeCrossEncoder(scores)
+    contexts, _ = CrossEncoderReranker(batch_size=2, margin=2.0, model=model).rerank("q", *candidates(scores), top_n=2)
+    assert model.seen == list(scores)
+    assert contexts == ['a', 'e']
+
+def test_fewer_candidates_than_top_n_are_all_returned():
+    scores = {'a': 1.0, 'b': 2.0}
+    contexts, _ = CrossEncoderReranker(model=FakeCrossEncoder(scores)).rerank("q", *candidates(scores), top_n=5)
+    assert contexts == ['b', 'a']
+
+def make_processor(reranker):
+    processor = QueryProcessor.__new__(QueryProcessor)
+    processor.reranker = reranker
+    return processor
+
+def test_without_a_reranker_the_dense_order_is_kept():
+    processor = make_processor(None)
+    contexts, metadata_list = processor.select_context("q", *candidates({'a': 0, 'b': 0, 'c': 0}), k=2)
+    assert contexts == ['a', 'b'] and 'rerank_score' not in metadata_list[0]
+    assert processor.candidate_depth(4) == 4
+
+def test_reranking_fetches_rerank_candidates_and_keeps_rerank_top_n(monkeypatch):
+    monkeypatch.setattr(config, "RERANK_CANDIDATES", 6)
+    monkeypatch.setattr(config, "RERANK_TOP_N", 2)
+    scores = {'a': 0.0, 'b': 1.0, 'c': 3.0, 'd': 2.0, 'e': 0.5, 'f': 0.2}
+    model = FakeCrossEncoder(scores)
+    processor = make_processor(CrossEncoderReranker(batch_size=16, model=model))
+
+    assert processor.candidate_depth(4) == 6 and processor.candidate_depth(10) == 10
+    contexts, _ = processor.select_context("q", *candidates(scores), k=4)
+    assert contexts == ['c', 'd']
+    # Nothing retrieved: the cross-encoder is not called
+    assert processor.select_context("q", [], [], k=4) == ([], [])
+    assert len(model.seen) == 6
@@ -0,0 +1,71 @@
+# tests/test_response_parser.py
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from services.response_parser import ResponseParser, parse_response
+
+# Recorded LLM responses (*.txt) and the result expected from each (*.json)
+FIXTURES = Path(__file__).parent / "fixtures" / "responses"
+RESPONSES = sorted(path.stem for path in FIXTURES.glob("*.txt"))
+
+def load(name):
+    text = (FIXTURES / f"{name}.txt").read_text(encoding="utf-8")
+    expected = json.loads((FIXTURES / f"{name}.json").read_text(encoding="utf-8"))
+    return text, expected
+
+def stream(text, piece_size):
+    """Feed text in pieces, taking a snapshot after each; returns (snapshots, final)"""
+    parser = ResponseParser()
+    snapshots = []
+    for start in range(0, len(text), piece_size):
+        parser.feed(text[start:start + piece_size])
+        snapshots.append(parser.snapshot())
+    return snapshots, parser.close()
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_recorded_response(name):
+    text, expected = load(name)
+    assert parse_response(text) == expected
+
+@pytest.mark.parametrize("piece_size", [1, 7, 64])
+@pytest.mark.parametrize("name", RESPONSES)
+def test_streamed_response_matches_whole(name, piece_size):
+    text, expected = load(name)
+    snapshots, final = stream(text, piece_size)
+    assert final == expected
+
+    # Results only grow while the response streams in
+    counts = [(len(s['individual_answers']), len(s['themes'])) for s in snapshots]
+    assert counts == sorted(counts)
+
+def test_snapshot_shows_answer_while_it_is_written():
+    parser = ResponseParser()
+    parser.feed('{"individual_answers": [], "themes": [], "synthesized_answer": "Penalties were')
+    assert parser.snapshot()['synthesized_answer'] == "Penalties were"
+    parser.feed(' imposed \\u20')
+    assert parser.snapshot()['synthesized_answer'] == "Penalties were imposed"
+    parser.feed('b95,000."}')
+    assert parser.close()['synthesized_answer'] == "Penalties were imposed ₹5,000."
+
+def test_unreadable_json_falls_back_to_markdown():
+    text = '{broken\n**Synthesized Answer:** Plain text after all.'
+    assert parse_response(text)['synthesized_answer'] == "Plain text after all."
+
+def test_stream_throughput():
+    """Snapshots must not re-parse the whole buffer: streaming stays linear in the response size"""
+    answers = [
+        {"document_id": f"DOC{i:03d}", "answer": "The penalty was upheld on appeal. " * 60, "citation": f"Page {i}, Para 1"}
+        for i in range(20)
+    ]
+    text = json.dumps({"individual_answers": answers, "themes": [], "synthesized_answer": "Upheld. " * 500})
+
+    start = time.perf_counter()
+    snapshots, final = stream(text, 32)
+    elapsed = time.perf_counter() - start
+
+    assert len(final['individual_answers']) == 20
+    assert len(snapshots) > 1000
+    assert elapsed < 1.0, f"{len(snapshots)} snapshots over {len(text)} characters took {elapsed:.2f}s"
@@ -0,0 +1,50 @@
+# tests/test_search.py
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+def test_cursor_round_trip(main):
+    fingerprint = main.search_fingerprint("penalty clause", {'tenant': 'acme'})
+    assert fingerprint != main.search_fingerprint("penalty clause", None)
+    assert main.decode_cursor(main.encode_cursor(30, fingerprint), fingerprint) == 30
+
+@pytest.mark.parametrize("payload", [b"not base64!", b'{"x": 1}', b'{"offset": -5, "search": "x"}', b'[1]'])
+def test_invalid_cursors_are_refused(main, payload):
+    cursor = payload.decode() if payload.startswith(b"not") else base64.urlsafe_b64encode(payload).decode()
+    with pytest.raises(HTTPException) as raised:
+        main.decode_cursor(cursor, "x")
+    assert raised.value.status_code == 400
+
+def test_pages_cover_every_hit_once(client, documents):
+    seen, cursor = [], None
+    while True:
+        response = client.post("/search", json={"query": "penalty clause", "limit": 7, "cursor": cursor})
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend((hit['document_id'], hit['text']) for hit in page['hits'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        assert len(page['hits']) == 7
+    assert len(seen) == len(set(seen)) == 20
+
+def test_cursor_is_bound_to_its_query_and_filters(client, documents):
+    first = client.post("/search", json={"query": "penalty clause", "limit": 5, "filters": {"tenant": "acme"}}).json()
+    assert all(hit['text'].startswith("acme") for hit in first['hits'])
+    cursor = first['next_cursor']
+
+    for body in [{"query": "another question"}, {"query": "penalty clause", "filters": {"tenant": "globex"}}]:
+        response = client.post("/search", json={**body, "limit": 5, "cursor": cursor})
+        assert response.status_code == 400
+        assert "different query" in response.json()['detail']
+
+    response = client.post("/search", json={"query": "penalty clause", "limit": 5, "filters": {"tenant": "acme"},
+                                            "cursor": cursor})
+    assert response.status_code == 200
+    assert response.json()['next_cursor'] is None
+
+def test_null_limit_uses_the_default_page_size(client, documents):
+    response = client.post("/search", json={"query": "penalty clause", "limit": None})
+    assert response.status_code == 200
+    assert len(response.json()['hits']) == 10
@@ -0,0 +1,86 @@
+# tests/test_sessions.py
+import zlib
+
+import numpy as np
+
+from services.query import QueryProcessor
+from services.sessions import SessionStore
+from services.vector_store import FAISSVectorStore
+
+DIM = 16
+
+class HashEncoder:
+    """Deterministic stand-in for a sentence encoder: one random unit vector per text"""
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = [np.random.default_rng(zlib.crc32(text.encode())).standard_normal(DIM) for text in texts]
+        return np.vstack([vector / np.linalg.norm(vector) for vector in vectors]).astype('float32')
+
+def make_processor(tmp_path):
+    store = FAISSVectorStore(DIM, model=HashEncoder(), float_store_dir=tmp_path / "float_store")
+    for tenant in ['acme', 'globex']:
+        chunks = [f"{tenant} penalty clause {i}" for i in range(10)]
+        store.add_embeddings(chunks, [{'doc_id': f"{tenant}-doc", 'tenant': tenant} for _ in chunks],
+                             HashEncoder().encode(chunks))
+    # Only the retrieval half of the processor is exercised; no LLM is needed
+    processor = QueryProcessor.__new__(QueryProcessor)
+    processor.vector_store = store
+    processor.reranker = None
+    return processor
+
+def count_searches(store):
+    calls = []
+    search = store.search
+    def counted(*args, **kwargs):
+        calls.append(kwargs.get('filters'))
+        return search(*args, **kwargs)
+    store.search = counted
+    return calls
+
+def test_same_session_id_is_a_different_session_per_tenant():
+    sessions = SessionStore()
+    acme = sessions.get("s1", "acme")
+    acme.add_turn("What penalties apply?", "Fines of 5%.")
+
+    globex = sessions.get("s1", "globex")
+    assert globex is not acme
+    assert globex.history_text() == ""
+    assert sessions.get("s1", "acme") is acme
+    assert sessions.get("s1", create=False) is None
+
+    assert not sessions.delete("s1", "globex-other")
+    assert sessions.delete("s1", "acme")
+    assert sessions.get("s1", "acme", create=False) is None
+    assert sessions.get("s1", "globex", create=False) is globex
+
+def test_follow_up_without_new_terms_reuses_cached_chunks(tmp_path):
+    processor = make_processor(tmp_path)
+    calls = count_searches(processor.vector_store)
+    session = SessionStore().get("s1", "acme")
+    filters = {'tenant': 'acme'}
+
+    contexts, _ = processor.session_retrieve(session, "penalty clause", 5, filters)
+    assert len(contexts) == 5 and len(calls) == 1
+    contexts, metadata_list = processor.session_retrieve(session, "and the penalty?", 5, filters)
+    assert len(calls) == 1
+    assert all(metadata['tenant'] == 'acme' for metadata in metadata_list)
+
+def test_cached_chunks_are_dropped_when_filters_change(tmp_path):
+    processor = make_processor(tmp_path)
+    calls = count_searches(processor.vector_store)
+    session = SessionStore().get("s1")
+
+    processor.session_retrieve(session, "penalty clause", 5, {'tenant': 'acme'})
+    contexts, metadata_list = processor.session_retrieve(session, "penalty clause", 5, {'tenant': 'globex'})
+    assert calls == [{'tenant': 'acme'}, {'tenant': 'globex'}]
+    assert metadata_list and all(metadata['tenant'] == 'globex' for metadata in metadata_list)
+
+def test_cached_chunks_are_dropped_when_the_index_changes(tmp_path):
+    processor = make_processor(tmp_path)
+    calls = count_searches(processor.vector_store)
+    session = SessionStore().get("s1")
+
+    processor.session_retrieve(session, "penalty clause", 5)
+    processor.vector_store.add_embeddings(["new chunk"], [{'doc_id': 'new'}], HashEncoder().encode(["new chunk"]))
+    processor.session_retrieve(session, "penalty clause", 5)
+    assert len(calls) == 2
@@ -0,0 +1,110 @@
+# tests/test_sharded_vector_store.py
+import os
+import socket
+import threading
+
+import numpy as np
+import pytest
+from multiprocessing import AuthenticationError
+
+from services.sharded_vector_store import RemoteShard, ShardedVectorStore, ShardServer, check_authkey
+
+DIM = 16
+AUTHKEY = b"0123456789abcdef0123456789abcdef"
+
+def random_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_store(tmp_path, **options):
+    return ShardedVectorStore(4, embedding_dim=DIM, embedding_model='test-model',
+                              float_store_dir=tmp_path / "float_store", **options)
+
+def add_tenant(store, tenant, count, seed):
+    chunks = [f"{tenant} chunk {i}" for i in range(count)]
+    metadata = [{'doc_id': f"{tenant}-doc{i % 3}", 'tenant': tenant} for i in range(count)]
+    for shard_no, shard in enumerate(store.shards):
+        rows = [i for i in range(count) if store.shard_for(metadata[i]) == shard_no]
+        if rows:
+            shard.add_embeddings([chunks[i] for i in rows], [metadata[i] for i in rows], random_vectors(count, seed)[rows])
+    store._bump_version()
+
+def count_calls(store, method):
+    calls = []
+    for shard_no, shard in enumerate(store.shards):
+        original = getattr(shard, method)
+        def counted(*args, shard_no=shard_no, original=original, **kwargs):
+            calls.append(shard_no)
+            return original(*args, **kwargs)
+        setattr(shard, method, counted)
+    return calls
+
+def test_tenant_search_only_returns_and_searches_that_tenant(tmp_path):
+    store = make_store(tmp_path, shard_key='tenant')
+    for seed, tenant in enumerate(['acme', 'globex', 'initech', 'umbrella']):
+        add_tenant(store, tenant, 20, seed)
+    calls = count_calls(store, 'search_vectors')
+
+    hits = store._search_vectors(store.snapshot(), random_vectors(3, seed=9), 10, {'tenant': 'globex'})
+    assert all(hit['metadata']['tenant'] == 'globex' for row in hits for hit in row)
+    assert all(row for row in hits)
+    assert calls == [store.shard_for({'tenant': 'globex'})]
+
+def test_filters_off_the_shard_key_search_every_shard(tmp_path):
+    store = make_store(tmp_path, shard_key='tenant')
+    add_tenant(store, 'acme', 20, 0)
+    calls = count_calls(store, 'search_vectors')
+    hits = store._search_vectors(store.snapshot(), random_vectors(1, seed=9), 10, {'doc_id': 'acme-doc1'})
+    assert sorted(calls) == [0, 1, 2, 3]
+    assert hits[0] and all(hit['metadata']['doc_id'] == 'acme-doc1' for hit in hits[0])
+
+def test_total_chunks_is_counted_once_per_generation(tmp_path):
+    store = make_store(tmp_path)
+    add_tenant(store, 'acme', 20, 0)
+    calls = count_calls(store, 'total_chunks')
+    assert store.total_chunks() == store.total_chunks() == 20
+    assert len(calls) == 4
+    add_tenant(store, 'acme', 5, 1)
+    assert store.total_chunks() == 25
+    assert len(calls) == 8
+
+@pytest.mark.parametrize("authkey,host", [
+    (b"", '127.0.0.1'), (None, '127.0.0.1'), (b"shard", '127.0.0.1'), (b"short", '10.0.0.5'),
+])
+def test_weak_authkeys_are_refused(authkey, host):
+    with pytest.raises(ValueError, match="SHARD_AUTHKEY"):
+        check_authkey(authkey, host)
+
+def test_short_authkey_is_accepted_on_loopback_only():
+    check_authkey(b"local-secret", 'localhost')
+    with pytest.raises(ValueError):
+        ShardServer("0.0.0.0:7001", b"local-secret", DIM, embedding_model='test-model')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_remote_shard_keeps_files_in_its_data_dir(tmp_path):
+    address = f"127.0.0.1:{free_port()}"
+    server = ShardServer(address, AUTHKEY, DIM, data_dir=tmp_path / "shard_data", embedding_model='test-model',
+                         float_store_dir=tmp_path / "float_store")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    shard = RemoteShard(address, AUTHKEY)
+    for _ in range(50):
+        try:
+            shard.add_embeddings(["a", "b"], [{'doc_id': 'x'}, {'doc_id': 'y'}], random_vectors(2))
+            break
+        except ConnectionRefusedError:
+            threading.Event().wait(0.05)
+    shard.save_index(str(tmp_path / "elsewhere" / ".." / ".." / "escaped"))
+
+    assert os.path.exists(tmp_path / "shard_data" / "escaped.version")
+    assert not os.path.exists(tmp_path.parent / "escaped.version")
+    with pytest.raises(RuntimeError, match="Invalid index path"):
+        shard.load_index("..")
+
+    with pytest.raises(AuthenticationError):
+        RemoteShard(address, b"f" * 32).total_chunks()
+    assert RemoteShard(address, AUTHKEY).total_chunks() == 2
@@ -0,0 +1,91 @@
+# tests/test_uploads.py
+import hashlib
+import threading
+
+import pytest
+
+from services import uploads as uploads_module
+from services.document_manager import prepare_document
+from services.uploads import ChunkedUploads
+
+def start_upload(tmp_path, content):
+    uploads = ChunkedUploads(tmp_path / "partial", max_file_size=1024)
+    state = uploads.start("notes.txt", len(content), hashlib.sha256(content).hexdigest())
+    uploads.append(state['upload_id'], 0, content)
+    return uploads, state['upload_id']
+
+def test_complete_hashes_without_holding_the_lock(tmp_path, monkeypatch):
+    uploads, upload_id = start_upload(tmp_path, b"penalty clause")
+    hashing, release = threading.Event(), threading.Event()
+    real_sha256 = uploads_module.file_sha256
+
+    def slow_sha256(path):
+        hashing.set()
+        release.wait(5)
+        return real_sha256(path)
+    monkeypatch.setattr(uploads_module, 'file_sha256', slow_sha256)
+
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(path=uploads.complete(upload_id)))
+    worker.start()
+    assert hashing.wait(5)
+    # Other calls go through while the file is being hashed
+    assert uploads.status(upload_id)['state'] == 'verifying'
+    with pytest.raises(RuntimeError, match="verifying"):
+        uploads.append(upload_id, len(b"penalty clause"), b"more")
+    release.set()
+    worker.join(5)
+
+    assert result['path'].read_bytes() == b"penalty clause"
+    assert uploads.status(upload_id)['state'] == 'processing'
+
+def test_complete_with_wrong_content_starts_over(tmp_path):
+    uploads = ChunkedUploads(tmp_path / "partial", max_file_size=1024)
+    state = uploads.start("notes.txt", 5, hashlib.sha256(b"hello").hexdigest())
+    uploads.append(state['upload_id'], 0, b"jello")
+    with pytest.raises(ValueError, match="sha256"):
+        uploads.complete(state['upload_id'])
+    assert uploads.status(state['upload_id'])['state'] == 'receiving'
+    assert uploads.status(state['upload_id'])['received'] == 0
+
+def test_prepared_documents_record_their_sha256(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("Penalty issued under Clause 49 of LODR.")
+    _, metadata_list = prepare_document(str(path), "notes")
+    assert metadata_list
+    assert {metadata['sha256'] for metadata in metadata_list} == {hashlib.sha256(path.read_bytes()).hexdigest()}
+
+def test_clear_finished_forgets_done_and_duplicate_uploads(tmp_path):
+    uploads, upload_id = start_upload(tmp_path, b"penalty clause")
+    uploads.update(upload_id, state='done', document_id='notes')
+    receiving = uploads.start("other.txt", 5, hashlib.sha256(b"hello").hexdigest())
+
+    uploads.clear_finished()
+    assert uploads.status(upload_id) is None
+    assert uploads.status(receiving['upload_id'])['state'] == 'receiving'
+
+def test_upload_can_be_sent_again_after_the_documents_are_cleared(main, client):
+    body = {"filename": "notes.txt", "size": 14, "sha256": hashlib.sha256(b"penalty clause").hexdigest()}
+    upload_id = client.post("/uploads", json=body).json()['upload_id']
+    main.uploads.update(upload_id, state='done', document_id='notes')
+    assert client.post("/uploads", json=body).json()['state'] == 'done'
+
+    assert client.delete("/documents").status_code == 200
+    state = client.post("/uploads", json=body).json()
+    assert state['state'] == 'receiving' and state['received'] == 0
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_oversized_chunks_are_refused(main, client, monkeypatch, chunked):
+    monkeypatch.setattr(main.config, "UPLOAD_CHUNK_SIZE", 8)
+    content = b"penalty clause"
+    body = {"filename": "notes.txt", "size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+    upload_id = client.post("/uploads", json=body).json()['upload_id']
+
+    # A generator body is sent without Content-Length, so only the running count catches it
+    data = iter([content[:6], content[6:]]) if chunked else content
+    response = client.put(f"/uploads/{upload_id}", params={"offset": 0}, content=data)
+    assert response.status_code == 413
+    assert main.uploads.status(upload_id)['received'] == 0
+
+    response = client.put(f"/uploads/{upload_id}", params={"offset": 0}, content=content[:8])
+    assert response.status_code == 200 and response.json()['received'] == 8
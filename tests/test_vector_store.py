@@ -0,0 +1,140 @@
+# tests/test_vector_store.py
+import itertools
+import random
+import threading
+import zlib
+
+import faiss
+import numpy as np
+import pytest
+
+from services.vector_store import FAISSVectorStore
+
+DIM = 16
+
+def random_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_store(tmp_path, **options):
+    return FAISSVectorStore(DIM, float_store_dir=tmp_path / "float_store", **options)
+
+def add(store, count, seed=0, doc_id='doc'):
+    store.add_embeddings(
+        [f"{doc_id} chunk {i}" for i in range(count)], [{'doc_id': doc_id} for _ in range(count)],
+        random_vectors(count, seed)
+    )
+
+def test_load_refuses_index_from_another_model(tmp_path):
+    store = make_store(tmp_path, embedding_model='model-a')
+    add(store, 10)
+    store.save_index(str(tmp_path / "vector_store"))
+
+    other = make_store(tmp_path, embedding_model='model-b')
+    with pytest.raises(ValueError, match="model-a"):
+        other.load_index(str(tmp_path / "vector_store"))
+    assert other.total_chunks() == 0
+
+def test_writes_share_the_base_index(tmp_path):
+    store = make_store(tmp_path, delta_size=8)
+    add(store, 20)
+    base = store.snapshot().index
+    for seed in range(1, 7):
+        add(store, 1, seed)
+        assert store.snapshot().index is base
+    add(store, 2, 7)
+    assert store.snapshot().index is not base
+    assert store.total_chunks() == 28 and store.snapshot().delta.ntotal == 0
+
+@pytest.mark.parametrize("index_type,options", [('flat', {}), ('sq8', {'train_size': 64})])
+def test_search_over_base_and_delta_matches_brute_force(tmp_path, index_type, options):
+    store = make_store(tmp_path, index_type=index_type, delta_size=16, **options)
+    for seed in range(40):
+        add(store, 5, seed, doc_id=f"doc{seed}")
+    vectors = np.vstack([random_vectors(5, seed) for seed in range(40)])
+    queries = random_vectors(10, seed=99)
+    _, expected = faiss.knn(queries, vectors, 5, metric=faiss.METRIC_INNER_PRODUCT)
+
+    hits = store.search_vectors(queries, k=5)
+    found = [[hit['index'] for hit in row] for row in hits]
+    if index_type == 'flat':
+        assert found == expected.tolist()
+    else:
+        assert np.mean([len(set(row) & set(truth)) / 5 for row, truth in zip(found, expected)]) > 0.8
+    for row in hits:
+        for hit in row:
+            assert hit['text'] == store.documents[hit['index']]
+
+def test_save_and_load_with_pending_delta(tmp_path):
+    store = make_store(tmp_path, delta_size=100)
+    add(store, 30)
+    add(store, 10, seed=1, doc_id='other')
+    assert store.snapshot().delta.ntotal == 10
+    store.save_index(str(tmp_path / "vector_store"))
+
+    loaded = make_store(tmp_path)
+    assert loaded.load_index(str(tmp_path / "vector_store"))
+    queries = random_vectors(5, seed=2)
+    assert loaded.search_vectors(queries, k=8) == store.search_vectors(queries, k=8)
+
+class HashEncoder:
+    """Deterministic stand-in for a sentence encoder: one random unit vector per text"""
+
+    def encode(self, texts, normalize_embeddings=True):
+        return np.vstack([random_vectors(1, seed=zlib.crc32(text.encode())) for text in texts])
+
+WORDS = "penalty clause listing regulation audit disclosure board filing deadline compliance".split()
+
+@pytest.mark.parametrize("index_type,options", [('flat', {}), ('sq8', {'train_size': 200})])
+def test_concurrent_reads_writes_clears_and_saves(tmp_path, index_type, options):
+    """Bounded version of benchmarks/stress_vector_store.py"""
+    store = make_store(tmp_path, model=HashEncoder(), index_type=index_type, delta_size=64, **options)
+    ids = itertools.count()
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        rng = random.Random()
+        while not stop.is_set():
+            batch_ids = [next(ids) for _ in range(rng.choice([1, 4, 16]))]
+            chunks = [f"chunk {i}: " + " ".join(rng.choices(WORDS, k=12)) for i in batch_ids]
+            store.add_documents(chunks, [{'doc_id': f"DOC{i % 50}", 'chunk_id': i} for i in batch_ids])
+
+    def reader():
+        rng = random.Random()
+        while not stop.is_set():
+            generation = store.snapshot()
+            if not store.total_chunks(generation) == len(generation.documents) == len(generation.metadata):
+                errors.append(f"generation {generation.version}: index/doc/metadata sizes disagree")
+            query = " ".join(rng.choices(WORDS, k=3))
+            for hit in store.search_hits_batch([query], k=rng.choice([1, 5, 20]))[0]:
+                if not hit['text'].startswith(f"chunk {hit['metadata']['chunk_id']}:"):
+                    errors.append(f"text/metadata mismatch at index {hit['index']}")
+
+    def maintainer():
+        rng = random.Random()
+        while not stop.wait(0.1):
+            store.save_index(str(tmp_path / "stress_store"))
+            if rng.random() < 0.2:
+                store.clear()
+
+    def guarded(target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                errors.append(f"{target.__name__}: {e!r}")
+                stop.set()
+        return threading.Thread(target=run, daemon=True)
+
+    threads = [guarded(writer) for _ in range(2)] + [guarded(reader) for _ in range(4)] + [guarded(maintainer)]
+    for thread in threads:
+        thread.start()
+    stop.wait(2.0)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not errors, errors[:5]
+    generation = store.snapshot()
+    assert store.total_chunks(generation) == len(generation.documents) == len(generation.metadata)